@@ -0,0 +1,499 @@
+""" benchmarks of tokens and encrypted data across storages """
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Callable, Sequence
+from joserfc.jwt import Token
+from joserfc_wrapper import (
+    AbstractKeyStorage,
+    KeyCache,
+    KeyPolicy,
+    StorageFile,
+    StorageMemory,
+    StorageVault,
+    WrapJWE,
+    WrapJWK,
+    WrapJWT,
+)
+from tests.vault_server import VaultServer
+
+SCHEMA = 1
+OPERATIONS = ("create", "decode", "validate", "encrypt", "decrypt")
+STORAGES = ("memory", "file", "vault")
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+# distinct tokens and encrypted values cycled by decode and decrypt
+SAMPLES = 64
+PAYLOAD = "secret data " * 8
+
+
+class Bench:
+    """Keys and wrappers of one benchmarked storage
+
+    One object is shared by all threads of a run, every process of
+    a run builds its own from the same spec.
+    """
+
+    def __init__(self, spec: dict, samples: dict) -> None:
+        """
+        :param spec: - storage and keys configuration, see prepare
+        :type dict:
+        :param samples: - tokens and encrypted values, see prepare
+        :type dict:
+        """
+        self.jwk = WrapJWK(
+            _storage(spec),
+            cache=KeyCache() if spec["key_cache"] else None,
+            flush_every=spec["flush_every"],
+            policy=KeyPolicy(**spec["policy"]),
+        )
+        self.jwk.load_keys()
+        self.jwt = WrapJWT(self.jwk)
+        self.jwe = WrapJWE(self.jwk)
+        self.samples = samples
+
+    def operation(self, name: str) -> Callable[[int], Any]:
+        """Return one call of an operation, the argument is its number"""
+        jwt, jwe = self.jwt, self.jwe
+        tokens, values = self.samples["tokens"], self.samples["values"]
+        if name == "create":
+            return lambda i: jwt.create(dict(CLAIMS))
+        if name == "decode":
+            return lambda i: jwt.decode(tokens[i % len(tokens)])
+        if name == "validate":
+            token = Token(*self.samples["decoded"])
+            expected = {"iss": CLAIMS["iss"], "aud": CLAIMS["aud"]}
+            return lambda i: jwt.validate(token, expected)
+        if name == "encrypt":
+            return lambda i: jwe.encrypt(PAYLOAD)
+        if name == "decrypt":
+            return lambda i: jwe.decrypt(values[i % len(values)])
+        raise ValueError(f"Unknown operation '{name}'.")
+
+
+def prepare(
+    storage: str,
+    directory: str,
+    url: str,
+    policy: KeyPolicy,
+    flush_every: int = 1,
+    key_cache: bool = False,
+) -> tuple[dict, dict]:
+    """
+    Generate keys in a storage and samples for decode and decrypt
+
+    :param storage: - memory, file or vault
+    :type str:
+    :param directory: - directory of the file storage
+    :type str:
+    :param url: - URL of the Vault server
+    :type str:
+    :param policy: - key types and algorithms
+    :type KeyPolicy:
+    :param flush_every: - see WrapJWK
+    :type int:
+    :param key_cache: - WrapJWK with a KeyCache
+    :type bool:
+    :returns: picklable spec of the storage, samples
+    :rtype: tuple[dict, dict]
+    """
+    spec = {
+        "storage": storage,
+        "directory": directory,
+        "url": url,
+        "policy": policy.as_dict(),
+        "flush_every": flush_every,
+        "key_cache": key_cache,
+        "keys": {},
+    }
+    keys_storage = _storage(spec)
+    myjwk = WrapJWK(keys_storage, policy=policy)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    if storage == "memory":
+        # processes get a copy of the keys
+        kid, data = keys_storage.load_keys()
+        spec["keys"] = {kid: data["data"]}
+
+    myjwt, myjwe = WrapJWT(myjwk), WrapJWE(myjwk)
+    tokens = [myjwt.create(dict(CLAIMS)) for _ in range(SAMPLES)]
+    decoded = myjwt.decode(tokens[0])
+    samples = {
+        "tokens": tokens,
+        "values": [myjwe.encrypt(PAYLOAD) for _ in range(SAMPLES)],
+        "decoded": (dict(decoded.header), dict(decoded.claims)),
+    }
+    return spec, samples
+
+
+def measure(
+    bench: Bench, operation: str, iterations: int, warmup: int
+) -> tuple[int, int, list[int]]:
+    """
+    Run an operation in the current thread
+
+    :returns: start and end (time.monotonic_ns), latencies in ns
+    :rtype: tuple[int, int, list[int]]
+    """
+    call = bench.operation(operation)
+    for i in range(warmup):
+        call(i)
+    latencies = []
+    clock = time.perf_counter_ns
+    start = time.monotonic_ns()
+    for i in range(iterations):
+        began = clock()
+        call(i)
+        latencies.append(clock() - began)
+    return start, time.monotonic_ns(), latencies
+
+
+def run(
+    spec: dict,
+    samples: dict,
+    operation: str,
+    mode: str,
+    workers: int,
+    iterations: int,
+    warmup: int,
+) -> dict:
+    """
+    Run an operation by threads or processes
+
+    :param mode: - threads or processes
+    :type str:
+    :param workers: - number of threads or processes
+    :type int:
+    :param iterations: - calls of the operation per worker
+    :type int:
+    :param warmup: - not measured calls per worker
+    :type int:
+    :returns: one result, see summarize
+    :rtype: dict
+    """
+    if mode == "threads":
+        bench = Bench(spec, samples)
+        barrier = threading.Barrier(workers)
+
+        def task(_: int) -> tuple[int, int, list[int]]:
+            barrier.wait()
+            return measure(bench, operation, iterations, warmup)
+
+        with ThreadPoolExecutor(workers) as pool:
+            runs = list(pool.map(task, range(workers)))
+    else:
+        with ProcessPoolExecutor(workers) as processes:
+            args = (spec, samples, operation, iterations, warmup)
+            futures = [
+                processes.submit(_process_task, *args) for _ in range(workers)
+            ]
+            runs = [future.result() for future in futures]
+
+    result = summarize(runs)
+    result.update(
+        {
+            "storage": spec["storage"],
+            "operation": operation,
+            "mode": mode,
+            "workers": workers,
+            "iterations": iterations * workers,
+        }
+    )
+    return result
+
+
+def summarize(runs: Sequence[tuple[int, int, list[int]]]) -> dict:
+    """
+    Return throughput and latency percentiles of workers
+
+    The throughput is the number of calls in the time from the start
+    of the first worker to the end of the last worker.
+
+    :returns: { 'ops_per_sec': float, 'seconds': float,
+        'latency_us': { 'mean', 'p50', 'p90', 'p99', 'max': float } }
+    :rtype: dict
+    """
+    latencies = sorted(ns for _, _, worker in runs for ns in worker)
+    elapsed = max(end for _, end, _ in runs) - min(s for s, _, _ in runs)
+    seconds = max(elapsed, 1) / 1e9
+    count = len(latencies)
+    return {
+        "ops_per_sec": round(count / seconds, 1),
+        "seconds": round(seconds, 6),
+        "latency_us": {
+            "mean": round(sum(latencies) / count / 1e3, 2),
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "max": round(latencies[-1] / 1e3, 2),
+        },
+    }
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """
+    Return regressions against results of an older run
+
+    :param results: - current results
+    :type list[dict]:
+    :param baseline: - JSON document of an older run
+    :type dict:
+    :param tolerance: - allowed drop of the throughput, 0.2 = 20 %
+    :type float:
+    :returns: descriptions of slower benchmarks
+    :rtype: list[str]
+    """
+    older = {_result_key(item): item for item in baseline.get("results", [])}
+    regressions = []
+    for item in results:
+        previous = older.get(_result_key(item))
+        if previous is None:
+            continue
+        limit = previous["ops_per_sec"] * (1 - tolerance)
+        if item["ops_per_sec"] < limit:
+            regressions.append(
+                "{} {} {}x{}: {} ops/s, baseline {} ops/s".format(
+                    *_result_key(item),
+                    item["ops_per_sec"],
+                    previous["ops_per_sec"],
+                )
+            )
+    return regressions
+
+
+def environment() -> dict:
+    """Return versions and the machine of a run"""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "joserfc": _version("joserfc"),
+        "cryptography": _version("cryptography"),
+        "joserfc_wrapper": _version("joserfc-wrapper"),
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """
+    Run benchmarks and write JSON results
+
+    :returns: exit code, 1 when a regression against a baseline is found
+    :rtype: int
+    """
+    args = _parser().parse_args(argv)
+    policy = KeyPolicy(args.alg, args.enc_alg, args.enc)
+    modes = [("threads", n) for n in args.threads]
+    modes += [("processes", n) for n in args.processes]
+
+    results = []
+    with ExitStack() as stack:
+        directory = stack.enter_context(tempfile.TemporaryDirectory())
+        url = ""
+        if "vault" in args.storage:
+            url = stack.enter_context(VaultServer()).url
+
+        for storage in args.storage:
+            path = os.path.join(directory, storage)
+            os.makedirs(path)
+            spec, samples = prepare(
+                storage, path, url, policy, args.flush_every, args.key_cache
+            )
+            for operation in args.operations:
+                for mode, workers in modes:
+                    result = run(
+                        spec,
+                        samples,
+                        operation,
+                        mode,
+                        workers,
+                        args.iterations,
+                        args.warmup,
+                    )
+                    results.append(result)
+                    print(_line(result), file=sys.stderr)
+
+    document = {
+        "schema": SCHEMA,
+        "environment": environment(),
+        "config": {
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "policy": policy.as_dict(),
+            "flush_every": args.flush_every,
+            "key_cache": args.key_cache,
+        },
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+def _process_task(
+    spec: dict, samples: dict, operation: str, iterations: int, warmup: int
+) -> tuple[int, int, list[int]]:
+    """Build own keys and wrappers and run an operation in a process"""
+    return measure(Bench(spec, samples), operation, iterations, warmup)
+
+
+def _storage(spec: dict) -> AbstractKeyStorage:
+    """Return a storage of a spec"""
+    if spec["storage"] == "file":
+        return StorageFile(spec["directory"])
+    if spec["storage"] == "vault":
+        return StorageVault(spec["url"], "token", "secret")
+    if spec["storage"] == "memory":
+        storage = StorageMemory()
+        for kid, data in spec["keys"].items():
+            storage.save_keys(kid, data)
+        return storage
+    raise ValueError(f"Unknown storage '{spec['storage']}'.")
+
+
+def _percentile(latencies: list[int], percent: float) -> float:
+    """Return a nearest-rank percentile of sorted latencies in us"""
+    rank = max(1, -(-len(latencies) * percent // 100))
+    return round(latencies[int(rank) - 1] / 1e3, 2)
+
+
+def _result_key(result: dict) -> tuple:
+    return (
+        result["storage"],
+        result["operation"],
+        result["mode"],
+        result["workers"],
+    )
+
+
+def _line(result: dict) -> str:
+    """Return a result as a line of a progress output"""
+    latency = result["latency_us"]
+    return (
+        f"{result['storage']:<7} {result['operation']:<9}"
+        f"{result['mode']:>10} x{result['workers']:<3}"
+        f"{result['ops_per_sec']:>12.1f} ops/s"
+        f"  p50 {latency['p50']:.1f} us  p99 {latency['p99']:.1f} us"
+    )
+
+
+def _version(package: str) -> str:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _csv(choices: Sequence[str]) -> Callable[[str], list[str]]:
+    def parse(value: str) -> list[str]:
+        items = [item for item in value.split(",") if item]
+        for item in items:
+            if item not in choices:
+                raise argparse.ArgumentTypeError(f"invalid choice: {item}")
+        return items
+
+    return parse
+
+
+def _counts(value: str) -> list[int]:
+    try:
+        counts = [int(item) for item in value.split(",") if item]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from e
+    if any(count < 1 for count in counts):
+        raise argparse.ArgumentTypeError("counts must be positive")
+    return counts
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__
+    )
+    parser.add_argument(
+        "--storage",
+        type=_csv(STORAGES),
+        default=list(STORAGES),
+        help="comma separated storages (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--operations",
+        type=_csv(OPERATIONS),
+        default=list(OPERATIONS),
+        help="comma separated operations (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--threads",
+        type=_counts,
+        default=[1, 4],
+        help="comma separated numbers of threads (default: 1,4)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=_counts,
+        default=[2],
+        help="comma separated numbers of processes, '' = none (default: 2)",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=1000,
+        help="calls per thread or process (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=20,
+        help="not measured calls per thread or process (default: %(default)s)",
+    )
+    parser.add_argument("--alg", default="ES256", help="signature algorithm")
+    parser.add_argument("--enc-alg", default="A128KW", help="key management")
+    parser.add_argument("--enc", default="A128GCM", help="content encryption")
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=1,
+        help="WrapJWK flush_every of create (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--key-cache",
+        action="store_true",
+        help="WrapJWK with a KeyCache (default: keys are loaded every call)",
+    )
+    parser.add_argument(
+        "--output", default="-", help="JSON results file, '-' = stdout"
+    )
+    parser.add_argument(
+        "--baseline", default="", help="JSON results of an older run"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed throughput drop against the baseline (default: 0.2)",
+    )
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(main())
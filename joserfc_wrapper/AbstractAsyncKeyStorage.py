@@ -0,0 +1,68 @@
+""" Async storage interface """
+from abc import ABC, abstractmethod
+from joserfc_wrapper.Exceptions import KeyNotFoundError
+
+
+class AbstractAsyncKeyStorage(ABC):
+    """Abstract methods for keys storage used from asyncio code"""
+
+    #: exceptions of 'load_keys' which mean the Key ID does not exist
+    missing_errors: tuple[type[Exception], ...] = (KeyNotFoundError,)
+
+    @abstractmethod
+    async def get_last_kid(self) -> str:
+        """
+        Return last Key ID
+
+        :returns: Last Key ID
+        :rtype: str
+        :raises: Any
+        """
+        pass
+
+    @abstractmethod
+    async def load_keys(self, kid: str = "") -> tuple[str, dict]:
+        """
+        Load keys from a storage
+
+        The same contract as AbstractKeyStorage.load_keys.
+
+        :param kid: Key ID
+        :type kid: str
+        :returns: Key ID, Keys (by default last keys)
+        :rtype: tuple[str, dict]
+        :raises Any:
+        """
+        pass
+
+    @abstractmethod
+    async def save_keys(self, kid: str, keys: dict) -> None:
+        """
+        Save keys to a storage
+
+        :param kid: - unicate Key ID
+        :type kid: str
+        :param keys: - { keys: { 'public': dict, 'private': dict } }
+        :type keys: dict
+        :returns: None
+        :raises: Any
+        """
+        pass
+
+    async def add_counter(self, kid: str, amount: int) -> int:
+        """
+        Add a number of signed tokens to the counter of keys
+
+        :param kid: Key ID
+        :type kid: str
+        :param amount: number of newly signed tokens
+        :type amount: int
+        :returns: counter after the update
+        :rtype: int
+        :raises: Any
+        """
+        kid, result = await self.load_keys(kid)
+        keys = result["data"]
+        keys["counter"] += amount
+        await self.save_keys(kid, keys)
+        return keys["counter"]
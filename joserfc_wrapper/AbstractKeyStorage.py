@@ -1,10 +1,14 @@
 """ Storage interface """
 from abc import ABC, abstractmethod
+from joserfc_wrapper.Exceptions import KeyNotFoundError
 
 
 class AbstractKeyStorage(ABC):
     """Abstract methods for keys storage"""
 
+    #: exceptions of 'load_keys' which mean the Key ID does not exist
+    missing_errors: tuple[type[Exception], ...] = (KeyNotFoundError,)
+
     @abstractmethod
     def get_last_kid(self) -> str:
         """
@@ -52,6 +56,101 @@ class AbstractKeyStorage(ABC):
         """
         pass
 
+    def add_counter(self, kid: str, amount: int) -> int:
+        """
+        Add a number of signed tokens to the counter of keys
+
+        The default implementation loads and saves the whole keys.
+        Storages should override it with a cheaper update which
+        does not change the last Key ID.
+
+        :param kid: Key ID
+        :type kid: str
+        :param amount: number of newly signed tokens
+        :type amount: int
+        :returns: counter after the update
+        :rtype: int
+        :raises: Any
+        """
+        kid, result = self.load_keys(kid)
+        keys = result["data"]
+        keys["counter"] += amount
+        self.save_keys(kid, keys)
+        return keys["counter"]
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """
+        Save keys to a storage without changing the last Key ID
+
+        :param kid: - unicate Key ID
+        :type kid: str
+        :param keys: - { keys: { 'public': dict, 'private': dict },
+            counter: int }
+        :type keys: dict
+        :returns: None
+        :raises NotImplementedError: the storage does not support it
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support staging of keys."
+        )
+
+    def retire_keys(self, kid: str, retired: float) -> None:
+        """
+        Save when keys were replaced by newer keys (stopped signing)
+
+        The default implementation loads and stages the whole keys.
+        Storages should override it with a cheaper update.
+
+        :param kid: Key ID
+        :type kid: str
+        :param retired: UNIX time of the replacement
+        :type retired: float
+        :returns: None
+        :raises NotImplementedError: the storage does not support it
+        """
+        kid, result = self.load_keys(kid)
+        keys = dict(result["data"])
+        keys["retired"] = retired
+        self.stage_keys(kid, keys)
+
+    def list_kids(self) -> list[str]:
+        """
+        Return all Key IDs in a storage
+
+        :returns: Key IDs
+        :rtype: list[str]
+        :raises NotImplementedError: the storage does not support it
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support listing of keys."
+        )
+
+    def delete_keys(self, kid: str) -> None:
+        """
+        Delete keys from a storage, the last Key ID is not changed
+
+        :param kid: Key ID
+        :type kid: str
+        :returns: None
+        :raises NotImplementedError: the storage does not support it
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support deleting of keys."
+        )
+
+    def publish_kid(self, kid: str) -> None:
+        """
+        Make keys saved before (e.g. by 'stage_keys') the last keys
+
+        Storages implement '_save_last_id', other objects call this.
+
+        :param kid: Key ID
+        :type kid: str
+        :returns: None
+        :raises: Any
+        """
+        self._save_last_id(kid)
+
     @abstractmethod
     def _save_last_id(self, kid: str) -> None:
         """
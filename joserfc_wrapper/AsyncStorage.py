@@ -0,0 +1,35 @@
+""" async adapter for storages """
+import asyncio
+from joserfc_wrapper.Exceptions import ObjectTypeError
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+from joserfc_wrapper.AbstractAsyncKeyStorage import AbstractAsyncKeyStorage
+
+
+class AsyncStorage(AbstractAsyncKeyStorage):
+    """Run blocking storage calls in a worker thread"""
+
+    def __init__(self, storage: AbstractKeyStorage) -> None:
+        """
+        :param storage: Storage object with blocking I/O
+        :type AbstractKeyStorage:
+        """
+        if not isinstance(storage, AbstractKeyStorage):
+            raise ObjectTypeError
+        self.storage = storage
+        self.missing_errors = storage.missing_errors
+
+    async def get_last_kid(self) -> str:
+        """Return last Key ID"""
+        return await asyncio.to_thread(self.storage.get_last_kid)
+
+    async def load_keys(self, kid: str = "") -> tuple[str, dict]:
+        """Load keys"""
+        return await asyncio.to_thread(self.storage.load_keys, kid)
+
+    async def save_keys(self, kid: str, keys: dict) -> None:
+        """Save keys"""
+        await asyncio.to_thread(self.storage.save_keys, kid, keys)
+
+    async def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter"""
+        return await asyncio.to_thread(self.storage.add_counter, kid, amount)
@@ -0,0 +1,14 @@
+""" async file manipulation class """
+from joserfc_wrapper.AsyncStorage import AsyncStorage
+from joserfc_wrapper.StorageFile import StorageFile
+
+
+class AsyncStorageFile(AsyncStorage):
+    """StorageFile for asyncio, file I/O runs in a worker thread"""
+
+    def __init__(self, cert_dir: str) -> None:
+        """
+        :param cert_dir: - path to the directory with certificates
+        :type str:
+        """
+        super().__init__(StorageFile(cert_dir))
@@ -0,0 +1,61 @@
+""" async vault manipulation class """
+import requests
+from joserfc_wrapper.AsyncStorage import AsyncStorage
+from joserfc_wrapper.StorageVault import StorageVault
+
+
+class AsyncStorageVault(AsyncStorage):
+    """StorageVault for asyncio, hvac requests run in a worker thread"""
+
+    def __init__(
+        self,
+        url: str = "",
+        token: str = "",
+        mount: str = "",
+        kv_version: int = 1,
+        timeout: float = 30,
+        pool_size: int = 10,
+        retries: int = 3,
+        backoff: float = 0.1,
+        inline_last_keys: bool = False,
+        session: requests.Session | None = None,
+    ) -> None:
+        """
+        :param url: - Vault URL
+        :type str:
+        :param token: - Token
+        :type str:
+        :param mount: - Vault mount point
+        :type str:
+        :param kv_version: - KV secrets engine version, 1 or 2
+        :type int:
+        :param timeout: - seconds to wait for a Vault response
+        :type float:
+        :param pool_size: - kept-alive connections to Vault, also the
+            number of concurrent requests from worker threads
+        :type int:
+        :param retries: - retries of failed connections and 5xx responses
+            of reads, writes are not repeated after a sent request
+        :type int:
+        :param backoff: - backoff factor between retries in seconds
+        :type float:
+        :param inline_last_keys: - keep the last keys and their counter
+            in the last Key ID secret, the last keys are loaded by one request
+        :type bool:
+        :param session: - own requests session, pool options are not used
+        :type requests.Session | None:
+        """
+        super().__init__(
+            StorageVault(
+                url=url,
+                token=token,
+                mount=mount,
+                kv_version=kv_version,
+                timeout=timeout,
+                pool_size=pool_size,
+                retries=retries,
+                backoff=backoff,
+                inline_last_keys=inline_last_keys,
+                session=session,
+            )
+        )
@@ -0,0 +1,66 @@
+""" joserfc jwe wrapper for asyncio """
+from joserfc import jwe
+from joserfc_wrapper.Exceptions import ObjectTypeError
+from joserfc_wrapper.AsyncWrapJWK import AsyncWrapJWK
+from joserfc_wrapper.WrapJWE import _header_kid
+
+
+class AsyncWrapJWE:
+    """Encrypt and decrypt custom data from asyncio code"""
+
+    def __init__(self, wrapjwk: AsyncWrapJWK) -> None:
+        """
+        :param wrapjwk: async keys wrapper
+        :type AsyncWrapJWK:
+        """
+        if not isinstance(wrapjwk, AsyncWrapJWK):
+            raise ObjectTypeError
+        self.__jwk = wrapjwk
+
+    async def encrypt(self, data: str | bytes, kid: str = "") -> str:
+        """
+        Encrypt string or bytes with key
+
+        :param data: Secret string
+        :type str:
+        :returns: Encrypted strig with last valid key
+        :rtype str:
+        :raise TypeError:
+        """
+        if isinstance(data, (str, bytes)):
+            keyset = await self.__jwk.load_keys(kid)
+            policy = keyset.policy
+            protected = {
+                "alg": policy.enc_alg,
+                "enc": policy.enc,
+                "kid": keyset.kid,
+            }
+            return jwe.encrypt_compact(
+                protected,
+                data,
+                keyset.encryption_key,
+                registry=policy.encryption_registry(),
+            )
+        raise TypeError("Bad type of data.")
+
+    async def decrypt(self, data: str, kid: str = "") -> bytes | None:
+        """
+        Decrypt string or bytes with key
+
+        :param data: Secret string
+        :type str:
+        :param kid: Key ID, default the Key ID in the JWE header or
+            the last keys
+        :type str:
+        :returns: Decrypted strig with last valid key
+        :rtype bytes | None:
+        :raise TypeError:
+        """
+        if isinstance(data, str):
+            keyset = await self.__jwk.load_keys(kid or _header_kid(data))
+            return jwe.decrypt_compact(
+                data,
+                keyset.encryption_key,
+                registry=keyset.policy.encryption_registry(),
+            ).plaintext
+        raise TypeError("Bad type of data")
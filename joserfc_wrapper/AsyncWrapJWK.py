@@ -0,0 +1,250 @@
+""" joserfc jwk wrapper for asyncio """
+import asyncio
+from collections import OrderedDict
+from joserfc_wrapper.Exceptions import KeyNotFoundError, ObjectTypeError
+from joserfc_wrapper.AbstractAsyncKeyStorage import AbstractAsyncKeyStorage
+from joserfc_wrapper.KeyCache import KeyCache
+from joserfc_wrapper.NegativeCache import NegativeCache
+from joserfc_wrapper.KeyPolicy import KeyPolicy
+from joserfc_wrapper.KeySet import KeySet
+
+
+class AsyncWrapJWK:
+    """Handles loading and saving of keys from asyncio code"""
+
+    def __init__(
+        self,
+        storage: AbstractAsyncKeyStorage,
+        cache: KeyCache | None = None,
+        flush_every: int = 1,
+        negative_cache: NegativeCache | None = None,
+        policy: KeyPolicy | None = None,
+    ) -> None:
+        """
+        :param storage: Async storage object
+        :type AbstractAsyncKeyStorage:
+        :param cache: Cache for loaded keys, default None (no cache)
+        :type KeyCache | None:
+        :param flush_every: Persist the counter after this number of
+            signed tokens, default 1 (every token)
+        :type int:
+        :param negative_cache: Cache for Key IDs missing in the storage,
+            default NegativeCache()
+        :type NegativeCache | None:
+        :param policy: Key types and algorithms of generated keys,
+            default KeyPolicy()
+        :type KeyPolicy | None:
+        """
+        if not isinstance(storage, AbstractAsyncKeyStorage):
+            raise ObjectTypeError
+        if cache is not None and not isinstance(cache, KeyCache):
+            raise ObjectTypeError
+        if negative_cache is not None and not isinstance(
+            negative_cache, NegativeCache
+        ):
+            raise ObjectTypeError
+        if policy is not None and not isinstance(policy, KeyPolicy):
+            raise ObjectTypeError
+        self.__storage = storage
+        self.__cache = cache
+        self.__negative = (
+            NegativeCache() if negative_cache is None else negative_cache
+        )
+        self.__policy = policy or KeyPolicy()
+
+        # running storage loads, concurrent loads of a kid share one call
+        self.__loading: dict[str, asyncio.Future] = {}
+
+        # keys with imported key objects per Key ID
+        self.__keysets: OrderedDict[str, KeySet] = OrderedDict()
+        self.__keysets_maxsize = cache.maxsize if cache is not None else 16
+
+        # keys used for signing and their counter
+        self.__kid = ""
+        self.__counter = 0
+        self.__pending = 0
+        self.__flush_every = max(1, flush_every)
+        self.__rotate_lock = asyncio.Lock()
+        self.__rotations = 0
+
+    def get_kid(self) -> str:
+        """Return Key ID used for signing"""
+        return self.__kid
+
+    def get_counter(self) -> int:
+        """Return token counter of the signing keys"""
+        return self.__counter
+
+    def get_policy(self) -> KeyPolicy:
+        """Return key types and algorithms of generated keys"""
+        return self.__policy
+
+    def get_negative_cache(self) -> NegativeCache:
+        """Return cache of Key IDs missing in the storage"""
+        return self.__negative
+
+    async def load_keys(self, kid: str = "") -> KeySet:
+        """
+        Load keys from a storage
+
+        :param kid: Unique key ID, default last keys
+        :type str:
+        :returns: keys
+        :rtype KeySet:
+        """
+        kid, data = await self.__load(kid)
+        return self.__keyset(kid, data)
+
+    async def generate_keys(self) -> KeySet:
+        """
+        Generate new keys and save them as the last keys
+
+        :raises GenerateKeysError:
+        :returns: new keys
+        :rtype KeySet:
+        """
+        # counted tokens belong to the previous keys
+        await self.flush_counter()
+
+        keyset = KeySet.generate(self.__policy)
+        keys = {
+            "keys": keyset.as_dict(),
+            "counter": 0,
+            "created": keyset.created,
+        }
+        await self.__storage.save_keys(keyset.kid, keys)
+
+        if self.__cache is not None:
+            self.__cache.set(keyset.kid, keys)
+            self.__cache.set_last_kid(keyset.kid)
+        self.__rotations += 1
+        self.__kid = keyset.kid
+        self.__counter = 0
+        return self.__keyset(keyset.kid, keys, keyset)
+
+    async def signing_keys(self, payload: int = 0) -> KeySet:
+        """
+        Return last keys for signing one token and count the token
+
+        :param payload: 0 = unlimited, otherwise new keys are generated
+            when the keys signed this number of tokens
+        :type int:
+        :returns: keys
+        :rtype KeySet:
+        """
+        rotations = self.__rotations
+        kid, data = await self.__load("")
+        # keys rotated while loading are newer than the loaded keys
+        if rotations == self.__rotations:
+            if kid != self.__kid:
+                await self.flush_counter()
+                self.__kid = kid
+                self.__counter = data["counter"]
+            else:
+                # the storage does not know about tokens counted in memory
+                self.__counter = max(
+                    self.__counter, data["counter"] + self.__pending
+                )
+
+        if payload and self.__counter >= payload:
+            async with self.__rotate_lock:
+                # keys may be rotated by a concurrent task meanwhile
+                if self.__counter >= payload:
+                    await self.generate_keys()
+
+        if self.__kid != kid:
+            kid = self.__kid
+            keyset = self.__keysets.get(kid)
+            # evicted by other loads while waiting for the rotation
+            if keyset is None:
+                kid, data = await self.__load(kid)
+                keyset = self.__keyset(kid, data)
+        else:
+            keyset = self.__keyset(kid, data)
+        self.__counter += 1
+        self.__pending += 1
+        return keyset
+
+    async def save_counter(self) -> None:
+        """Save the counter when 'flush_every' tokens were counted"""
+        if self.__pending >= self.__flush_every:
+            await self.flush_counter()
+
+    async def flush_counter(self) -> None:
+        """Save all counted tokens to a storage immediately"""
+        if not self.__pending:
+            return
+        kid, amount = self.__kid, self.__pending
+        # tokens counted while waiting for the storage stay pending
+        self.__pending = 0
+        try:
+            total = await self.__storage.add_counter(kid, amount)
+        except Exception:
+            self.__pending += amount
+            raise
+
+        if kid == self.__kid:
+            self.__counter = max(self.__counter, total)
+        if self.__cache is not None and kid in self.__keysets:
+            keyset = self.__keysets[kid]
+            keys = {
+                "keys": keyset.as_dict(),
+                "counter": total,
+                "created": keyset.created,
+            }
+            self.__cache.set(kid, keys)
+
+    async def __load(self, kid: str) -> tuple[str, dict]:
+        """Load keys from the cache, or from the storage on a cache miss"""
+        # repeated unknown Key IDs never reach the storage
+        if kid and self.__negative.is_missing(kid):
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+        if self.__cache is not None:
+            cached_kid = kid or self.__cache.get_last_kid()
+            if cached_kid:
+                data = self.__cache.get(cached_kid)
+                if data is not None:
+                    return cached_kid, data
+
+        future = self.__loading.get(kid)
+        if future is None:
+            future = asyncio.ensure_future(self.__load_storage(kid))
+            self.__loading[kid] = future
+            future.add_done_callback(lambda _: self.__loading.pop(kid, None))
+        # a cancelled waiter must not cancel the load for other waiters
+        return await asyncio.shield(future)
+
+    async def __load_storage(self, kid: str) -> tuple[str, dict]:
+        """Load keys from the storage and save them to the cache"""
+        try:
+            loaded_kid, result = await self.__storage.load_keys(kid)
+        except self.__storage.missing_errors as error:
+            if not kid:
+                raise
+            self.__negative.add(kid)
+            if isinstance(error, KeyNotFoundError):
+                raise
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.") from error
+        if self.__cache is not None:
+            self.__cache.set(loaded_kid, result["data"])
+            if kid == "":
+                self.__cache.set_last_kid(loaded_kid)
+        return loaded_kid, result["data"]
+
+    def __keyset(
+        self, kid: str, data: dict, keyset: KeySet | None = None
+    ) -> KeySet:
+        """Return keys with imported key objects for a Key ID"""
+        if kid in self.__keysets:
+            self.__keysets.move_to_end(kid)
+            return self.__keysets[kid]
+
+        keyset = self.__keysets[kid] = keyset or KeySet(
+            kid, data["keys"], data.get("created", 0)
+        )
+        while (
+            self.__keysets_maxsize
+            and len(self.__keysets) > self.__keysets_maxsize
+        ):
+            self.__keysets.popitem(last=False)
+        return keyset
@@ -0,0 +1,87 @@
+""" joserfc jwt wrapper for asyncio """
+import time
+from joserfc import jwt
+from joserfc.jwt import Token
+from joserfc_wrapper.Exceptions import ObjectTypeError
+from joserfc_wrapper.AsyncWrapJWK import AsyncWrapJWK
+from joserfc_wrapper.KeyPolicy import KeyPolicy
+from joserfc_wrapper.TokenParser import TokenParser
+from joserfc_wrapper.ClaimsValidator import ClaimsValidator
+from joserfc_wrapper.WrapJWT import WrapJWT
+
+
+class AsyncWrapJWT:
+    """Handles for JWT from asyncio code"""
+
+    def __init__(
+        self,
+        wrapjwk: AsyncWrapJWK,
+        parser: TokenParser | None = None,
+        validator: ClaimsValidator | None = None,
+    ) -> None:
+        """
+        :param wrapjwk: async keys wrapper
+        :type AsyncWrapJWK:
+        :param parser: Token parser, default TokenParser() allowing
+            all signature algorithms of KeyPolicy
+        :type TokenParser | None:
+        :param validator: Claims of decoded tokens are validated,
+            default None (only the signature is verified)
+        :type ClaimsValidator | None:
+        """
+        if not isinstance(wrapjwk, AsyncWrapJWK):
+            raise ObjectTypeError
+        if validator is not None and not isinstance(validator, ClaimsValidator):
+            raise ObjectTypeError
+        self.__jwk = wrapjwk
+        # every token is verified only by the algorithm of its keys
+        self.__parser = parser or TokenParser(algorithms=KeyPolicy.SIGNATURES)
+        self.__validator = validator
+
+    async def decode(self, token: str) -> Token:
+        """
+        Decode token
+
+        :param token: Token to decode
+        :type str:
+        :returns: object
+        :rtype Token:
+        :raise TokenKidInvalidError:
+        :raise TokenMalformedError:
+        :raise InvalidClaimError: invalid claims (with a validator)
+        """
+        parsed = self.__parser.parse(token)
+        keyset = await self.__jwk.load_keys(parsed.headers()["kid"])
+        decoded = self.__parser.verify(
+            parsed, keyset.verifying_key, keyset.policy.alg
+        )
+        if self.__validator is not None:
+            self.__validator.validate(decoded)
+        return decoded
+
+    async def create(self, claims: dict, payload: int = 0) -> str:
+        """
+        Create a JWT Token with claims and signed with existing key.
+
+        :param claims:
+        :type dict:
+        :param payload: see WrapJWT.create
+        :type int:
+        :raises CreateTokenException:
+        :returns: jwt token
+        :rtype str:
+        """
+        WrapJWT.check_claims(claims)
+
+        keyset = await self.__jwk.signing_keys(payload)
+        headers = {"alg": keyset.policy.alg, "kid": keyset.kid}
+        claims["iat"] = int(time.time())  # actual unix timestamp
+        token = jwt.encode(
+            headers,
+            claims,
+            keyset.signing_key,
+            registry=keyset.policy.signing_registry(),
+        )
+
+        await self.__jwk.save_counter()
+        return token
@@ -0,0 +1,136 @@
+""" precompiled claims validator """
+import time
+from typing import Any, Callable, Iterable
+from joserfc.errors import (
+    ExpiredTokenError,
+    InvalidClaimError,
+    MissingClaimError,
+)
+from joserfc.jwt import Token
+
+
+class ClaimsValidator:
+    """Validate claims of many tokens against the same expectations
+
+    Expected values and required claims are compiled once, validation
+    of a token does no other setup. Time claims ('exp', 'nbf', 'iat')
+    are checked when a token has them, with 'leeway' seconds for clock
+    skew. Errors are the joserfc claim errors, the same as raised by
+    joserfc.jwt.JWTClaimsRegistry. One object can be shared by threads.
+    """
+
+    def __init__(
+        self,
+        claims: dict | None = None,
+        required: Iterable[str] = (),
+        leeway: int = 0,
+        now: Callable[[], float] | None = None,
+    ) -> None:
+        """
+        :param claims: - expected values, { name: value }, a list, tuple
+            or set is a choice of allowed values
+        :type dict | None:
+        :param required: - claims which must be present, e.g. ('exp',),
+            the claims with expected values are always required
+        :type Iterable[str]:
+        :param leeway: - seconds of allowed clock skew
+        :type int:
+        :param now: - clock returning UNIX time, default time.time
+        :type Callable[[], float] | None:
+        """
+        claims = claims or {}
+        self.leeway = leeway
+        self.__now = now or time.time
+        # (name, allowed values) of expected claims
+        self.__expected = tuple(
+            (name, self.__compile(value)) for name, value in claims.items()
+        )
+        self.__required = tuple(sorted(set(claims) | set(required)))
+
+    @property
+    def required(self) -> tuple[str, ...]:
+        """Names of required claims"""
+        return self.__required
+
+    def validate(self, token: Token | dict) -> None:
+        """
+        Validate claims of a token
+
+        :param token: decoded token or its claims
+        :type Token | dict:
+        :raises MissingClaimError: a required claim is missing
+        :raises InvalidClaimError: unexpected value, not yet valid token
+        :raises ExpiredTokenError: expired token
+        """
+        claims = token.claims if isinstance(token, Token) else token
+
+        missing = [name for name in self.__required if claims.get(name) is None]
+        if missing:
+            raise MissingClaimError(",".join(missing))
+
+        for name, allowed in self.__expected:
+            if not self.__allowed(claims[name], allowed):
+                raise InvalidClaimError(name)
+
+        exp, nbf, iat = claims.get("exp"), claims.get("nbf"), claims.get("iat")
+        if exp is None and nbf is None and iat is None:
+            return
+        now = int(self.__now())
+        if exp is not None and self.__numeric("exp", exp) < now - self.leeway:
+            raise ExpiredTokenError("exp")
+        if nbf is not None and self.__numeric("nbf", nbf) > now + self.leeway:
+            raise InvalidClaimError("nbf", "The token is not yet valid")
+        if iat is not None and self.__numeric("iat", iat) > now + self.leeway:
+            raise InvalidClaimError("iat", "The token was issued in the future")
+
+    def is_valid(self, token: Token | dict) -> bool:
+        """
+        Return True when claims of a token are valid
+
+        :param token: decoded token or its claims
+        :type Token | dict:
+        :rtype: bool
+        """
+        try:
+            self.validate(token)
+            return True
+        except (MissingClaimError, InvalidClaimError, ExpiredTokenError):
+            return False
+
+    @staticmethod
+    def __compile(value: Any) -> frozenset | tuple:
+        """Return allowed values, a tuple when they are not hashable"""
+        values = (
+            value
+            if isinstance(value, (list, tuple, set, frozenset))
+            else (value,)
+        )
+        try:
+            return frozenset(values)
+        except TypeError:
+            # e.g. dicts, compared by equality
+            return tuple(values)
+
+    @staticmethod
+    def __allowed(value: Any, allowed: frozenset | tuple) -> bool:
+        """True when a value (or one of listed values) is allowed"""
+        if isinstance(allowed, tuple):
+            if isinstance(value, list):
+                return any(item in allowed for item in value)
+            return value in allowed
+        try:
+            if isinstance(value, list):
+                return not allowed.isdisjoint(value)
+            return value in allowed
+        except TypeError:
+            # unhashable values are never expected
+            return False
+
+    @staticmethod
+    def __numeric(name: str, value: Any) -> float:
+        """Return a NumericDate value of a time claim"""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise InvalidClaimError(
+                name, f"Claim '{name}' must be a NumericDate value"
+            )
+        return value
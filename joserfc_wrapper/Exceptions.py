@@ -34,6 +34,10 @@ class KeysLoadError(WrapperErrors):
     error = "Unable to load files. Check the path is correct."
 
 
+class KeyNotFoundError(KeysLoadError):
+    error = "Key ID not found."
+
+
 # JWT
 class CreateTokenException(WrapperErrors):
     error = "Unexpected parameter in the claims."
@@ -41,3 +45,13 @@ class CreateTokenException(WrapperErrors):
 
 class TokenKidInvalidError(WrapperErrors):
     error = "Invalid KID in token."
+
+
+class TokenMalformedError(TokenKidInvalidError):
+    # a subclass, callers which catch invalid KIDs catch garbage tokens too
+    error = "Malformed token."
+
+
+# JWE
+class StreamDecryptError(WrapperErrors):
+    error = "Invalid encrypted stream."
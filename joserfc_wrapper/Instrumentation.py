@@ -0,0 +1,97 @@
+""" instrumentation interface """
+import time
+from contextlib import nullcontext
+from types import TracebackType
+from typing import ContextManager
+
+# shared context of disabled stages, entering it does nothing
+_NOOP: ContextManager[None] = nullcontext()
+
+
+class Instrumentation:
+    """No-op instrumentation, the base of metrics adapters
+
+    Wrappers report durations of stages (e.g. 'storage.load_keys',
+    'jwt.verify'), counters (e.g. 'key_cache.hits', 'storage.errors')
+    and events (e.g. 'keys.rotated') here. Subclasses override observe,
+    count and event and set 'enabled' to True, stages of a disabled
+    instrumentation are not timed at all.
+    """
+
+    #: False = stages are not timed and storages are not wrapped
+    enabled = False
+
+    def stage(self, name: str, **labels: str) -> ContextManager[None]:
+        """
+        Return a context manager which observes the duration of a stage
+
+        :param name: - stage name, e.g. 'jwt.sign'
+        :type str:
+        :param labels: - attributes of the measurement
+        :type str:
+        :rtype: ContextManager[None]
+        """
+        if not self.enabled:
+            return _NOOP
+        return _Stage(self, name, labels)
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """
+        Record the duration of a stage
+
+        :param name: - stage name
+        :type str:
+        :param seconds: - duration
+        :type float:
+        :param labels: - attributes of the measurement
+        :type str:
+        """
+
+    def count(self, name: str, amount: int = 1, **labels: str) -> None:
+        """
+        Increase a counter
+
+        :param name: - counter name, e.g. 'token_cache.hits'
+        :type str:
+        :param amount: - increment
+        :type int:
+        :param labels: - attributes of the measurement
+        :type str:
+        """
+
+    def event(self, name: str, **labels: str) -> None:
+        """
+        Record an event, e.g. a rotation of keys
+
+        :param name: - event name, e.g. 'keys.rotated'
+        :type str:
+        :param labels: - attributes of the event, e.g. kid
+        :type str:
+        """
+
+
+class _Stage:
+    """Times one stage, the duration is observed also on an error"""
+
+    __slots__ = ("__instrumentation", "__name", "__labels", "__started")
+
+    def __init__(
+        self, instrumentation: Instrumentation, name: str, labels: dict
+    ) -> None:
+        self.__instrumentation = instrumentation
+        self.__name = name
+        self.__labels = labels
+        self.__started = 0.0
+
+    def __enter__(self) -> None:
+        self.__started = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.__instrumentation.observe(
+            self.__name, time.perf_counter() - self.__started, **self.__labels
+        )
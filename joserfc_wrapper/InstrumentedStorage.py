@@ -0,0 +1,92 @@
+""" storage adapter reporting to an instrumentation """
+from typing import Any, Callable
+from joserfc_wrapper.Exceptions import ObjectTypeError
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+from joserfc_wrapper.Instrumentation import Instrumentation
+
+
+class InstrumentedStorage(AbstractKeyStorage):
+    """Time calls of a storage and count its errors
+
+    Each call is a stage 'storage.<method>' with a 'storage' label
+    (the class of the wrapped storage). Errors are counted in
+    'storage.errors', missing Key IDs in 'storage.missing'. WrapJWK
+    wraps its storage when an enabled instrumentation is passed.
+    """
+
+    def __init__(
+        self, storage: AbstractKeyStorage, instrumentation: Instrumentation
+    ) -> None:
+        """
+        :param storage: Storage object
+        :type AbstractKeyStorage:
+        :param instrumentation: receiver of the metrics
+        :type Instrumentation:
+        """
+        if not isinstance(storage, AbstractKeyStorage):
+            raise ObjectTypeError
+        self.storage = storage
+        self.instrumentation = instrumentation
+        self.missing_errors = storage.missing_errors
+        self.__name = type(storage).__name__
+
+    def get_last_kid(self) -> str:
+        """Return last Key ID"""
+        return self.__call("get_last_kid", self.storage.get_last_kid)
+
+    def load_keys(self, kid: str = "") -> tuple[str, dict]:
+        """Load keys"""
+        return self.__call("load_keys", self.storage.load_keys, kid)
+
+    def save_keys(self, kid: str, keys: dict) -> None:
+        """Save keys"""
+        self.__call("save_keys", self.storage.save_keys, kid, keys)
+
+    def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter"""
+        return self.__call("add_counter", self.storage.add_counter, kid, amount)
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """Save keys, last Key ID is not changed"""
+        self.__call("stage_keys", self.storage.stage_keys, kid, keys)
+
+    def retire_keys(self, kid: str, retired: float) -> None:
+        """Save when keys were replaced by newer keys"""
+        self.__call("retire_keys", self.storage.retire_keys, kid, retired)
+
+    def list_kids(self) -> list[str]:
+        """Return all Key IDs"""
+        return self.__call("list_kids", self.storage.list_kids)
+
+    def delete_keys(self, kid: str) -> None:
+        """Delete keys, last Key ID is not changed"""
+        self.__call("delete_keys", self.storage.delete_keys, kid)
+
+    def publish_kid(self, kid: str) -> None:
+        """Make staged keys the last keys"""
+        self.__call("publish_kid", self.storage.publish_kid, kid)
+
+    def _save_last_id(self, kid: str) -> None:
+        """Save last Key ID"""
+        self.publish_kid(kid)
+
+    def __call(self, method: str, call: Callable, *args: Any) -> Any:
+        """Call the storage in a stage, count its errors"""
+        metrics = self.instrumentation
+        try:
+            with metrics.stage(f"storage.{method}", storage=self.__name):
+                return call(*args)
+        except NotImplementedError:
+            # an optional method, callers fall back to another one
+            raise
+        except self.missing_errors:
+            metrics.count("storage.missing", storage=self.__name)
+            raise
+        except Exception as error:
+            metrics.count(
+                "storage.errors",
+                storage=self.__name,
+                operation=method,
+                error=type(error).__name__,
+            )
+            raise
@@ -0,0 +1,135 @@
+""" JWKS document of public keys """
+import json
+import time
+import hashlib
+import threading
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+from joserfc_wrapper.Exceptions import KeysLoadError, ObjectTypeError
+
+
+class JWKSBuilder:
+    """Public keys of a storage as a JWKS document for verifiers
+
+    The document is serialized and hashed (ETag) only when the set of
+    Key IDs in the storage changes, the storage is listed at most once
+    per 'ttl' seconds. Safe for use from multiple threads.
+    """
+
+    def __init__(self, storage: AbstractKeyStorage, ttl: float = 60.0) -> None:
+        """
+        :param storage: Storage object
+        :type AbstractKeyStorage:
+        :param ttl: - seconds between checks of the storage for changed keys
+        :type float:
+        """
+        if not isinstance(storage, AbstractKeyStorage):
+            raise ObjectTypeError
+        self.__storage = storage
+        self.ttl = ttl
+        # last error of a refresh, a previous document is served meanwhile
+        self.last_error: Exception | None = None
+
+        self.__lock = threading.Lock()
+        # kid -> (generation time, public JWK)
+        self.__public: dict[str, tuple[float, dict]] = {}
+        # (serialized JWKS, ETag), replaced as a whole
+        self.__document: tuple[bytes, str] | None = None
+        self.__checked_at = float("-inf")
+
+    def get(self) -> tuple[bytes, str]:
+        """
+        Return the serialized JWKS and its ETag
+
+        :returns: JWKS document (JSON), ETag
+        :rtype: tuple[bytes, str]
+        :raises: Any, only when no document was built yet
+        """
+        if time.monotonic() - self.__checked_at >= self.ttl:
+            try:
+                self.refresh()
+            except Exception as error:
+                self.last_error = error
+                if self.__document is None:
+                    raise
+        document = self.__document
+        if document is None:
+            raise KeysLoadError("JWKS is not built.")
+        return document
+
+    def response(self, if_none_match: str = "") -> tuple[int, dict, bytes]:
+        """
+        Return an HTTP response for a (conditional) JWKS request
+
+        :param if_none_match: - value of the 'If-None-Match' header
+        :type str:
+        :returns: status (200 or 304), headers, body
+        :rtype: tuple[int, dict, bytes]
+        """
+        body, etag = self.get()
+        headers = {
+            "Content-Type": "application/jwk-set+json",
+            "Cache-Control": f"max-age={int(self.ttl)}",
+            "ETag": etag,
+        }
+        tags = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        if etag in tags or "*" in tags:
+            return 304, headers, b""
+        return 200, headers, body
+
+    def refresh(self) -> bool:
+        """
+        Check the storage for changed keys now
+
+        :returns: True when the document changed
+        :rtype: bool
+        """
+        with self.__lock:
+            kids = set(self.__list_kids())
+            changed = kids != set(self.__public)
+
+            public = {k: v for k, v in self.__public.items() if k in kids}
+            for kid in kids - public.keys():
+                # keys of a Key ID never change, they are loaded once
+                _, result = self.__storage.load_keys(kid)
+                data = result["data"]
+                if not data["keys"]["public"]:
+                    # HS256 keys have no public key, they are not published
+                    public[kid] = (data.get("created", 0), {})
+                    continue
+                public[kid] = (
+                    data.get("created", 0),
+                    {**data["keys"]["public"], "kid": kid, "use": "sig"},
+                )
+            self.__public = public
+
+            if changed or self.__document is None:
+                self.__document = self.__serialize(public)
+            self.__checked_at = time.monotonic()
+            self.last_error = None
+            return changed
+
+    def invalidate(self) -> None:
+        """Check the storage on the next request"""
+        self.__checked_at = float("-inf")
+
+    def __list_kids(self) -> list[str]:
+        """Return Key IDs in the storage"""
+        try:
+            return self.__storage.list_kids()
+        except NotImplementedError:
+            # the storage knows only the last keys
+            return [self.__storage.get_last_kid()]
+
+    @staticmethod
+    def __serialize(public: dict[str, tuple[float, dict]]) -> tuple[bytes, str]:
+        """Return the JWKS document and its ETag, the newest keys first"""
+        kids = sorted(public, key=lambda kid: (-public[kid][0], kid))
+        body = json.dumps(
+            {"keys": [public[kid][1] for kid in kids if public[kid][1]]},
+            separators=(",", ":"),
+            sort_keys=True,
+        ).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return body, etag
@@ -0,0 +1,124 @@
+""" in-process key cache """
+import time
+import threading
+from collections import OrderedDict
+
+
+class KeyCache:
+    """TTL and size bounded cache for keys loaded from a storage
+
+    The cache is safe for use from multiple threads.
+    """
+
+    def __init__(self, ttl: float = 300.0, maxsize: int = 128) -> None:
+        """
+        :param ttl: - seconds how long an entry is valid, 0 = never expire
+        :type float:
+        :param maxsize: - max. number of cached Key IDs, 0 = unlimited
+        :type int:
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__lock = threading.Lock()
+        # kid -> (expire time, keys); the oldest used entry is first
+        self.__entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        # (expire time, kid) of the last key ID in a storage
+        self.__last_kid: tuple[float, str] | None = None
+
+    def get(self, kid: str) -> dict | None:
+        """
+        Return cached keys for a Key ID
+
+        :param kid: Key ID
+        :type str:
+        :returns: keys in the storage format or None when not cached
+        :rtype: dict | None
+        """
+        with self.__lock:
+            entry = self.__entries.get(kid)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.__expired(entry[0]):
+                del self.__entries[kid]
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(kid)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, kid: str, keys: dict) -> None:
+        """
+        Save keys for a Key ID to the cache
+
+        :param kid: Key ID
+        :type str:
+        :param keys: - { keys: { 'public': dict, 'private': dict,
+            'secret': dict }, counter: int }
+        :type dict:
+        """
+        with self.__lock:
+            self.__entries[kid] = (self.__expire_at(), keys)
+            self.__entries.move_to_end(kid)
+            while self.maxsize and len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_last_kid(self) -> str | None:
+        """Return cached last Key ID or None"""
+        last_kid = self.__last_kid
+        if last_kid is None or self.__expired(last_kid[0]):
+            return None
+        return last_kid[1]
+
+    def set_last_kid(self, kid: str) -> None:
+        """Save last Key ID to the cache"""
+        self.__last_kid = (self.__expire_at(), kid)
+
+    def invalidate(self, kid: str) -> None:
+        """
+        Remove one Key ID from the cache
+
+        :param kid: Key ID
+        :type str:
+        """
+        with self.__lock:
+            self.__entries.pop(kid, None)
+            if self.__last_kid is not None and self.__last_kid[1] == kid:
+                self.__last_kid = None
+
+    def clear(self) -> None:
+        """Remove all entries, statistics are kept"""
+        with self.__lock:
+            self.__entries.clear()
+            self.__last_kid = None
+
+    def stats(self) -> dict:
+        """Return cache statistics"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.__entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, kid: object) -> bool:
+        entry = self.__entries.get(kid) if isinstance(kid, str) else None
+        return entry is not None and not self.__expired(entry[0])
+
+    def __expire_at(self) -> float:
+        if not self.ttl:
+            return float("inf")
+        return time.monotonic() + self.ttl
+
+    def __expired(self, expire_at: float) -> bool:
+        return time.monotonic() >= expire_at
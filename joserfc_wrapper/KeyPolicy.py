@@ -0,0 +1,173 @@
+""" key types and algorithms of keys """
+from functools import lru_cache
+from typing import Any
+from joserfc import jwe, jws
+from joserfc.jwk import ECKey, OctKey, OKPKey, Key
+
+
+class KeyPolicy:
+    """Key types and algorithms of one Key ID
+
+    The policy is generated and saved with the keys ('policy' in the
+    keys), tokens and encrypted data are signed, verified, encrypted
+    and decrypted by the algorithms of the keys. Keys saved without
+    a policy use the defaults (ES256, A128KW, A128GCM).
+    """
+
+    #: signature algorithm -> (key type, curve or key size)
+    SIGNATURES: dict[str, tuple[str, Any]] = {
+        "ES256": ("EC", "P-256"),
+        # EdDSA is named Ed25519 by RFC 9864
+        "EdDSA": ("OKP", "Ed25519"),
+        "Ed25519": ("OKP", "Ed25519"),
+        "HS256": ("oct", 256),
+    }
+    #: key management algorithm -> key size, 0 = the key of 'enc'
+    KEY_MANAGEMENT: dict[str, int] = {"A128KW": 128, "A256KW": 256, "dir": 0}
+    #: content encryption algorithm -> key size
+    CONTENT_ENCRYPTION: dict[str, int] = {"A128GCM": 128, "A256GCM": 256}
+    #: signature algorithm of keys without 'alg' by the key type
+    KEY_TYPES: dict[str, str] = {"EC": "ES256", "OKP": "EdDSA", "oct": "HS256"}
+
+    def __init__(
+        self, alg: str = "ES256", enc_alg: str = "A128KW", enc: str = "A128GCM"
+    ) -> None:
+        """
+        :param alg: - signature algorithm, ES256, EdDSA (Ed25519) or HS256
+        :type str:
+        :param enc_alg: - key management algorithm of encrypted data,
+            A128KW, A256KW or dir (no key wrap)
+        :type str:
+        :param enc: - content encryption algorithm, A128GCM or A256GCM
+        :type str:
+        :raises ValueError: not supported algorithm
+        """
+        if alg not in self.SIGNATURES:
+            raise ValueError(f"Signature algorithm '{alg}' is not supported.")
+        if enc_alg not in self.KEY_MANAGEMENT:
+            raise ValueError(f"Key management '{enc_alg}' is not supported.")
+        if enc not in self.CONTENT_ENCRYPTION:
+            raise ValueError(f"Content encryption '{enc}' is not supported.")
+        self.__alg = alg
+        self.__enc_alg = enc_alg
+        self.__enc = enc
+
+    @classmethod
+    def from_dict(cls, policy: dict | None) -> "KeyPolicy":
+        """
+        Return a saved policy, the defaults for keys without a policy
+
+        :param policy: - { 'alg': str, 'enc_alg': str, 'enc': str }
+        :type dict | None:
+        :rtype KeyPolicy:
+        """
+        return cls(**policy) if policy else cls()
+
+    @property
+    def alg(self) -> str:
+        """Signature algorithm"""
+        return self.__alg
+
+    @property
+    def enc_alg(self) -> str:
+        """Key management algorithm of encrypted data"""
+        return self.__enc_alg
+
+    @property
+    def enc(self) -> str:
+        """Content encryption algorithm"""
+        return self.__enc
+
+    @property
+    def symmetric(self) -> bool:
+        """True when tokens are signed by a secret (no public key)"""
+        return self.SIGNATURES[self.__alg][0] == "oct"
+
+    @property
+    def secret_size(self) -> int:
+        """Size of the secret key for encrypted data in bits"""
+        size = self.KEY_MANAGEMENT[self.__enc_alg]
+        return size or self.CONTENT_ENCRYPTION[self.__enc]
+
+    def generate(self) -> dict:
+        """
+        Generate new keys by the policy
+
+        :returns: - { 'public': dict, 'private': dict, 'secret': dict,
+            'policy': dict }, 'public' is empty for HS256
+        :rtype: dict
+        """
+        key_type, param = self.SIGNATURES[self.__alg]
+        key: ECKey | OKPKey | OctKey
+        if key_type == "EC":
+            key = ECKey.generate_key(param)
+        elif key_type == "OKP":
+            key = OKPKey.generate_key(param)
+        else:
+            key = OctKey.generate_key(param)
+        public = {} if self.symmetric else key.as_dict(private=False)
+        if public:
+            # verifiers without the policy (JWKS) read the algorithm here
+            public["alg"] = self.__alg
+        return {
+            "private": key.as_dict(private=True),
+            "public": public,
+            "secret": OctKey.generate_key(self.secret_size).as_dict(),
+            "policy": self.as_dict(),
+        }
+
+    @classmethod
+    def public_algorithms(cls) -> tuple[str, ...]:
+        """Return signature algorithms verified by a public key"""
+        return tuple(
+            alg
+            for alg, (key_type, _) in cls.SIGNATURES.items()
+            if key_type != "oct"
+        )
+
+    @classmethod
+    def key_alg(cls, key: Key) -> str:
+        """
+        Return the signature algorithm of an imported key
+
+        :param key: public key ('alg' member) or a key of older keys
+        :type Key:
+        :rtype: str
+        """
+        return key.alg or cls.KEY_TYPES.get(key.key_type, "ES256")
+
+    def signing_registry(self) -> jws.JWSRegistry:
+        """Return a JWS registry allowing only the signature algorithm"""
+        return _jws_registry(self.__alg)
+
+    def encryption_registry(self) -> jwe.JWERegistry:
+        """Return a JWE registry allowing only the algorithms of the keys"""
+        return _jwe_registry(self.__enc_alg, self.__enc)
+
+    def as_dict(self) -> dict:
+        """Return the policy, { 'alg': str, 'enc_alg': str, 'enc': str }"""
+        return {"alg": self.__alg, "enc_alg": self.__enc_alg, "enc": self.__enc}
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, KeyPolicy) and self.as_dict() == other.as_dict()
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.__alg, self.__enc_alg, self.__enc))
+
+    def __repr__(self) -> str:
+        return (
+            f"KeyPolicy(alg={self.__alg!r}, enc_alg={self.__enc_alg!r}, "
+            f"enc={self.__enc!r})"
+        )
+
+
+@lru_cache(maxsize=None)
+def _jws_registry(alg: str) -> jws.JWSRegistry:
+    return jws.JWSRegistry(algorithms=[alg])
+
+
+@lru_cache(maxsize=None)
+def _jwe_registry(enc_alg: str, enc: str) -> jwe.JWERegistry:
+    return jwe.JWERegistry(algorithms=[enc_alg, enc])
@@ -0,0 +1,232 @@
+""" background key rotation """
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+from joserfc_wrapper.Exceptions import KeysLoadError
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+from joserfc_wrapper.KeySet import KeySet
+
+if TYPE_CHECKING:
+    from joserfc_wrapper.WrapJWK import WrapJWK
+
+
+class KeyRotator:
+    """Background thread with a pool of pre-generated keys for WrapJWK
+
+    Keys in the pool are generated and saved to the storage (without
+    changing the last Key ID) before they are needed. A rotation takes
+    keys from the pool and the thread saves the last Key ID and the
+    counter of the previous keys, so signing never waits for the key
+    generation or the storage.
+
+    Use WrapJWK.start_rotation() to create it.
+    """
+
+    def __init__(
+        self,
+        jwk: WrapJWK,
+        storage: AbstractKeyStorage,
+        pool_size: int = 1,
+        period: float = 0,
+        check_interval: float = 1.0,
+        retention: float = 0,
+        max_keys: int = 0,
+    ) -> None:
+        """
+        :param jwk: - keys to rotate
+        :type WrapJWK:
+        :param storage: - storage of the keys
+        :type AbstractKeyStorage:
+        :param pool_size: - number of pre-generated keys
+        :type int:
+        :param period: - rotate keys used longer than this number of
+            seconds, 0 = rotate only when the payload limit is reached
+        :type float:
+        :param check_interval: - seconds between checks of the period
+            and retries of failed writes
+        :type float:
+        :param retention: - delete keys replaced more than this number
+            of seconds ago after a rotation, 0 = not by age
+        :type float:
+        :param max_keys: - keep at most this number of the newest keys
+            after a rotation, 0 = unlimited
+        :type int:
+        """
+        self.__jwk = jwk
+        self.__storage = storage
+        self.pool_size = max(1, pool_size)
+        self.period = period
+        self.check_interval = check_interval
+        self.retention = retention
+        self.max_keys = max_keys
+        # last error of the background thread, None after a successful run
+        self.last_error: Exception | None = None
+
+        # (keys, saved to the storage)
+        self.__pool: deque[tuple[KeySet, bool]] = deque()
+        # writes of rotations in order: (keys, previous Key ID, amount)
+        self.__tasks: deque[tuple[KeySet, str, int]] = deque()
+        self.__cond = threading.Condition()
+        self.__stopped = False
+        self.__thread = threading.Thread(
+            target=self.__run, name="KeyRotator", daemon=True
+        )
+
+    @property
+    def ready(self) -> int:
+        """Number of pre-generated keys"""
+        return len(self.__pool)
+
+    @property
+    def pool_kids(self) -> list[str]:
+        """Key IDs of pre-generated keys"""
+        with self.__cond:
+            return [keyset.kid for keyset, _ in self.__pool]
+
+    @property
+    def publishing(self) -> bool:
+        """True while the last Key ID of a rotation is not saved yet"""
+        return bool(self.__tasks)
+
+    def start(self) -> None:
+        """Start the background thread"""
+        self.__thread.start()
+
+    def stop(self, timeout: float | None = None) -> bool:
+        """
+        Save pending rotations and stop the background thread
+
+        :param timeout: - max. seconds to wait
+        :type float | None:
+        :returns: True when all rotations are saved
+        :rtype: bool
+        """
+        with self.__cond:
+            self.__stopped = True
+            self.__cond.notify_all()
+        if self.__thread.is_alive():
+            self.__thread.join(timeout)
+        return not self.__tasks
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until rotations are saved to the storage
+
+        :param timeout: - max. seconds to wait, None = no limit
+        :type float | None:
+        :returns: True when all rotations are saved
+        :rtype: bool
+        """
+        with self.__cond:
+            return self.__cond.wait_for(lambda: not self.__tasks, timeout)
+
+    def take(self) -> tuple[KeySet, bool] | None:
+        """
+        Take pre-generated keys from the pool
+
+        :returns: keys and whether they are saved to the storage,
+            None when the pool is empty
+        :rtype: tuple[KeySet, bool] | None
+        """
+        with self.__cond:
+            if not self.__pool:
+                self.__cond.notify_all()
+                return None
+            taken = self.__pool.popleft()
+            self.__cond.notify_all()
+            return taken
+
+    def publish(self, keyset: KeySet, previous_kid: str, amount: int) -> None:
+        """
+        Save the last Key ID of activated keys in background
+
+        :param keyset: - activated keys, already saved by take()
+        :type KeySet:
+        :param previous_kid: - Key ID of the replaced keys
+        :type str:
+        :param amount: - tokens signed by the replaced keys not saved yet
+        :type int:
+        """
+        with self.__cond:
+            self.__tasks.append((keyset, previous_kid, amount))
+            self.__cond.notify_all()
+
+    def __run(self) -> None:
+        while True:
+            failed = False
+            try:
+                self.__save_rotations()
+                if self.__stopped:
+                    return
+                self.__fill_pool()
+                self.__check_period()
+                self.last_error = None
+            except Exception as error:
+                self.last_error = error
+                failed = True
+
+            with self.__cond:
+                if self.__stopped and (failed or not self.__tasks):
+                    return
+                if failed or (
+                    not self.__tasks and len(self.__pool) >= self.pool_size
+                ):
+                    self.__cond.wait(self.check_interval)
+
+    def __save_rotations(self) -> None:
+        """Save last Key IDs and counters of rotations in order"""
+        while True:
+            with self.__cond:
+                if not self.__tasks:
+                    return
+                keyset, previous_kid, amount = self.__tasks[0]
+
+            if amount:
+                self.__storage.add_counter(previous_kid, amount)
+                with self.__cond:
+                    # the counter is not added again on a retry
+                    self.__tasks[0] = (keyset, previous_kid, 0)
+            self.__storage.publish_kid(keyset.kid)
+            self.__jwk.retire_keys(previous_kid)
+
+            with self.__cond:
+                self.__tasks.popleft()
+                self.__cond.notify_all()
+
+            if self.retention or self.max_keys:
+                self.__jwk.prune_keys(self.retention, self.max_keys)
+
+    def __fill_pool(self) -> None:
+        """Generate and save keys until the pool is full"""
+        while len(self.__pool) < self.pool_size and not self.__stopped:
+            with self.__jwk.get_instrumentation().stage("keys.generate"):
+                keyset = KeySet.generate(self.__jwk.get_policy())
+            try:
+                self.__storage.stage_keys(
+                    keyset.kid,
+                    {
+                        "keys": keyset.as_dict(),
+                        "counter": 0,
+                        "created": keyset.created,
+                    },
+                )
+                staged = True
+            except NotImplementedError:
+                # the keys are saved by WrapJWK when they are activated
+                staged = False
+            with self.__cond:
+                self.__pool.append((keyset, staged))
+
+    def __check_period(self) -> None:
+        """Rotate keys used longer than the period"""
+        if not self.period:
+            return
+        try:
+            age = self.__jwk.get_key_age()
+        except KeysLoadError:
+            # no keys are loaded or generated yet
+            return
+        if age >= self.period:
+            self.__jwk.rotate()
@@ -0,0 +1,110 @@
+""" keys of one key id """
+import time
+import uuid
+from typing import Any
+from joserfc import jwk
+from joserfc.jwk import OctKey
+from joserfc_wrapper.Exceptions import GenerateKeysError
+from joserfc_wrapper.KeyPolicy import KeyPolicy
+
+
+class KeySet:
+    """Read-only keys of one Key ID with imported key objects"""
+
+    def __init__(self, kid: str, keys: dict, created: float = 0) -> None:
+        """
+        :param kid: Key ID
+        :type str:
+        :param keys: - { 'public': dict, 'private': dict, 'secret': dict,
+            'policy': dict }, keys without 'policy' use KeyPolicy defaults
+        :type dict:
+        :param created: - UNIX time of the generation, 0 = unknown
+        :type float:
+        """
+        self.__kid = kid
+        self.__keys = keys
+        self.__created = created
+        self.__objects: dict[str, Any] = {}
+        self.__policy = KeyPolicy.from_dict(keys.get("policy"))
+
+    @classmethod
+    def generate(cls, policy: KeyPolicy | None = None) -> "KeySet":
+        """
+        Generate new keys with a new Key ID
+
+        :param policy: - key types and algorithms, default KeyPolicy()
+        :type KeyPolicy | None:
+        :raises GenerateKeysError:
+        :returns: new keys
+        :rtype KeySet:
+        """
+        try:
+            kid = uuid.uuid4().hex.lower()
+            keys = (policy or KeyPolicy()).generate()
+            return cls(kid, keys, time.time())
+        except Exception as e:
+            raise GenerateKeysError from e
+
+    @property
+    def kid(self) -> str:
+        """Key ID"""
+        return self.__kid
+
+    @property
+    def created(self) -> float:
+        """UNIX time of the generation, 0 = unknown"""
+        return self.__created
+
+    @property
+    def policy(self) -> KeyPolicy:
+        """Key types and algorithms"""
+        return self.__policy
+
+    @property
+    def public(self) -> dict:
+        """Public key (JWK)"""
+        return self.__keys["public"]
+
+    @property
+    def private(self) -> dict:
+        """Private key (JWK)"""
+        return self.__keys["private"]
+
+    @property
+    def secret(self) -> dict:
+        """Secret key for encrypted content (JWK)"""
+        return self.__keys["secret"]
+
+    @property
+    def verifying_jwk(self) -> dict:
+        """Key for signature verification (JWK), private for HS256"""
+        return self.private if self.__policy.symmetric else self.public
+
+    @property
+    def signing_key(self) -> jwk.Key:
+        """Imported private key"""
+        return self.__import("private")
+
+    @property
+    def verifying_key(self) -> jwk.Key:
+        """Imported public key, the secret key for HS256"""
+        if self.__policy.symmetric:
+            return self.__import("private")
+        return self.__import("public")
+
+    @property
+    def encryption_key(self) -> OctKey:
+        """Imported secret key"""
+        return self.__import("secret")
+
+    def as_dict(self) -> dict:
+        """Return keys, { 'public': dict, 'private': dict, 'secret': dict,
+        'policy': dict }"""
+        return dict(self.__keys)
+
+    def __import(self, name: str) -> Any:
+        """Import a key once, keys of a Key ID never change"""
+        key = self.__objects.get(name)
+        if key is None:
+            key = self.__objects[name] = jwk.import_key(self.__keys[name])
+        return key
@@ -0,0 +1,189 @@
+""" in-process metrics of the instrumentation """
+import re
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Iterable
+from joserfc_wrapper.Instrumentation import Instrumentation
+
+# default histogram buckets in seconds, from signing to slow storages
+BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+class MetricsRecorder(Instrumentation):
+    """Keep metrics in memory, no collector or agent is needed
+
+    Durations are histograms with fixed buckets, counters are sums,
+    both per name and labels, like OpenTelemetry histograms and counters
+    with attributes. The metrics are read by snapshot() or rendered in
+    the Prometheus text format for a /metrics endpoint. The recorder is
+    safe for use from multiple threads.
+    """
+
+    enabled = True
+
+    def __init__(
+        self,
+        buckets: Iterable[float] = BUCKETS,
+        prefix: str = "joserfc_wrapper",
+        max_events: int = 100,
+    ) -> None:
+        """
+        :param buckets: - upper bounds of histogram buckets in seconds
+        :type Iterable[float]:
+        :param prefix: - prefix of Prometheus metric names
+        :type str:
+        :param max_events: - number of the last kept events
+        :type int:
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self.__lock = threading.Lock()
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.__histograms: dict[tuple[str, tuple], list[float]] = {}
+        # (name, labels) -> value
+        self.__counters: dict[tuple[str, tuple], float] = {}
+        # (UNIX time, name, labels) of the last events
+        self.__events: deque[tuple[float, str, dict]] = deque(maxlen=max_events)
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Record the duration of a stage"""
+        key = (name, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, seconds)
+        with self.__lock:
+            values = self.__histograms.get(key)
+            if values is None:
+                values = self.__histograms[key] = [0.0] * (
+                    len(self.buckets) + 2
+                )
+            values[index] += 1
+            values[-1] += seconds
+
+    def count(self, name: str, amount: int = 1, **labels: str) -> None:
+        """Increase a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + amount
+
+    def event(self, name: str, **labels: str) -> None:
+        """Record an event, events are counted in 'events'"""
+        with self.__lock:
+            self.__events.append((time.time(), name, labels))
+        self.count("events", event=name)
+
+    def reset(self) -> None:
+        """Remove all metrics"""
+        with self.__lock:
+            self.__histograms.clear()
+            self.__counters.clear()
+            self.__events.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Return all metrics
+
+        :returns: {
+            'histograms': [ { 'name': str, 'labels': dict, 'count': int,
+                'sum': float, 'buckets': { upper bound: cumulative count },
+                } ],
+            'counters': [ { 'name': str, 'labels': dict, 'value': float } ],
+            'events': [ { 'time': float, 'name': str, 'labels': dict } ] }
+        :rtype: dict
+        """
+        with self.__lock:
+            histograms = [(k, list(v)) for k, v in self.__histograms.items()]
+            counters = list(self.__counters.items())
+            events = list(self.__events)
+
+        result: dict[str, list] = {"histograms": [], "counters": []}
+        for (name, labels), values in sorted(histograms):
+            cumulative, total = [], 0
+            for count in values[:-1]:
+                total += int(count)
+                cumulative.append(total)
+            bounds = [*self.buckets, float("inf")]
+            result["histograms"].append(
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": total,
+                    "sum": values[-1],
+                    "buckets": dict(zip(bounds, cumulative)),
+                }
+            )
+        for (name, labels), value in sorted(counters):
+            result["counters"].append(
+                {"name": name, "labels": dict(labels), "value": value}
+            )
+        result["events"] = [
+            {"time": at, "name": name, "labels": labels}
+            for at, name, labels in events
+        ]
+        return result
+
+    def render_prometheus(self) -> str:
+        """
+        Return metrics in the Prometheus text exposition format
+
+        Stage durations are one histogram '<prefix>_stage_duration_seconds'
+        with a 'stage' label, counters are '<prefix>_<name>_total'.
+
+        :rtype: str
+        """
+        snapshot = self.snapshot()
+        lines = []
+        if snapshot["histograms"]:
+            metric = f"{self.prefix}_stage_duration_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+        for item in snapshot["histograms"]:
+            labels = {"stage": item["name"], **item["labels"]}
+            for bound, count in item["buckets"].items():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket = _labels({**labels, "le": le})
+                lines.append(f"{metric}_bucket{bucket} {count}")
+            lines.append(f"{metric}_sum{_labels(labels)} {item['sum']!r}")
+            lines.append(f"{metric}_count{_labels(labels)} {item['count']}")
+
+        typed = set()
+        for item in snapshot["counters"]:
+            metric = f"{self.prefix}_{_metric_name(item['name'])}_total"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            value = item["value"]
+            lines.append(f"{metric}{_labels(item['labels'])} {value:g}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _metric_name(name: str) -> str:
+    """Return a valid Prometheus name of 'keys.load' -> 'keys_load'"""
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _labels(labels: dict) -> str:
+    """Return Prometheus labels, {a="1",b="2"}"""
+    if not labels:
+        return ""
+    items = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        items.append(f'{_metric_name(name)}="{value}"')
+    return "{" + ",".join(items) + "}"
@@ -0,0 +1,103 @@
+""" in-process cache of missing Key IDs """
+import time
+import threading
+from collections import OrderedDict
+
+
+class NegativeCache:
+    """TTL and size bounded cache of Key IDs which are not in a storage
+
+    Tokens with a well-formed but unknown Key ID are rejected without
+    a request to the storage until the entry expires. The cache is safe
+    for use from multiple threads.
+    """
+
+    def __init__(self, ttl: float = 30.0, maxsize: int = 1024) -> None:
+        """
+        :param ttl: - seconds how long a Key ID is known as missing,
+            0 = the cache is disabled
+        :type float:
+        :param maxsize: - max. number of missing Key IDs, 0 = unlimited
+        :type int:
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__lock = threading.Lock()
+        # kid -> expire time; the oldest entry is first
+        self.__entries: OrderedDict[str, float] = OrderedDict()
+
+    def is_missing(self, kid: str) -> bool:
+        """
+        Return True when a Key ID is known as missing
+
+        :param kid: Key ID
+        :type str:
+        :rtype: bool
+        """
+        if not self.__entries:
+            return False
+        with self.__lock:
+            expire_at = self.__entries.get(kid)
+            if expire_at is None:
+                return False
+            if time.monotonic() >= expire_at:
+                del self.__entries[kid]
+                return False
+            self.hits += 1
+            return True
+
+    def add(self, kid: str) -> None:
+        """
+        Remember a Key ID which was not found in a storage
+
+        :param kid: Key ID
+        :type str:
+        """
+        if self.ttl <= 0:
+            return
+        with self.__lock:
+            self.misses += 1
+            self.__entries[kid] = time.monotonic() + self.ttl
+            self.__entries.move_to_end(kid)
+            while self.maxsize and len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, kid: str) -> None:
+        """
+        Forget a missing Key ID, e.g. when its keys were saved
+
+        :param kid: Key ID
+        :type str:
+        """
+        if not self.__entries:
+            return
+        with self.__lock:
+            self.__entries.pop(kid, None)
+
+    def clear(self) -> None:
+        """Remove all entries, statistics are kept"""
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        """Return cache statistics"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.__entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, kid: object) -> bool:
+        expire_at = self.__entries.get(kid) if isinstance(kid, str) else None
+        return expire_at is not None and time.monotonic() < expire_at
@@ -0,0 +1,340 @@
+""" layered storages class """
+import time
+import threading
+from collections import deque
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+
+
+class StorageChain(AbstractKeyStorage):
+    """interface for layered storages, e.g. memory -> file -> Vault
+
+    Tiers are ordered from the fastest one to the authoritative one (last).
+    Keys are read from the fastest tier which has the Key ID and copied to
+    the faster tiers which missed it. The last Key ID is read from the
+    authoritative tier at most once per 'last_kid_ttl' seconds, a faster
+    tier is used when it is not available. Keys found in a faster tier are
+    checked in the authoritative tier at most once per 'keys_ttl' seconds,
+    keys deleted there (e.g. revoked or pruned by another node) are
+    deleted from the faster tiers too.
+
+    Writes go through to the authoritative tier and then to the faster
+    tiers. With 'write_behind' the faster tiers are written at once and
+    the authoritative tier by a background thread in the same order.
+    """
+
+    def __init__(
+        self,
+        tiers: list[AbstractKeyStorage],
+        write_behind: bool = False,
+        retry_interval: float = 1.0,
+        last_kid_ttl: float = 1.0,
+        keys_ttl: float = 60.0,
+    ) -> None:
+        """
+        :param tiers: - storages from the fastest to the authoritative one
+        :type list[AbstractKeyStorage]:
+        :param write_behind: - write the authoritative tier in background
+        :type bool:
+        :param retry_interval: - seconds between retries of a failed
+            background write
+        :type float:
+        :param last_kid_ttl: - seconds a last Key ID read from the
+            authoritative tier is used, 0 = read it on every call
+        :type float:
+        :param keys_ttl: - seconds keys from a faster tier are used before
+            they are checked in the authoritative tier again, 0 = check
+            them on every load
+        :type float:
+        """
+        if not tiers:
+            raise ValueError("StorageChain needs at least one storage.")
+        self.__tiers = list(tiers)
+        self.__authority = self.__tiers[-1]
+        # a Key ID is missing when the authoritative tier does not have it
+        self.missing_errors = self.__authority.missing_errors
+        self.__write_behind = write_behind
+        self.retry_interval = retry_interval
+        self.last_kid_ttl = last_kid_ttl
+        self.keys_ttl = keys_ttl
+        # last error of a background write, None after a successful write
+        self.last_error: Exception | None = None
+
+        # last Key ID copied to the faster tiers and when it was known
+        # to be the last one (read or written by this chain)
+        self.__mirrored_kid = ""
+        self.__mirrored_at = 0.0
+        # Key ID -> when it was last known to be in the authoritative tier
+        self.__checked: dict[str, float] = {}
+        # last Key ID which is not written to the authoritative tier yet
+        self.__pending_kid = ""
+        # background writes (method name, arguments)
+        self.__queue: deque[tuple[str, tuple]] = deque()
+        self.__cond = threading.Condition()
+        self.__thread: threading.Thread | None = None
+        self.__closed = False
+
+    @property
+    def tiers(self) -> list[AbstractKeyStorage]:
+        """Storages from the fastest to the authoritative one"""
+        return list(self.__tiers)
+
+    @property
+    def pending(self) -> int:
+        """Number of writes waiting for the authoritative tier"""
+        return len(self.__queue)
+
+    def get_last_kid(self) -> str:
+        """Return last Key ID"""
+        with self.__cond:
+            if self.__pending_kid:
+                return self.__pending_kid
+            kid, known_at = self.__mirrored_kid, self.__mirrored_at
+        if kid and time.monotonic() - known_at < self.last_kid_ttl:
+            return kid
+
+        try:
+            kid = self.__authority.get_last_kid()
+        except Exception as error:
+            # the authoritative tier is not available, use the last copy
+            for tier in self.__tiers[:-1]:
+                try:
+                    return tier.get_last_kid()
+                except Exception:
+                    continue
+            raise error
+
+        if kid != self.__mirrored_kid:
+            self.__copy("publish_kid", kid)
+        self.__mirrored(kid)
+        return kid
+
+    def load_keys(self, kid: str = "") -> tuple[str, dict]:
+        """Load keys from the fastest tier which has them"""
+        if kid == "":
+            kid = self.get_last_kid()
+
+        missed = []
+        for tier in self.__tiers[:-1]:
+            try:
+                kid, result = tier.load_keys(kid)
+                break
+            except Exception:
+                missed.append(tier)
+        else:
+            kid, result = self.__authority.load_keys(kid)
+            self.__checked_now(kid)
+
+        if len(missed) < len(self.__tiers) - 1:
+            self.__check(kid)
+
+        keys = dict(result["data"])
+        for tier in missed:
+            self.__call(tier, "stage_keys", kid, keys)
+        return kid, result
+
+    def save_keys(self, kid: str, keys: dict) -> None:
+        """Save keys and last Key ID to all tiers"""
+        if self.__write_behind:
+            self.__copy("save_keys", kid, keys)
+            self.__enqueue("save_keys", kid, keys, last_kid=kid)
+            return
+
+        self.__authority.save_keys(kid, keys)
+        self.__checked_now(kid)
+        self.__copy("save_keys", kid, keys)
+        self.__mirrored(kid)
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """Save keys to all tiers, last Key ID is not changed"""
+        if self.__write_behind:
+            self.__copy("stage_keys", kid, keys)
+            self.__enqueue("stage_keys", kid, keys)
+            return
+
+        self.__authority.stage_keys(kid, keys)
+        self.__checked_now(kid)
+        self.__copy("stage_keys", kid, keys)
+
+    def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter of all tiers"""
+        if not self.__write_behind:
+            counter = self.__authority.add_counter(kid, amount)
+            self.__copy("add_counter", kid, amount)
+            return counter
+
+        counters = self.__copy("add_counter", kid, amount)
+        self.__enqueue("add_counter", kid, amount)
+        if counters:
+            return counters[0]
+        # no faster tier has the keys, load them to one
+        return self.load_keys(kid)[1]["data"]["counter"] + amount
+
+    def retire_keys(self, kid: str, retired: float) -> None:
+        """Save the replacement time of keys to all tiers"""
+        if self.__write_behind:
+            self.__copy("retire_keys", kid, retired)
+            self.__enqueue("retire_keys", kid, retired)
+            return
+
+        self.__authority.retire_keys(kid, retired)
+        self.__copy("retire_keys", kid, retired)
+
+    def list_kids(self) -> list[str]:
+        """Return all Key IDs of the authoritative tier"""
+        return self.__authority.list_kids()
+
+    def delete_keys(self, kid: str) -> None:
+        """Delete keys from all tiers"""
+        if self.__write_behind:
+            self.__copy("delete_keys", kid)
+            self.__enqueue("delete_keys", kid)
+            return
+
+        self.__authority.delete_keys(kid)
+        self.__copy("delete_keys", kid)
+        with self.__cond:
+            self.__checked.pop(kid, None)
+
+    def _save_last_id(self, kid: str) -> None:
+        """Save last Key ID to all tiers"""
+        if self.__write_behind:
+            self.__copy("publish_kid", kid)
+            self.__enqueue("publish_kid", kid, last_kid=kid)
+            return
+
+        self.__authority.publish_kid(kid)
+        self.__copy("publish_kid", kid)
+        self.__mirrored(kid)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until background writes are written to the authoritative tier
+
+        :param timeout: - max. seconds to wait, None = no limit
+        :type float | None:
+        :returns: True when all writes are done
+        :rtype: bool
+        """
+        with self.__cond:
+            return self.__cond.wait_for(lambda: not self.__queue, timeout)
+
+    def close(self, timeout: float | None = None) -> bool:
+        """
+        Flush background writes and stop the background thread
+
+        :param timeout: - max. seconds to wait for the flush
+        :type float | None:
+        :returns: True when all writes are done
+        :rtype: bool
+        """
+        done = self.flush(timeout)
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+            thread = self.__thread
+        if thread is not None:
+            thread.join(timeout)
+        return done
+
+    def __mirrored(self, kid: str) -> None:
+        """Remember the last Key ID known from the authoritative tier"""
+        with self.__cond:
+            self.__mirrored_kid = kid
+            self.__mirrored_at = time.monotonic()
+
+    def __checked_now(self, kid: str) -> None:
+        """Remember that the authoritative tier has the Key ID"""
+        with self.__cond:
+            self.__checked[kid] = time.monotonic()
+
+    def __check(self, kid: str) -> None:
+        """
+        Check keys from a faster tier in the authoritative tier once per
+        'keys_ttl', keys deleted there are deleted from the faster tiers
+        """
+        with self.__cond:
+            checked = self.__checked.get(kid)
+            if any(args[0] == kid for _, args in self.__queue):
+                # not written to the authoritative tier yet
+                return
+        if checked is not None and time.monotonic() - checked < self.keys_ttl:
+            return
+
+        try:
+            self.__authority.load_keys(kid)
+        except self.missing_errors:
+            self.__copy("delete_keys", kid)
+            with self.__cond:
+                self.__checked.pop(kid, None)
+            raise
+        except Exception:
+            # the authoritative tier is not available, use the copy
+            return
+        self.__checked_now(kid)
+
+    def __copy(self, method: str, *args: object) -> list:
+        """Call a method of the faster tiers, return successful results"""
+        results = []
+        for tier in self.__tiers[:-1]:
+            try:
+                results.append(getattr(tier, method)(*args))
+            except Exception:
+                # a faster tier is only a copy of the authoritative one
+                continue
+        return results
+
+    @staticmethod
+    def __call(tier: AbstractKeyStorage, method: str, *args: object) -> None:
+        """Call a method of one faster tier, errors are ignored"""
+        try:
+            getattr(tier, method)(*args)
+        except Exception:
+            pass
+
+    def __enqueue(self, method: str, *args: object, last_kid: str = "") -> None:
+        """Queue a write of the authoritative tier"""
+        with self.__cond:
+            if self.__closed:
+                raise RuntimeError("StorageChain is closed.")
+            self.__queue.append((method, args))
+            if last_kid:
+                self.__pending_kid = last_kid
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__run, name="StorageChain", daemon=True
+                )
+                self.__thread.start()
+            self.__cond.notify_all()
+
+    def __run(self) -> None:
+        """Write queued changes to the authoritative tier in order"""
+        while True:
+            with self.__cond:
+                while not self.__queue and not self.__closed:
+                    self.__cond.wait()
+                if not self.__queue:
+                    return
+                method, args = self.__queue[0]
+
+            try:
+                getattr(self.__authority, method)(*args)
+            except Exception as error:
+                self.last_error = error
+                with self.__cond:
+                    if self.__closed:
+                        return
+                    self.__cond.wait(self.retry_interval)
+                continue
+
+            with self.__cond:
+                self.__queue.popleft()
+                self.last_error = None
+                if method in ("save_keys", "stage_keys"):
+                    self.__checked[args[0]] = time.monotonic()
+                if self.__pending_kid and not any(
+                    queued in ("save_keys", "publish_kid")
+                    for queued, _ in self.__queue
+                ):
+                    self.__mirrored(self.__pending_kid)
+                    self.__pending_kid = ""
+                self.__cond.notify_all()
@@ -1,30 +1,76 @@
 """ file manipulation class """
 import os
 import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from joserfc_wrapper.Exceptions import KeyNotFoundError
 from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None  # type: ignore[assignment]
+
 
 class StorageFile(AbstractKeyStorage):
-    """interface for saving and loading a key on the file system"""
+    """interface for saving and loading a key on the file system
+
+    Files are replaced atomically (write to a temporary file and rename),
+    so readers never see a partially written file. Writes are serialized
+    by an advisory lock file, so several processes can share one directory.
+
+    With 'watch' enabled, parsed files are kept in memory and read again
+    only when the file changes (inode, mtime or size differs).
+    """
 
-    def __init__(self, cert_dir: str) -> None:
+    missing_errors = (KeyNotFoundError, FileNotFoundError)
+
+    def __init__(
+        self,
+        cert_dir: str,
+        fsync: bool = True,
+        watch: bool = False,
+        check_interval: float = 0,
+        fsync_counter: bool = False,
+    ) -> None:
         """
         :param cert_dir: - path to the directory with certificates
         :type str:
+        :param fsync: - flush written files to the disk before rename
+        :type bool:
+        :param watch: - keep parsed files, re-read only changed files
+        :type bool:
+        :param check_interval: - seconds between checks of a watched file,
+            0 = check (stat) on every access
+        :type float:
+        :param fsync_counter: - flush counter updates to the disk too,
+            with flush_every=1 of WrapJWK that is one fsync per token
+        :type bool:
         """
         self.__cert_dir = cert_dir
+        self.__fsync = fsync
+        self.__fsync_counter = fsync and fsync_counter
+        self.__watch = watch
+        self.__check_interval = check_interval
+        # path -> (file signature, last check time, parsed content)
+        self.__files: dict[str, tuple[tuple, float, dict]] = {}
         # file name for save last keys ID - default "last-key-id"
         self.last_id_name = "last-key-id"
+        # file name for the advisory lock - default ".lock"
+        self.lock_name = ".lock"
+        # serializes writes of threads in this process
+        self.__thread_lock = threading.RLock()
+        self.__lock_depth = 0
 
     def get_last_kid(self) -> str:
         """Return last Key ID"""
         last_kid_path = os.path.join(
             self.__cert_dir, f"{self.last_id_name}.json"
         )
-        with open(last_kid_path, "r", encoding="utf-8") as f:
-            last_kid = json.load(f)
-
-        return last_kid["kid"]
+        return self.__read_json(last_kid_path)["kid"]
 
     def load_keys(self, kid: str = "") -> tuple[str, dict]:
         """Load keys"""
@@ -36,8 +82,16 @@ class StorageFile(AbstractKeyStorage):
     def save_keys(self, kid: str, keys: dict) -> None:
         """Save keys to vault"""
 
+        # the keys file is complete before the last Key ID points to it
+        with self.__locked():
+            self.stage_keys(kid, keys)
+            self._save_last_id(kid)
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """Save keys, last Key ID is not changed"""
+
         # must have 'data' key for HashiCorp Vault compatibility
-        keys = {
+        data = {
             "data": {
                 "keys": {
                     "private": keys["keys"]["private"],
@@ -47,26 +101,135 @@ class StorageFile(AbstractKeyStorage):
                 "counter": keys["counter"],
             }
         }
+        if keys["keys"].get("policy"):
+            data["data"]["keys"]["policy"] = keys["keys"]["policy"]
+        if keys.get("created"):
+            data["data"]["created"] = keys["created"]
+        if keys.get("retired"):
+            data["data"]["retired"] = keys["retired"]
 
-        # Save the public and private key to a files
-        keys_path = os.path.join(self.__cert_dir, f"{kid}.json")
-        with open(keys_path, "w", encoding="utf-8") as f:
-            json.dump(keys, f)
+        with self.__locked():
+            keys_path = os.path.join(self.__cert_dir, f"{kid}.json")
+            self.__write_json(keys_path, data)
+
+    def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter, last Key ID is not changed"""
+        with self.__locked():
+            keys_path = os.path.join(self.__cert_dir, f"{kid}.json")
+            # never update a counter from a watched (possibly stale) copy
+            with open(keys_path, "r", encoding="utf-8") as f:
+                keys = json.load(f)
+            keys["data"]["counter"] += amount
+            self.__write_json(keys_path, keys, self.__fsync_counter)
+
+        return keys["data"]["counter"]
 
-        self._save_last_id(kid)
+    def retire_keys(self, kid: str, retired: float) -> None:
+        """Save when keys were replaced by newer keys"""
+        with self.__locked():
+            keys_path = os.path.join(self.__cert_dir, f"{kid}.json")
+            # never update from a watched (possibly stale) copy
+            with open(keys_path, "r", encoding="utf-8") as f:
+                keys = json.load(f)
+            keys["data"]["retired"] = retired
+            self.__write_json(keys_path, keys)
+
+    def list_kids(self) -> list[str]:
+        """Return all Key IDs, lock and temporary files are skipped"""
+        kids = []
+        for name in os.listdir(self.__cert_dir):
+            kid, ext = os.path.splitext(name)
+            if ext == ".json" and not name.startswith("."):
+                if kid != self.last_id_name:
+                    kids.append(kid)
+        return kids
+
+    def delete_keys(self, kid: str) -> None:
+        """Delete the keys file, last Key ID is not changed"""
+        keys_path = os.path.join(self.__cert_dir, f"{kid}.json")
+        with self.__locked():
+            try:
+                os.unlink(keys_path)
+            except FileNotFoundError:
+                pass
+            self.__files.pop(keys_path, None)
 
     def __load_key_files(self, kid: str) -> dict:
         """Loads key files from the specified directory"""
 
         keys_path = os.path.join(self.__cert_dir, f"{kid}.json")
-        with open(keys_path, "r", encoding="utf-8") as f:
-            keys = json.load(f)
+        keys = self.__read_json(keys_path)
+
+        # a caller may change the counter, keys itself are never changed
+        return {"data": dict(keys["data"])}
+
+    def __read_json(self, path: str) -> dict:
+        """Read a file, a watched file is parsed again only when changed"""
+        if not self.__watch:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
 
-        return keys
+        now = time.monotonic()
+        entry = self.__files.get(path)
+        if entry is not None and now - entry[1] < self.__check_interval:
+            return entry[2]
+
+        # files are replaced by rename, so a change always changes the inode
+        stat = os.stat(path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if entry is not None and entry[0] == signature:
+            self.__files[path] = (signature, now, entry[2])
+            return entry[2]
+
+        with open(path, "r", encoding="utf-8") as f:
+            content = json.load(f)
+        self.__files[path] = (signature, now, content)
+        return content
 
     def _save_last_id(self, kid: str) -> None:
         """save last kid to file with last key"""
         last_key = {"kid": kid}
         keys_path = os.path.join(self.__cert_dir, f"{self.last_id_name}.json")
-        with open(keys_path, "w", encoding="utf-8") as f:
-            json.dump(last_key, f)
+        with self.__locked():
+            self.__write_json(keys_path, last_key)
+
+    @contextmanager
+    def __locked(self) -> Iterator[None]:
+        """Hold an exclusive lock for writes of threads and processes"""
+        with self.__thread_lock:
+            # the lock file is already held by this thread
+            if fcntl is None or self.__lock_depth:
+                self.__lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self.__lock_depth -= 1
+                return
+            lock_path = os.path.join(self.__cert_dir, self.lock_name)
+            with open(lock_path, "a", encoding="utf-8") as lock:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                self.__lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self.__lock_depth -= 1
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def __write_json(
+        self, path: str, data: dict, fsync: bool | None = None
+    ) -> None:
+        """Write a file atomically, replace it by a complete temp file"""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.__cert_dir, prefix=".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+                if self.__fsync if fsync is None else fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self.__files.pop(path, None)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
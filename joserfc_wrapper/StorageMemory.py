@@ -0,0 +1,85 @@
+""" memory storage class """
+import copy
+import threading
+from joserfc_wrapper.Exceptions import KeyNotFoundError, KeysLoadError
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+
+
+class StorageMemory(AbstractKeyStorage):
+    """interface for keeping keys in the memory of the process
+
+    Keys are lost when the process exits, use it as the first tier
+    of a StorageChain or for tests.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        # kid -> { keys: dict, counter: int }
+        self.__keys: dict[str, dict] = {}
+        self.__last_kid = ""
+
+    def get_last_kid(self) -> str:
+        """Return last Key ID"""
+        if not self.__last_kid:
+            raise KeysLoadError("Last Key ID not found.")
+        return self.__last_kid
+
+    def load_keys(self, kid: str = "") -> tuple[str, dict]:
+        """Load keys"""
+        if kid == "":
+            kid = self.get_last_kid()
+
+        with self.__lock:
+            keys = self.__keys.get(kid)
+            if keys is None:
+                raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+            # a caller may change the counter, keys itself are never changed
+            return kid, {"data": dict(keys)}
+
+    def save_keys(self, kid: str, keys: dict) -> None:
+        """Save keys"""
+        self.stage_keys(kid, keys)
+        self._save_last_id(kid)
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """Save keys, last Key ID is not changed"""
+        data = {
+            "keys": copy.deepcopy(keys["keys"]),
+            "counter": keys["counter"],
+            "created": keys.get("created", 0),
+        }
+        if keys.get("retired"):
+            data["retired"] = keys["retired"]
+        with self.__lock:
+            self.__keys[kid] = data
+
+    def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter"""
+        with self.__lock:
+            keys = self.__keys.get(kid)
+            if keys is None:
+                raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+            keys["counter"] += amount
+            return keys["counter"]
+
+    def retire_keys(self, kid: str, retired: float) -> None:
+        """Save when keys were replaced by newer keys"""
+        with self.__lock:
+            keys = self.__keys.get(kid)
+            if keys is None:
+                raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+            keys["retired"] = retired
+
+    def list_kids(self) -> list[str]:
+        """Return all Key IDs"""
+        with self.__lock:
+            return list(self.__keys)
+
+    def delete_keys(self, kid: str) -> None:
+        """Delete keys"""
+        with self.__lock:
+            self.__keys.pop(kid, None)
+
+    def _save_last_id(self, kid: str) -> None:
+        """Save last Key ID"""
+        self.__last_kid = kid
@@ -0,0 +1,150 @@
+""" redis manipulation class """
+import json
+from typing import Any
+from joserfc_wrapper.Exceptions import KeyNotFoundError, KeysLoadError
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+# INCRBY of the counter only when the keys of the Key ID exist
+_ADD_COUNTER = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+return redis.call('INCRBY', KEYS[2], ARGV[1])
+"""
+
+
+class StorageRedis(AbstractKeyStorage):
+    """interface for saving and loading a key on a Redis compatible server
+
+    Keys of a Key ID are saved in '<prefix><kid>', the counter in
+    '<prefix><kid>:counter' (changed by an atomic script), the generation
+    time in '<prefix><kid>:created', the replacement time in
+    '<prefix><kid>:retired' and the last Key ID in
+    '<prefix>last-key-id'.
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "jwk:",
+        client: Any = None,
+    ) -> None:
+        """
+        :param url: - Redis URL, not used when a client is given
+        :type str:
+        :param prefix: - prefix of all Redis keys
+        :type str:
+        :param client: - redis.Redis compatible client object
+        :type Any:
+        :raises ImportError: the redis package is not installed
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError(
+                    "StorageRedis needs the 'redis' package, "
+                    "install joserfc-wrapper[redis]."
+                )
+            client = redis.Redis.from_url(url)
+        self.__client = client
+        self.__add_counter = client.register_script(_ADD_COUNTER)
+        self.prefix = prefix
+        # name for save last keys ID - default "last-key-id"
+        self.last_id_name = "last-key-id"
+
+    def get_last_kid(self) -> str:
+        """Return last Key ID"""
+        kid = self.__client.get(self.__name(self.last_id_name))
+        if kid is None:
+            raise KeysLoadError("Last Key ID not found.")
+        return self.__str(kid)
+
+    def load_keys(self, kid: str = "") -> tuple[str, dict]:
+        """Load keys and counter in one pipelined round trip"""
+        if kid == "":
+            kid = self.get_last_kid()
+
+        pipe = self.__client.pipeline(transaction=False)
+        pipe.get(self.__name(kid))
+        pipe.get(self.__name(f"{kid}:counter"))
+        pipe.get(self.__name(f"{kid}:created"))
+        pipe.get(self.__name(f"{kid}:retired"))
+        keys, counter, created, retired = pipe.execute()
+        if keys is None:
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+
+        return kid, {
+            "data": {
+                "keys": json.loads(keys),
+                "counter": int(counter or 0),
+                "created": float(created or 0),
+                "retired": float(retired or 0),
+            }
+        }
+
+    def save_keys(self, kid: str, keys: dict) -> None:
+        """Save keys, counter and last Key ID in one transaction"""
+        pipe = self.__client.pipeline(transaction=True)
+        self.__set_keys(pipe, kid, keys)
+        pipe.set(self.__name(self.last_id_name), kid)
+        pipe.execute()
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """Save keys and counter, last Key ID is not changed"""
+        pipe = self.__client.pipeline(transaction=True)
+        self.__set_keys(pipe, kid, keys)
+        pipe.execute()
+
+    def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter atomically"""
+        counter = self.__add_counter(
+            keys=[self.__name(kid), self.__name(f"{kid}:counter")],
+            args=[amount],
+        )
+        if counter is None:
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+        return int(counter)
+
+    def retire_keys(self, kid: str, retired: float) -> None:
+        """Save when keys were replaced by newer keys"""
+        self.__client.set(self.__name(f"{kid}:retired"), retired)
+
+    def list_kids(self) -> list[str]:
+        """Return all Key IDs, found by SCAN of the prefix"""
+        kids = []
+        for name in self.__client.scan_iter(match=f"{self.prefix}*"):
+            kid = self.__str(name)[len(self.prefix) :]
+            if ":" not in kid and kid != self.last_id_name:
+                kids.append(kid)
+        return kids
+
+    def delete_keys(self, kid: str) -> None:
+        """Delete keys, last Key ID is not changed"""
+        self.__client.delete(
+            self.__name(kid),
+            self.__name(f"{kid}:counter"),
+            self.__name(f"{kid}:created"),
+            self.__name(f"{kid}:retired"),
+        )
+
+    def _save_last_id(self, kid: str) -> None:
+        """Save last Key ID"""
+        self.__client.set(self.__name(self.last_id_name), kid)
+
+    def __set_keys(self, pipe: Any, kid: str, keys: dict) -> None:
+        pipe.set(self.__name(kid), json.dumps(keys["keys"]))
+        pipe.set(self.__name(f"{kid}:counter"), keys["counter"])
+        pipe.set(self.__name(f"{kid}:created"), keys.get("created", 0))
+        pipe.set(self.__name(f"{kid}:retired"), keys.get("retired", 0))
+
+    def __name(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    @staticmethod
+    def __str(value: bytes | str) -> str:
+        """Clients without decode_responses return bytes"""
+        return value.decode("utf-8") if isinstance(value, bytes) else value
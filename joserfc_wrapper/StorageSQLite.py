@@ -0,0 +1,176 @@
+""" sqlite manipulation class """
+import json
+import sqlite3
+import threading
+from joserfc_wrapper.Exceptions import KeyNotFoundError, KeysLoadError
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+
+
+class StorageSQLite(AbstractKeyStorage):
+    """interface for saving and loading a key in a SQLite database
+
+    The database runs in WAL mode, so readers do not block the writer and
+    several processes can share one database file.
+    """
+
+    def __init__(self, path: str, timeout: float = 30) -> None:
+        """
+        :param path: - path to the database file
+        :type str:
+        :param timeout: - seconds to wait for a lock of another connection
+        :type float:
+        """
+        self.path = path
+        self.timeout = timeout
+        # name for save last keys ID - default "last-key-id"
+        self.last_id_name = "last-key-id"
+        # sqlite connections must not be shared by threads
+        self.__local = threading.local()
+
+        with self.__connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jwk_keys ("
+                "kid TEXT PRIMARY KEY, keys TEXT NOT NULL, "
+                "counter INTEGER NOT NULL DEFAULT 0, "
+                "created REAL NOT NULL DEFAULT 0, "
+                "retired REAL NOT NULL DEFAULT 0)"
+            )
+            columns = [
+                row[1] for row in db.execute("PRAGMA table_info(jwk_keys)")
+            ]
+            for column in ("created", "retired"):
+                if column not in columns:
+                    # databases created by older versions
+                    db.execute(
+                        "ALTER TABLE jwk_keys "
+                        f"ADD COLUMN {column} REAL NOT NULL DEFAULT 0"
+                    )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jwk_meta ("
+                "name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    def get_last_kid(self) -> str:
+        """Return last Key ID"""
+        row = (
+            self.__connection()
+            .execute(
+                "SELECT value FROM jwk_meta WHERE name = ?",
+                (self.last_id_name,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            raise KeysLoadError("Last Key ID not found.")
+        return row[0]
+
+    def load_keys(self, kid: str = "") -> tuple[str, dict]:
+        """Load keys, the last keys are loaded by one query"""
+        db = self.__connection()
+        if kid == "":
+            row = db.execute(
+                "SELECT k.kid, k.keys, k.counter, k.created, k.retired "
+                "FROM jwk_keys k "
+                "JOIN jwk_meta m ON m.value = k.kid WHERE m.name = ?",
+                (self.last_id_name,),
+            ).fetchone()
+        else:
+            row = db.execute(
+                "SELECT kid, keys, counter, created, retired FROM jwk_keys "
+                "WHERE kid = ?",
+                (kid,),
+            ).fetchone()
+        if row is None:
+            raise KeyNotFoundError(
+                f"Key ID '{kid or self.last_id_name}' not found."
+            )
+
+        return row[0], {
+            "data": {
+                "keys": json.loads(row[1]),
+                "counter": row[2],
+                "created": row[3],
+                "retired": row[4],
+            }
+        }
+
+    def save_keys(self, kid: str, keys: dict) -> None:
+        """Save keys and last Key ID in one transaction"""
+        with self.__connection() as db:
+            self.__insert_keys(db, kid, keys)
+            self.__set_last_id(db, kid)
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """Save keys, last Key ID is not changed"""
+        with self.__connection() as db:
+            self.__insert_keys(db, kid, keys)
+
+    def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter atomically"""
+        with self.__connection() as db:
+            db.execute(
+                "UPDATE jwk_keys SET counter = counter + ? WHERE kid = ?",
+                (amount, kid),
+            )
+            row = db.execute(
+                "SELECT counter FROM jwk_keys WHERE kid = ?", (kid,)
+            ).fetchone()
+        if row is None:
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+        return row[0]
+
+    def retire_keys(self, kid: str, retired: float) -> None:
+        """Save when keys were replaced by newer keys"""
+        with self.__connection() as db:
+            cursor = db.execute(
+                "UPDATE jwk_keys SET retired = ? WHERE kid = ?",
+                (retired, kid),
+            )
+        if not cursor.rowcount:
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+
+    def list_kids(self) -> list[str]:
+        """Return all Key IDs"""
+        rows = self.__connection().execute("SELECT kid FROM jwk_keys")
+        return [row[0] for row in rows]
+
+    def delete_keys(self, kid: str) -> None:
+        """Delete keys, last Key ID is not changed"""
+        with self.__connection() as db:
+            db.execute("DELETE FROM jwk_keys WHERE kid = ?", (kid,))
+
+    def _save_last_id(self, kid: str) -> None:
+        """Save last Key ID"""
+        with self.__connection() as db:
+            self.__set_last_id(db, kid)
+
+    def __insert_keys(
+        self, db: sqlite3.Connection, kid: str, keys: dict
+    ) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO jwk_keys "
+            "(kid, keys, counter, created, retired) VALUES (?, ?, ?, ?, ?)",
+            (
+                kid,
+                json.dumps(keys["keys"]),
+                keys["counter"],
+                keys.get("created", 0),
+                keys.get("retired", 0),
+            ),
+        )
+
+    def __set_last_id(self, db: sqlite3.Connection, kid: str) -> None:
+        db.execute(
+            "INSERT OR REPLACE INTO jwk_meta (name, value) VALUES (?, ?)",
+            (self.last_id_name, kid),
+        )
+
+    def __connection(self) -> sqlite3.Connection:
+        """Return a connection of the current thread"""
+        db = getattr(self.__local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.__local.db = db
+        return db
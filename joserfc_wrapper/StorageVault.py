@@ -1,16 +1,31 @@
 """ vault manipulation class """
 import hvac
+import requests
+from hvac.exceptions import InvalidPath, InvalidRequest
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from joserfc_wrapper.Exceptions import KeyNotFoundError
 from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
 
 
 class StorageVault(AbstractKeyStorage):
     """interface for saving and loading a key on the HashiCorp Vault system"""
 
+    # a missing secret is an HTTP 404
+    missing_errors = (KeyNotFoundError, InvalidPath)
+
     def __init__(
         self,
         url: str = "",
         token: str = "",
         mount: str = "",
+        kv_version: int = 1,
+        timeout: float = 30,
+        pool_size: int = 10,
+        retries: int = 3,
+        backoff: float = 0.1,
+        inline_last_keys: bool = False,
+        session: requests.Session | None = None,
     ) -> None:
         """
         Handles for HashiCorp Vault Storage
@@ -21,22 +36,45 @@ class StorageVault(AbstractKeyStorage):
         :type str:
         :param mount: - Vault mount point
         :type str:
+        :param kv_version: - KV secrets engine version, 1 or 2
+        :type int:
+        :param timeout: - seconds to wait for a Vault response
+        :type float:
+        :param pool_size: - kept-alive connections to Vault
+        :type int:
+        :param retries: - retries of failed connections and 5xx responses
+            of reads, writes are not repeated after a sent request
+        :type int:
+        :param backoff: - backoff factor between retries in seconds
+        :type float:
+        :param inline_last_keys: - keep the last keys and their counter
+            in the last Key ID secret, the last keys are loaded by one request
+        :type bool:
+        :param session: - own requests session, pool options are not used
+        :type requests.Session | None:
         """
+        if kv_version not in (1, 2):
+            raise ValueError("kv_version must be 1 or 2.")
         self.url = url
         self.token = token
         self.mount = mount
-        self.__client = hvac.Client(url=url, token=token)
+        self.kv_version = kv_version
+        self.inline_last_keys = inline_last_keys
+        if session is None:
+            session = self.__create_session(pool_size, retries, backoff)
+        self.__client = hvac.Client(
+            url=url, token=token, timeout=timeout, session=session
+        )
         self.__mount = mount
         # path for save last keys ID - default "last-key-id"
         self.last_id_path = "last-key-id"
+        # attempts of a check-and-set counter update (KV v2)
+        self.cas_attempts = 5
 
     def get_last_kid(self) -> str:
         """Return last Key ID"""
 
-        result = self.__client.secrets.kv.v1.read_secret(
-            path=self.last_id_path,
-            mount_point=self.__mount,
-        )
+        result = self.__read(self.last_id_path)
 
         return result["data"]["kid"]
 
@@ -44,29 +82,180 @@ class StorageVault(AbstractKeyStorage):
         """Load keys"""
 
         if kid == "":
-            kid = self.get_last_kid()
+            last = self.__read(self.last_id_path)["data"]
+            if self.inline_last_keys and "keys" in last:
+                # one request for the Key ID and its keys
+                keys = {k: v for k, v in last.items() if k != "kid"}
+                return last["kid"], {"data": keys}
+            kid = last["kid"]
 
-        result = self.__client.secrets.kv.v1.read_secret(
-            path=kid,
-            mount_point=self.__mount,
-        )
+        result = self.__read(kid)
 
         return kid, result
 
     def save_keys(self, kid: str, keys: dict) -> None:
         """Save keys"""
 
-        self.__client.secrets.kv.v1.create_or_update_secret(
-            mount_point=self.__mount, path=kid, secret=keys
-        )
+        if self.inline_last_keys:
+            self.__retire_inline_keys(kid)
+
+        self.__write(kid, keys)
+
+        if self.inline_last_keys:
+            self.__write(self.last_id_path, {"kid": kid, **keys})
+        else:
+            self._save_last_id(kid)
+
+    def stage_keys(self, kid: str, keys: dict) -> None:
+        """Save keys, last Key ID is not changed"""
+
+        self.__write(kid, keys)
+
+    def add_counter(self, kid: str, amount: int) -> int:
+        """Add signed tokens to the counter, last Key ID is not changed"""
+
+        if self.inline_last_keys:
+            last = self.__read(self.last_id_path, versioned=True)
+            if last["data"].get("kid") == kid and "keys" in last["data"]:
+                # the counter of the last keys is kept with the last Key ID
+                return self.__increase(self.last_id_path, last, amount)
+
+        return self.__increase(kid, self.__read(kid, versioned=True), amount)
+
+    def list_kids(self) -> list[str]:
+        """Return all Key IDs"""
+
+        try:
+            if self.kv_version == 1:
+                result = self.__client.secrets.kv.v1.list_secrets(
+                    path="", mount_point=self.__mount
+                )
+            else:
+                result = self.__client.secrets.kv.v2.list_secrets(
+                    path="", mount_point=self.__mount
+                )
+        except hvac.exceptions.InvalidPath:
+            # an empty mount
+            return []
+
+        return [
+            kid
+            for kid in result["data"]["keys"]
+            if kid != self.last_id_path and not kid.endswith("/")
+        ]
 
-        self._save_last_id(kid)
+    def delete_keys(self, kid: str) -> None:
+        """Delete keys, last Key ID is not changed"""
+
+        if self.kv_version == 1:
+            self.__client.secrets.kv.v1.delete_secret(
+                path=kid, mount_point=self.__mount
+            )
+        else:
+            self.__client.secrets.kv.v2.delete_metadata_and_all_versions(
+                path=kid, mount_point=self.__mount
+            )
 
     def _save_last_id(self, kid: str) -> None:
         """Save last Key ID"""
 
+        # another client may have moved the pointer, it is always written
+        if self.inline_last_keys:
+            last = self.__retire_inline_keys(kid)
+            if last.get("kid") == kid and "keys" in last:
+                # already the last keys, the inlined counter is newer
+                return
+            # keys staged before (e.g. by KeyRotator) are inlined now
+            keys = self.__read(kid)["data"]
+            self.__write(self.last_id_path, {"kid": kid, **keys})
+            return
+
         secret = {"kid": kid}
 
-        self.__client.secrets.kv.v1.create_or_update_secret(
-            mount_point=self.__mount, path=self.last_id_path, secret=secret
+        self.__write(self.last_id_path, secret)
+
+    def __increase(self, path: str, result: dict, amount: int) -> int:
+        """Increase the counter of a secret (check-and-set for KV v2)"""
+        for _ in range(self.cas_attempts):
+            secret = result["data"]
+            secret["counter"] += amount
+            try:
+                self.__write(path, secret, cas=result.get("version"))
+                return secret["counter"]
+            except InvalidRequest:
+                # the secret was changed by another client meanwhile
+                if self.kv_version == 1:
+                    raise
+                result = self.__read(path, versioned=True)
+        raise InvalidRequest(f"Unable to update counter of '{path}'.")
+
+    def __retire_inline_keys(self, kid: str) -> dict:
+        """
+        Save the counter of replaced last keys to their own secret,
+        return the last Key ID secret ({} when it does not exist)
+        """
+        try:
+            last = self.__read(self.last_id_path)["data"]
+        except hvac.exceptions.InvalidPath:
+            return {}
+        if "keys" in last and last["kid"] != kid:
+            keys = {k: v for k, v in last.items() if k != "kid"}
+            self.__write(last["kid"], keys)
+        return last
+
+    def __read(self, path: str, versioned: bool = False) -> dict:
+        """
+        Read a secret, KV v2 responses are returned in the KV v1 format
+        { 'data': dict } (with 'version' when versioned is set)
+        """
+        if self.kv_version == 1:
+            return self.__client.secrets.kv.v1.read_secret(
+                path=path,
+                mount_point=self.__mount,
+            )
+
+        result = self.__client.secrets.kv.v2.read_secret_version(
+            path=path,
+            mount_point=self.__mount,
+            raise_on_deleted_version=True,
+        )
+        data = {"data": result["data"]["data"]}
+        if versioned:
+            data["version"] = result["data"]["metadata"]["version"]
+        return data
+
+    def __write(self, path: str, secret: dict, cas: int | None = None) -> None:
+        """Write a secret, cas is the expected version (KV v2 only)"""
+        if self.kv_version == 1:
+            self.__client.secrets.kv.v1.create_or_update_secret(
+                mount_point=self.__mount, path=path, secret=secret
+            )
+            return
+
+        self.__client.secrets.kv.v2.create_or_update_secret(
+            mount_point=self.__mount, path=path, secret=secret, cas=cas
+        )
+
+    @staticmethod
+    def __create_session(
+        pool_size: int, retries: int, backoff: float
+    ) -> requests.Session:
+        """Create a session with kept-alive connections and retries"""
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(500, 502, 503, 504),
+            # KV writes are POST requests, a write applied by Vault before
+            # a timeout would be replayed (a counter added twice); failed
+            # connections are retried for all methods
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS - {"POST"},
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=retry,
         )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
@@ -0,0 +1,136 @@
+""" in-process cache of verified tokens """
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from joserfc.jwt import Token
+
+
+class TokenCache:
+    """TTL and size bounded LRU cache of decoded and verified tokens
+
+    Entries are keyed by a hash of the token, so a repeated token is not
+    parsed and its signature is not verified again. An entry expires
+    after 'ttl' seconds, but never later than the 'exp' claim of the
+    token. The cache is safe for use from multiple threads.
+
+    Header and claims are kept serialized, every hit returns a new Token
+    which callers may change without changing the cached token.
+    """
+
+    def __init__(self, ttl: float = 300.0, maxsize: int = 1024) -> None:
+        """
+        :param ttl: - max. seconds how long a verified token is kept,
+            it bounds how long keys revoked by another process are accepted
+        :type float:
+        :param maxsize: - max. number of cached tokens, 0 = unlimited
+        :type int:
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        # statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__lock = threading.Lock()
+        # token hash -> (expire time, kid, JSON of [header, claims]);
+        # the oldest used is first
+        self.__entries: OrderedDict[bytes, tuple[float, str, str]] = (
+            OrderedDict()
+        )
+
+    def get(self, token: str) -> Token | None:
+        """
+        Return a verified token
+
+        :param token: encoded token
+        :type str:
+        :returns: a copy of the decoded token or None when not cached
+        :rtype: Token | None
+        """
+        digest = self.__digest(token)
+        with self.__lock:
+            entry = self.__entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.monotonic() >= entry[0]:
+                del self.__entries[digest]
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(digest)
+            self.hits += 1
+        header, claims = json.loads(entry[2])
+        return Token(header, claims)
+
+    def set(self, token: str, decoded: Token) -> None:
+        """
+        Save a verified token, expired tokens are not saved
+
+        :param token: encoded token
+        :type str:
+        :param decoded: verified token
+        :type Token:
+        """
+        now = time.monotonic()
+        expire_at = now + self.ttl
+        exp = decoded.claims.get("exp")
+        if isinstance(exp, (int, float)) and not isinstance(exp, bool):
+            expire_at = min(expire_at, now + exp - time.time())
+        if expire_at <= now:
+            return
+
+        frozen = json.dumps([decoded.header, decoded.claims])
+        entry = (expire_at, decoded.header.get("kid", ""), frozen)
+        digest = self.__digest(token)
+        with self.__lock:
+            self.__entries[digest] = entry
+            self.__entries.move_to_end(digest)
+            while self.maxsize and len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_kid(self, kid: str) -> int:
+        """
+        Remove tokens signed by revoked keys
+
+        :param kid: Key ID
+        :type str:
+        :returns: number of removed tokens
+        :rtype: int
+        """
+        with self.__lock:
+            digests = [d for d, e in self.__entries.items() if e[1] == kid]
+            for digest in digests:
+                del self.__entries[digest]
+        return len(digests)
+
+    def clear(self) -> None:
+        """Remove all entries, statistics are kept"""
+        with self.__lock:
+            self.__entries.clear()
+
+    def stats(self) -> dict:
+        """Return cache statistics"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.__entries),
+        }
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def __contains__(self, token: object) -> bool:
+        if not isinstance(token, str):
+            return False
+        entry = self.__entries.get(self.__digest(token))
+        return entry is not None and time.monotonic() < entry[0]
+
+    @staticmethod
+    def __digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
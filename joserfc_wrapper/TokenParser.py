@@ -0,0 +1,128 @@
+""" single-pass token parser """
+import json
+import uuid
+from typing import Any, Collection
+from joserfc import jws
+from joserfc.errors import BadSignatureError, DecodeError, InvalidPayloadError
+from joserfc.jws import CompactSignature
+from joserfc.jwt import Token
+from joserfc_wrapper.Exceptions import (
+    TokenKidInvalidError,
+    TokenMalformedError,
+)
+
+
+class TokenParser:
+    """Parse compact JWS tokens once, reject invalid tokens early
+
+    The header and the payload of a token are decoded once. Oversized
+    tokens, malformed segments, not allowed algorithms and invalid Key
+    IDs are rejected before any key lookup or signature check. The
+    parsed token is verified without decoding it again.
+    """
+
+    def __init__(
+        self,
+        algorithms: Collection[str] = ("ES256",),
+        max_length: int = 8192,
+    ) -> None:
+        """
+        :param algorithms: - allowed 'alg' header values
+        :type Collection[str]:
+        :param max_length: - max. length of a token in bytes
+        :type int:
+        """
+        self.algorithms = frozenset(algorithms)
+        self.max_length = max_length
+        self.__registry = jws.construct_registry(sorted(self.algorithms))
+
+    def parse(self, token: str | bytes) -> CompactSignature:
+        """
+        Parse a token without verifying its signature
+
+        :param token: compact JWS
+        :type str | bytes:
+        :returns: parsed token, the Key ID is in headers()['kid']
+        :rtype CompactSignature:
+        :raises TokenMalformedError: oversized or malformed token,
+            not allowed algorithm
+        :raises TokenKidInvalidError: missing or invalid Key ID
+        """
+        if isinstance(token, str):
+            token = token.encode("utf-8")
+        if not isinstance(token, bytes):
+            raise TokenMalformedError("Token is not a string.")
+        if len(token) > self.max_length:
+            raise TokenMalformedError("Token is too long.")
+        if token.count(b".") != 2:
+            raise TokenMalformedError("Token must have 3 segments.")
+
+        try:
+            parsed = jws.extract_compact(token, registry=self.__registry)
+        except (DecodeError, ValueError, TypeError) as e:
+            raise TokenMalformedError("Invalid token segment.") from e
+
+        header = parsed.headers()
+        if header.get("alg") not in self.algorithms:
+            raise TokenMalformedError("Algorithm is not allowed.")
+        kid = header.get("kid")
+        if not isinstance(kid, str) or not self.validate_kid(kid):
+            raise TokenKidInvalidError
+        return parsed
+
+    def verify(
+        self, parsed: CompactSignature, key: Any, algorithm: str = ""
+    ) -> Token:
+        """
+        Verify the signature of a parsed token
+
+        :param parsed: token returned by parse
+        :type CompactSignature:
+        :param key: public key
+        :type Any:
+        :param algorithm: - the algorithm of the key, tokens with another
+            'alg' header are rejected, "" = any allowed algorithm
+        :type str:
+        :returns: object
+        :rtype Token:
+        :raises TokenMalformedError: the algorithm does not match the key
+        :raises BadSignatureError:
+        :raises InvalidPayloadError: the payload is not a JSON object
+        """
+        if algorithm and parsed.headers().get("alg") != algorithm:
+            raise TokenMalformedError("Algorithm does not match the key.")
+        if not jws.validate_compact(parsed, key, registry=self.__registry):
+            raise BadSignatureError()
+        try:
+            claims = json.loads(parsed.payload or b"")
+        except (TypeError, ValueError) as e:
+            raise InvalidPayloadError() from e
+        if not isinstance(claims, dict):
+            raise InvalidPayloadError()
+        return Token(parsed.headers(), claims)
+
+    def decode(
+        self, token: str | bytes, key: Any, algorithm: str = ""
+    ) -> Token:
+        """
+        Parse and verify a token
+
+        :param token: compact JWS
+        :type str | bytes:
+        :param key: public key
+        :type Any:
+        :param algorithm: - the algorithm of the key, see verify
+        :type str:
+        :returns: object
+        :rtype Token:
+        """
+        return self.verify(self.parse(token), key, algorithm)
+
+    @staticmethod
+    def validate_kid(kid: str) -> bool:
+        """Validate Key ID (UUID version 4)"""
+        try:
+            uuid_obj = uuid.UUID(kid)
+            return uuid_obj.version == 4
+        except ValueError:
+            return False
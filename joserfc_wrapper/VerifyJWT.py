@@ -0,0 +1,284 @@
+""" joserfc jwt verifier with public keys only """
+
+import time
+import threading
+from collections import OrderedDict
+import requests
+from joserfc import jwk
+from joserfc.jwk import Key
+from joserfc.jwt import Token
+from joserfc_wrapper.Exceptions import (
+    KeyNotFoundError,
+    ObjectTypeError,
+    TokenKidInvalidError,
+)
+from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+from joserfc_wrapper.KeyPolicy import KeyPolicy
+from joserfc_wrapper.NegativeCache import NegativeCache
+from joserfc_wrapper.TokenParser import TokenParser
+
+
+class VerifyJWT:
+    """Verify tokens without access to private keys
+
+    With 'url' the public keys are fetched from a JWKS endpoint (see
+    JWKSBuilder). The keys are refreshed by a conditional request
+    (If-None-Match) every 'refresh_interval' seconds and when a token
+    has an unknown Key ID. Tokens must be signed by the algorithm of
+    the key ('alg' member of the public JWK, ES256 for older keys).
+    """
+
+    def __init__(
+        self,
+        storage: AbstractKeyStorage | None = None,
+        keys: dict | None = None,
+        maxsize: int = 128,
+        url: str = "",
+        refresh_interval: float = 300,
+        timeout: float = 10,
+        session: requests.Session | None = None,
+        parser: TokenParser | None = None,
+        negative_cache: NegativeCache | None = None,
+        ttl: float = 300.0,
+    ) -> None:
+        """
+        :param storage: Storage object, public keys are loaded on demand
+        :type AbstractKeyStorage | None:
+        :param keys: Read-only snapshot of public keys (JWKS),
+            { 'keys': [ { 'kid': str, ...public JWK } ] }
+        :type dict | None:
+        :param maxsize: - max. number of public keys loaded from a storage,
+            0 = unlimited
+        :type int:
+        :param url: - URL of a JWKS endpoint
+        :type str:
+        :param refresh_interval: - seconds between checks of the endpoint
+        :type float:
+        :param timeout: - seconds to wait for the endpoint
+        :type float:
+        :param session: - own requests session for the endpoint
+        :type requests.Session | None:
+        :param parser: Token parser, default TokenParser() allowing
+            the public key algorithms (ES256, EdDSA, Ed25519)
+        :type TokenParser | None:
+        :param negative_cache: Cache for Key IDs missing in the storage,
+            default NegativeCache()
+        :type NegativeCache | None:
+        :param ttl: - seconds a public key loaded from a storage is used
+            before it is loaded again (revoked keys are not accepted
+            after that time), 0 = never expire
+        :type float:
+        :raises ObjectTypeError:
+        """
+        if storage is None and keys is None and not url:
+            raise ObjectTypeError("Storage, keys snapshot or URL is required.")
+        if storage is not None and not isinstance(storage, AbstractKeyStorage):
+            raise ObjectTypeError
+        self.__storage = storage
+        self.__maxsize = maxsize
+        self.__ttl = ttl
+        # Key ID of the last decoded token, per thread
+        self.__local = threading.local()
+        self.__parser = parser or TokenParser(
+            algorithms=KeyPolicy.public_algorithms()
+        )
+        self.__negative = (
+            NegativeCache() if negative_cache is None else negative_cache
+        )
+
+        # public keys from a snapshot, never evicted
+        self.__snapshot: dict[str, Key] = {}
+        # public keys loaded from a storage (expire time, key),
+        # the oldest used entry is first
+        self.__loaded: OrderedDict[str, tuple[float, Key]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+        # JWKS endpoint
+        self.__url = url
+        self.__session = (session or requests.Session()) if url else None
+        self.__timeout = timeout
+        self.__refresh_interval = refresh_interval
+        self.__refresh_lock = threading.Lock()
+        self.__refreshed_at = float("-inf")
+        self.__etag = ""
+        # min. seconds between refreshes caused by unknown Key IDs
+        self.unknown_kid_interval = 5.0
+
+        if keys is not None:
+            self.update_keys(keys)
+
+    def get_kid(self) -> str:
+        """Return Key ID of the last token decoded by this thread"""
+        return getattr(self.__local, "kid", "")
+
+    def load_key(self, kid: str) -> Key:
+        """
+        Return public key for Key ID
+
+        :param kid: Key ID
+        :type str:
+        :returns: public key
+        :rtype Key:
+        :raises TokenKidInvalidError: unknown Key ID in a snapshot mode
+        :raises KeyNotFoundError: the Key ID is not in the storage
+        """
+        if self.__url:
+            key = self.__remote_key(kid)
+            if key is not None:
+                return key
+
+        key = self.__snapshot.get(kid)
+        if key is not None:
+            return key
+
+        with self.__lock:
+            entry = self.__loaded.get(kid)
+            if entry is not None and not self.__expired(entry[0]):
+                self.__loaded.move_to_end(kid)
+                return entry[1]
+            # an expired key is loaded again, it may be revoked
+            self.__loaded.pop(kid, None)
+
+        if self.__storage is None:
+            raise TokenKidInvalidError(f"Unknown Key ID '{kid}'.")
+
+        # repeated unknown Key IDs never reach the storage
+        if self.__negative.is_missing(kid):
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+        try:
+            _, result = self.__storage.load_keys(kid=kid)
+        except self.__storage.missing_errors as error:
+            self.__negative.add(kid)
+            if isinstance(error, KeyNotFoundError):
+                raise
+            raise KeyNotFoundError(f"Key ID '{kid}' not found.") from error
+
+        # only the public part of the keys is kept
+        public = result["data"]["keys"]["public"]
+        if not public:
+            # HS256 keys are verified only with the secret (WrapJWT)
+            raise KeyNotFoundError(f"Key ID '{kid}' has no public key.")
+        key = jwk.import_key(public)
+        expire_at = (
+            time.monotonic() + self.__ttl if self.__ttl else float("inf")
+        )
+        with self.__lock:
+            self.__loaded[kid] = (expire_at, key)
+            while self.__maxsize and len(self.__loaded) > self.__maxsize:
+                self.__loaded.popitem(last=False)
+        return key
+
+    def decode(self, token: str) -> Token:
+        """
+        Decode and verify token with public key
+
+        :param token: Token to decode
+        :type str:
+        :returns: object
+        :rtype Token:
+        :raise TokenKidInvalidError:
+        :raise TokenMalformedError:
+        """
+        parsed = self.__parser.parse(token)
+        kid = parsed.headers()["kid"]
+        key = self.load_key(kid)
+        self.__local.kid = kid
+        return self.__parser.verify(parsed, key, KeyPolicy.key_alg(key))
+
+    def get_negative_cache(self) -> NegativeCache:
+        """Return cache of Key IDs missing in the storage"""
+        return self.__negative
+
+    def get_etag(self) -> str:
+        """Return ETag of the keys fetched from the JWKS endpoint"""
+        return self.__etag
+
+    def update_keys(self, keys: dict, etag: str = "") -> None:
+        """
+        Replace the snapshot of public keys, keys missing in the new
+        snapshot are not accepted anymore
+
+        :param keys: - { 'keys': [ { 'kid': str, ...public JWK } ] }
+        :type dict:
+        :param etag: - version of the snapshot
+        :type str:
+        """
+        current = self.__snapshot
+        snapshot = {}
+        for key in keys.get("keys", []):
+            kid = key["kid"]
+            # keys of a Key ID never change, they are imported once
+            snapshot[kid] = current.get(kid) or jwk.import_key(key)
+        self.__snapshot = snapshot
+        self.__etag = etag
+
+    def refresh_keys(self) -> bool:
+        """
+        Fetch keys from the JWKS endpoint when they changed
+
+        :returns: True when the keys changed
+        :rtype: bool
+        :raises requests.RequestException:
+        """
+        if self.__session is None:
+            raise ObjectTypeError("JWKS endpoint URL is not set.")
+
+        # a failed request is not repeated before the next interval
+        self.__refreshed_at = time.monotonic()
+        headers = {"If-None-Match": self.__etag} if self.__etag else {}
+        response = self.__session.get(
+            self.__url, headers=headers, timeout=self.__timeout
+        )
+        if response.status_code == 304:
+            return False
+        response.raise_for_status()
+        self.update_keys(response.json(), response.headers.get("ETag", ""))
+        return True
+
+    def __remote_key(self, kid: str) -> Key | None:
+        """Return a key from the JWKS endpoint, refresh stale keys"""
+        refreshed_at = self.__refreshed_at
+        age = time.monotonic() - refreshed_at
+        key = self.__snapshot.get(kid)
+        if key is not None and age < self.__refresh_interval:
+            return key
+        if key is None and age < self.unknown_kid_interval:
+            return None
+
+        # one thread refreshes stale keys, the others use them meanwhile
+        if self.__refresh_lock.acquire(blocking=key is None):
+            try:
+                if self.__refreshed_at == refreshed_at:
+                    self.refresh_keys()
+            except requests.RequestException:
+                # known keys are used while the endpoint is not available
+                if key is None and not self.__snapshot:
+                    raise
+            finally:
+                self.__refresh_lock.release()
+        return self.__snapshot.get(kid)
+
+    def export_keys(self) -> dict:
+        """
+        Return known public keys as a snapshot (JWKS)
+
+        :returns: { 'keys': [ { 'kid': str, ...public JWK } ] }
+        :rtype dict:
+        """
+        with self.__lock:
+            loaded = {
+                kid: key
+                for kid, (expire_at, key) in self.__loaded.items()
+                if not self.__expired(expire_at)
+            }
+        keys = {**loaded, **self.__snapshot}
+        return {
+            "keys": [
+                {**key.as_dict(private=False), "kid": kid}
+                for kid, key in keys.items()
+            ]
+        }
+
+    @staticmethod
+    def __expired(expire_at: float) -> bool:
+        return time.monotonic() >= expire_at
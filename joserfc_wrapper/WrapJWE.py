@@ -1,12 +1,40 @@
 """ joserfc jwe wrapper """
+import os
+import json
+import base64
+import struct
+import binascii
+from concurrent.futures import Executor
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, BinaryIO, Iterable, Iterator
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.keywrap import (
+    InvalidUnwrap,
+    aes_key_unwrap,
+    aes_key_wrap,
+)
 from joserfc import jwe
+from joserfc.errors import DecodeError
 from joserfc.jwk import OctKey
-from joserfc_wrapper.Exceptions import ObjectTypeError
+from joserfc_wrapper.Exceptions import ObjectTypeError, StreamDecryptError
+from joserfc_wrapper.KeyPolicy import KeyPolicy
 from joserfc_wrapper.WrapJWK import WrapJWK
 
+# frame length prefix, big endian
+_LENGTH = struct.Struct(">I")
+# max. length of a stream header, longer headers are garbage
+_MAX_HEADER = 4096
+_STREAM_TYPE = "JWE+stream"
+
 
 class WrapJWE:
-    """Encrypt and decrypt custom data"""
+    """Encrypt and decrypt custom data
+
+    Data is encrypted by the algorithms of the keys (see KeyPolicy),
+    JWE with other algorithms are rejected.
+    """
 
     def __init__(self, wrapjwk: WrapJWK) -> None:
         """
@@ -17,7 +45,9 @@ class WrapJWE:
             raise ObjectTypeError
         self.__jwk = wrapjwk
 
-    def encrypt(self, data: str | bytes, kid: str = "") -> str:
+    def encrypt(
+        self, data: str | bytes | bytearray | memoryview, kid: str = ""
+    ) -> str:
         """
         Encrypt string or bytes with key
 
@@ -27,12 +57,25 @@ class WrapJWE:
         :rtype str:
         :raise TypeError:
         """
+        if isinstance(data, (bytearray, memoryview)):
+            # the compact serialization needs one copy anyway
+            data = bytes(data)
         if isinstance(data, str) or isinstance(data, bytes):
-            self.__load_keys(kid)
             # encrypt with last key
-            protected = {"alg": "A128KW", "enc": "A128GCM"}
-            key = OctKey.import_key(self.__jwk.get_secret_key())
-            return jwe.encrypt_compact(protected, data, key)
+            keyset = self.__jwk.get_keyset(kid)
+            policy = keyset.policy
+            protected = {
+                "alg": policy.enc_alg,
+                "enc": policy.enc,
+                "kid": keyset.kid,
+            }
+            with self.__jwk.get_instrumentation().stage("jwe.encrypt"):
+                return jwe.encrypt_compact(
+                    protected,
+                    data,
+                    keyset.encryption_key,
+                    registry=policy.encryption_registry(),
+                )
         raise TypeError("Bad type of data.")
 
     def decrypt(self, data: str, kid: str = "") -> bytes | None:
@@ -41,16 +84,510 @@ class WrapJWE:
 
         :param data: Secret string
         :type str:
+        :param kid: Key ID, default the Key ID in the JWE header or
+            the last keys
+        :type str:
         :returns: Decrypted strig with last valid key
         :rtype bytes | None:
         :raise TypeError:
         """
         if isinstance(data, str):
-            self.__load_keys(kid)
-            key = OctKey.import_key(self.__jwk.get_secret_key())
-            return jwe.decrypt_compact(data, key).plaintext
+            keyset = self.__jwk.get_keyset(kid or _header_kid(data))
+            with self.__jwk.get_instrumentation().stage("jwe.decrypt"):
+                return jwe.decrypt_compact(
+                    data,
+                    keyset.encryption_key,
+                    registry=keyset.policy.encryption_registry(),
+                ).plaintext
         raise TypeError("Bad type of data")
 
-    def __load_keys(self, kid: str) -> None:
-        # load keys if not loaded
-        self.__jwk.load_keys(kid)
+    def encrypt_many(
+        self,
+        data: Iterable[str | bytes | bytearray | memoryview],
+        kid: str = "",
+        executor: Executor | None = None,
+        chunksize: int = 256,
+    ) -> list[str]:
+        """
+        Encrypt many values with one key
+
+        Keys are loaded and imported once and the JWE registry and the
+        protected header are shared by the whole batch. The result is
+        the same compact JWE as from encrypt.
+
+        :param data: values to encrypt
+        :type Iterable[str | bytes | bytearray | memoryview]:
+        :param kid: Key ID, default last keys
+        :type str:
+        :param executor: Thread or process pool for the encryption,
+            default None (values are encrypted in the current thread)
+        :type Executor | None:
+        :param chunksize: values sent to a pool worker at once
+        :type int:
+        :returns: compact JWE for each value in order
+        :rtype list[str]:
+        :raise TypeError:
+        """
+        values = [_plaintext(value) for value in data]
+        keyset = self.__jwk.get_keyset(kid)
+        secret = keyset.encryption_key.raw_value
+        alg, enc = keyset.policy.enc_alg, keyset.policy.enc
+        with self.__jwk.get_instrumentation().stage("jwe.encrypt_many"):
+            if executor is None:
+                return _encrypt_values(values, keyset.kid, secret, alg, enc)
+
+            results: list[str] = []
+            for part in executor.map(
+                _encrypt_values,
+                # memoryview is not picklable
+                [[bytes(v) for v in p] for p in _batches(values, chunksize)],
+                repeat(keyset.kid),
+                repeat(secret),
+                repeat(alg),
+                repeat(enc),
+            ):
+                results.extend(part)
+            return results
+
+    def decrypt_many(
+        self,
+        data: Iterable[str],
+        kid: str = "",
+        executor: Executor | None = None,
+        chunksize: int = 256,
+    ) -> list[bytes | Exception]:
+        """
+        Decrypt many values
+
+        Values are grouped by the Key ID in their JWE header, keys for
+        each Key ID are loaded once. An error of one value does not stop
+        decrypting of the others.
+
+        :param data: compact JWE values
+        :type Iterable[str]:
+        :param kid: Key ID of values without a Key ID in the header,
+            default last keys
+        :type str:
+        :param executor: Thread or process pool for the decryption,
+            default None (values are decrypted in the current thread)
+        :type Executor | None:
+        :param chunksize: values sent to a pool worker at once
+        :type int:
+        :returns: plaintext or an exception for each value in order
+        :rtype list[bytes | Exception]:
+        """
+        values = list(data)
+        results: list[bytes | Exception] = [
+            TypeError("Bad type of data") for _ in values
+        ]
+
+        metrics = self.__jwk.get_instrumentation()
+        groups: dict[str, list[int]] = {}
+        for index, value in enumerate(values):
+            if isinstance(value, str):
+                groups.setdefault(_header_kid(value) or kid, []).append(index)
+
+        for group_kid, indexes in groups.items():
+            try:
+                keyset = self.__jwk.get_keyset(group_kid)
+            except Exception as e:  # pylint: disable=W0718
+                for index in indexes:
+                    results[index] = e
+                continue
+
+            secret = keyset.encryption_key.raw_value
+            alg, enc = keyset.policy.enc_alg, keyset.policy.enc
+            group = [values[index] for index in indexes]
+            with metrics.stage("jwe.decrypt_many"):
+                if executor is None:
+                    decrypted = _decrypt_values(group, secret, alg, enc)
+                else:
+                    decrypted = []
+                    for part in executor.map(
+                        _decrypt_values,
+                        _batches(group, chunksize),
+                        repeat(secret),
+                        repeat(alg),
+                        repeat(enc),
+                    ):
+                        decrypted.extend(part)
+            for index, result in zip(indexes, decrypted):
+                results[index] = result
+
+        return results
+
+    def encrypt_stream(
+        self,
+        data: bytes | bytearray | memoryview | BinaryIO | Iterable[bytes],
+        kid: str = "",
+        chunk_size: int = 65536,
+    ) -> Iterator[bytes]:
+        """
+        Encrypt a large payload in authenticated chunks
+
+        The payload is read and encrypted one chunk at a time, so memory
+        stays flat regardless of the payload size. Bytes-like data is
+        sliced without copies. A random content key is wrapped (AES key
+        wrap, also for 'dir' keys) by the secret key of the Key ID, every
+        chunk is encrypted by the 'enc' of the keys with a nonce made of
+        a random prefix, the chunk number and a last chunk flag, so
+        removed, reordered or truncated chunks are detected.
+
+        :param data: bytes-like, binary file-like object or an iterable
+            of bytes-like pieces
+        :type bytes | bytearray | memoryview | BinaryIO | Iterable[bytes]:
+        :param kid: Key ID, default last keys
+        :type str:
+        :param chunk_size: - plaintext bytes per chunk
+        :type int:
+        :returns: binary stream (a header and chunk frames)
+        :rtype Iterator[bytes]:
+        :raise TypeError:
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive.")
+        chunks = _iter_chunks(data, chunk_size)
+        keyset = self.__jwk.get_keyset(kid)
+        secret = keyset.encryption_key.raw_value
+
+        cek = AESGCM.generate_key(
+            bit_length=KeyPolicy.CONTENT_ENCRYPTION[keyset.policy.enc]
+        )
+        prefix = os.urandom(7)
+        header = json.dumps(
+            {
+                "typ": _STREAM_TYPE,
+                "alg": _wrap_alg(secret),
+                "enc": keyset.policy.enc,
+                "kid": keyset.kid,
+                "cs": chunk_size,
+                "ek": _b64encode(aes_key_wrap(secret, cek)),
+                "iv": _b64encode(prefix),
+            },
+            separators=(",", ":"),
+            sort_keys=True,
+        ).encode("utf-8")
+        return self.__encrypt_chunks(chunks, header, AESGCM(cek), prefix)
+
+    def decrypt_stream(
+        self,
+        data: bytes | bytearray | memoryview | BinaryIO | Iterable[bytes],
+        kid: str = "",
+    ) -> Iterator[bytes]:
+        """
+        Decrypt a stream created by encrypt_stream chunk by chunk
+
+        A chunk is returned only after it was authenticated. A modified,
+        reordered or truncated stream raises StreamDecryptError, chunks
+        returned before the error must be discarded by the caller.
+
+        :param data: bytes-like, binary file-like object or an iterable
+            of bytes-like pieces
+        :type bytes | bytearray | memoryview | BinaryIO | Iterable[bytes]:
+        :param kid: Key ID, default the Key ID in the stream header
+        :type str:
+        :returns: plaintext chunks
+        :rtype Iterator[bytes]:
+        :raise StreamDecryptError:
+        :raise TypeError:
+        """
+        reader = _Reader(data)
+        frame = reader.frame(_MAX_HEADER)
+        if frame is None:
+            raise StreamDecryptError("Missing stream header.")
+        header = bytes(frame)
+        try:
+            params = json.loads(header)
+            if params.get("typ") != _STREAM_TYPE:
+                raise ValueError("Not an encrypted stream.")
+            if kid and kid != params["kid"]:
+                raise ValueError("Stream is encrypted with another Key ID.")
+            chunk_size = int(params["cs"])
+            wrapped = _b64decode(params["ek"])
+            prefix = _b64decode(params["iv"])
+            if len(prefix) != 7 or chunk_size <= 0:
+                raise ValueError("Invalid stream header.")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise StreamDecryptError(str(e)) from e
+
+        keyset = self.__jwk.get_keyset(params["kid"])
+        secret = keyset.encryption_key.raw_value
+        if (
+            params.get("alg") != _wrap_alg(secret)
+            or params.get("enc") != keyset.policy.enc
+        ):
+            raise StreamDecryptError("Algorithm does not match the keys.")
+        try:
+            cek = aes_key_unwrap(secret, wrapped)
+        except InvalidUnwrap as e:
+            raise StreamDecryptError("Invalid content key.") from e
+        if len(cek) * 8 != KeyPolicy.CONTENT_ENCRYPTION[keyset.policy.enc]:
+            raise StreamDecryptError("Invalid content key.")
+        return self.__decrypt_chunks(
+            reader, header, AESGCM(cek), prefix, chunk_size + 16
+        )
+
+    @staticmethod
+    def __encrypt_chunks(
+        chunks: Iterator[Any], header: bytes, aead: AESGCM, prefix: bytes
+    ) -> Iterator[bytes]:
+        """Return the header and encrypted chunk frames"""
+        yield _LENGTH.pack(len(header)) + header
+        # one chunk is read ahead to know which chunk is the last one
+        chunk = next(chunks, b"")
+        counter = 0
+        while True:
+            following = next(chunks, None)
+            last = following is None
+            sealed = aead.encrypt(_nonce(prefix, counter, last), chunk, header)
+            yield _LENGTH.pack(len(sealed)) + sealed
+            if following is None:
+                return
+            chunk = following
+            counter += 1
+
+    @staticmethod
+    def __decrypt_chunks(
+        reader: "_Reader",
+        header: bytes,
+        aead: AESGCM,
+        prefix: bytes,
+        max_frame: int,
+    ) -> Iterator[bytes]:
+        """Return authenticated plaintext chunks"""
+        counter = 0
+        sealed = reader.frame(max_frame)
+        while sealed is not None:
+            following = reader.frame(max_frame)
+            last = following is None
+            try:
+                yield aead.decrypt(
+                    _nonce(prefix, counter, last), sealed, header
+                )
+            except InvalidTag as e:
+                raise StreamDecryptError(
+                    f"Chunk {counter} is modified or the stream is truncated."
+                ) from e
+            sealed = following
+            counter += 1
+        if counter == 0:
+            raise StreamDecryptError("Stream is truncated.")
+
+
+class _ContentKey:
+    """Encrypt and decrypt compact JWE by one key with joserfc
+
+    The key is imported and the registry and the protected header are
+    created once for all values, only the algorithms of the key are
+    accepted.
+    """
+
+    def __init__(
+        self,
+        secret: bytes,
+        kid: str = "",
+        alg: str = "A128KW",
+        enc: str = "A128GCM",
+    ) -> None:
+        self.__key = OctKey.import_key(secret)
+        self.__registry = KeyPolicy(enc_alg=alg, enc=enc).encryption_registry()
+        self.__protected = {"alg": alg, "enc": enc, "kid": kid}
+
+    def encrypt(self, value: bytes | bytearray | memoryview) -> str:
+        """Return compact JWE of a value"""
+        return jwe.encrypt_compact(
+            self.__protected,
+            value if isinstance(value, bytes) else bytes(value),
+            self.__key,
+            registry=self.__registry,
+        )
+
+    def decrypt(self, value: str) -> bytes:
+        """Return plaintext of compact JWE"""
+        try:
+            decrypted = jwe.decrypt_compact(
+                value, self.__key, registry=self.__registry
+            )
+        except binascii.Error as e:
+            # joserfc does not wrap malformed base64 segments
+            raise DecodeError(str(e) or "Invalid base64.") from e
+        return decrypted.plaintext or b""
+
+
+class _Reader:
+    """Read length-prefixed frames from bytes, a file or an iterable"""
+
+    def __init__(self, source: Any) -> None:
+        self.__view: memoryview | None = None
+        self.__file = None
+        self.__pieces: Iterator | None = None
+        self.__buffer = bytearray()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.__view = memoryview(source).cast("B")
+        elif hasattr(source, "read"):
+            self.__file = source
+        elif isinstance(source, Iterable) and not isinstance(source, str):
+            self.__pieces = iter(source)
+        else:
+            raise TypeError("Bad type of data.")
+        self.__offset = 0
+
+    def frame(self, max_length: int) -> memoryview | bytes | None:
+        """Return one frame or None at the end of the stream"""
+        prefix = self.__read(_LENGTH.size)
+        if not prefix:
+            return None
+        if len(prefix) != _LENGTH.size:
+            raise StreamDecryptError("Stream is truncated.")
+        (length,) = _LENGTH.unpack(prefix)
+        if length > max_length:
+            raise StreamDecryptError("Frame is too long.")
+        frame = self.__read(length)
+        if len(frame) != length:
+            raise StreamDecryptError("Stream is truncated.")
+        return frame
+
+    def __read(self, size: int) -> memoryview | bytes:
+        """Return 'size' bytes, less only at the end of the stream"""
+        if self.__view is not None:
+            start = self.__offset
+            self.__offset = min(start + size, len(self.__view))
+            return self.__view[start : self.__offset]
+        if self.__file is not None:
+            return _read_full(self.__file, size)
+
+        assert self.__pieces is not None
+        while len(self.__buffer) < size:
+            piece = next(self.__pieces, None)
+            if piece is None:
+                break
+            self.__buffer += piece
+        data = bytes(self.__buffer[:size])
+        del self.__buffer[:size]
+        return data
+
+
+def _iter_chunks(data: Any, size: int) -> Iterator[Any]:
+    """Return fixed-size chunks of bytes-like data, a file or an iterable"""
+    if isinstance(data, str):
+        raise TypeError("Bad type of data, encode the text first.")
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data).cast("B")
+        return (view[i : i + size] for i in range(0, len(view), size))
+    if hasattr(data, "read"):
+        return _iter_file(data, size)
+    if isinstance(data, Iterable):
+        return _iter_pieces(iter(data), size)
+    raise TypeError("Bad type of data.")
+
+
+def _iter_file(file: BinaryIO, size: int) -> Iterator[bytes]:
+    while True:
+        chunk = _read_full(file, size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_pieces(pieces: Iterator[Any], size: int) -> Iterator[bytes]:
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= size:
+            yield bytes(buffer[:size])
+            del buffer[:size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _read_full(file: BinaryIO, size: int) -> bytes:
+    """Read 'size' bytes from a file, less only at the end of the file"""
+    data = file.read(size)
+    if len(data) == size or not data:
+        return data
+    parts = [data]
+    remaining = size - len(data)
+    while remaining:
+        data = file.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b"".join(parts)
+
+
+def _plaintext(value: Any) -> bytes | bytearray | memoryview:
+    """Return a value to encrypt as bytes-like"""
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return value
+    raise TypeError("Bad type of data.")
+
+
+def _batches(values: list, size: int) -> list[list]:
+    size = max(1, size)
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+def _encrypt_values(
+    values: list,
+    kid: str,
+    secret: bytes,
+    alg: str = "A128KW",
+    enc: str = "A128GCM",
+) -> list[str]:
+    """Encrypt values by one key (also in a pool worker process)"""
+    key = _ContentKey(secret, kid, alg, enc)
+    return [key.encrypt(value) for value in values]
+
+
+def _decrypt_values(
+    values: list[str],
+    secret: bytes,
+    alg: str = "A128KW",
+    enc: str = "A128GCM",
+) -> list[bytes | Exception]:
+    """Decrypt values by one key, errors are returned instead of raised"""
+    key = _ContentKey(secret, alg=alg, enc=enc)
+    results: list[bytes | Exception] = []
+    for value in values:
+        try:
+            results.append(key.decrypt(value))
+        except Exception as e:  # pylint: disable=W0718
+            results.append(e)
+    return results
+
+
+@lru_cache(maxsize=64)
+def _parse_header(segment: str) -> dict:
+    """Return a protected header, values of a batch share few headers"""
+    try:
+        header = json.loads(_b64decode(segment))
+    except (ValueError, binascii.Error):
+        return {}
+    return header if isinstance(header, dict) else {}
+
+
+def _wrap_alg(secret: bytes) -> str:
+    """Return the AES key wrap algorithm of a secret key"""
+    return f"A{len(secret) * 8}KW"
+
+
+def _header_kid(value: str) -> str:
+    """Return the Key ID in the header of compact JWE or ''"""
+    kid = _parse_header(value.split(".", 1)[0]).get("kid", "")
+    return kid if isinstance(kid, str) else ""
+
+
+def _nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    """Return a 96-bit chunk nonce (prefix, chunk number, last flag)"""
+    return prefix + struct.pack(">IB", counter, last)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
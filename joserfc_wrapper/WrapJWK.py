@@ -1,62 +1,269 @@
 """ joserfc jwk wrapper """
-import uuid
-from joserfc.jwk import ECKey, OctKey
+import time
+import threading
+from collections import OrderedDict
+from joserfc.jwk import Key, OctKey
 from joserfc_wrapper.Exceptions import (
-    GenerateKeysError,
+    KeyNotFoundError,
+    KeysLoadError,
     ObjectTypeError,
 )
 from joserfc_wrapper.AbstractKeyStorage import AbstractKeyStorage
+from joserfc_wrapper.Instrumentation import Instrumentation
+from joserfc_wrapper.InstrumentedStorage import InstrumentedStorage
+from joserfc_wrapper.KeyCache import KeyCache
+from joserfc_wrapper.NegativeCache import NegativeCache
+from joserfc_wrapper.TokenCache import TokenCache
+from joserfc_wrapper.KeyPolicy import KeyPolicy
+from joserfc_wrapper.KeySet import KeySet
+from joserfc_wrapper.KeyRotator import KeyRotator
 
 
 class WrapJWK:
-    """Handles generation, loading, and saving of private, public keys"""
+    """
+    Handles generation, loading, and saving of private, public keys
 
-    def __init__(self, storage: AbstractKeyStorage) -> None:
+    One object can be shared by threads. Loaded keys are read-only
+    snapshots (KeySet), the counter and key rotation are guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        storage: AbstractKeyStorage,
+        cache: KeyCache | None = None,
+        flush_every: int = 1,
+        flush_interval: float = 0,
+        max_age: float = 0,
+        negative_cache: NegativeCache | None = None,
+        token_cache: TokenCache | None = None,
+        policy: KeyPolicy | None = None,
+        instrumentation: Instrumentation | None = None,
+    ) -> None:
         """
         :param storage: Storage object
         :type AbstractKeyStorage:
+        :param cache: Cache for loaded keys, default None (no cache)
+        :type KeyCache | None:
+        :param flush_every: Persist the counter after this number of
+            signed tokens, default 1 (every token)
+        :type int:
+        :param flush_interval: Persist the counter when this number of
+            seconds elapsed since the last write, 0 = not used
+        :type float:
+        :param max_age: Rotate keys older than this number of seconds
+            when a token is signed, 0 = not used
+        :type float:
+        :param negative_cache: Cache for Key IDs missing in the storage,
+            default NegativeCache()
+        :type NegativeCache | None:
+        :param token_cache: Cache for verified tokens, default None
+            (every token is verified)
+        :type TokenCache | None:
+        :param policy: Key types and algorithms of generated keys,
+            default KeyPolicy() (ES256, A128KW, A128GCM), loaded keys
+            use the policy saved with them
+        :type KeyPolicy | None:
+        :param instrumentation: Receiver of stage durations, counters
+            and events, default Instrumentation() (no-op), the storage
+            is wrapped by InstrumentedStorage when it is enabled
+        :type Instrumentation | None:
         """
         if not isinstance(storage, AbstractKeyStorage):
             raise ObjectTypeError
+        if cache is not None and not isinstance(cache, KeyCache):
+            raise ObjectTypeError
+        if negative_cache is not None and not isinstance(
+            negative_cache, NegativeCache
+        ):
+            raise ObjectTypeError
+        if token_cache is not None and not isinstance(token_cache, TokenCache):
+            raise ObjectTypeError
+        if policy is not None and not isinstance(policy, KeyPolicy):
+            raise ObjectTypeError
+        if instrumentation is not None and not isinstance(
+            instrumentation, Instrumentation
+        ):
+            raise ObjectTypeError
+        self.__metrics = (
+            Instrumentation() if instrumentation is None else instrumentation
+        )
+        if self.__metrics.enabled:
+            storage = InstrumentedStorage(storage, self.__metrics)
         self.__storage = storage
+        self.__cache = cache
+        self.__negative = (
+            NegativeCache() if negative_cache is None else negative_cache
+        )
+        self.__token_cache = token_cache
+        self.__policy = policy or KeyPolicy()
 
-        # unicate key id
-        self.__kid: str
+        # guards the current keys, the counter and rotation
+        self.__lock = threading.RLock()
 
-        # keys (generated or loaded)
-        self.__private: dict
-        self.__public: dict
-
-        # key for secret a data (JWE)
-        self.__secret_key: dict
+        # current keys (generated or loaded), replaced as a whole
+        self.__keyset: KeySet | None = None
+        # the number of rotations, a load started before a rotation
+        # must not replace the rotated keys
+        self.__rotations = 0
 
         # the number of tokens generated by this key
-        self.__counter: int
+        self.__counter = 0
+        # when the current keys were generated or activated
+        self.__activated_at = time.monotonic()
+        self.__max_age = max_age
+
+        # background rotation with pre-generated keys
+        self.__rotator: KeyRotator | None = None
+
+        # tokens counted in memory but not yet saved to the storage
+        self.__pending = 0
+        self.__flush_every = max(1, flush_every)
+        self.__flush_interval = flush_interval
+        self.__flushed_at = time.monotonic()
+
+        # keys with imported key objects per Key ID
+        self.__keysets: OrderedDict[str, KeySet] = OrderedDict()
+        self.__keysets_maxsize = cache.maxsize if cache is not None else 16
 
     def get_kid(self) -> str:
         """Return Key ID"""
-        return self.__kid
+        return self.__current().kid
 
     def get_public_key(self) -> dict:
         """Return public key"""
-        return self.__public
+        return self.__current().public
 
     def get_private_key(self) -> dict:
         """Return private key"""
-        return self.__private
+        return self.__current().private
 
     def get_secret_key(self) -> dict:
         """return secret key for encrypted content in claim"""
-        return self.__secret_key
+        return self.__current().secret
+
+    def get_signing_key(self) -> Key:
+        """Return imported private key for signing"""
+        return self.__current().signing_key
+
+    def get_verifying_key(self) -> Key:
+        """Return imported public key for signature verification"""
+        return self.__current().verifying_key
+
+    def get_encryption_key(self) -> OctKey:
+        """Return imported secret key for encrypted content (JWE)"""
+        return self.__current().encryption_key
+
+    def get_policy(self) -> KeyPolicy:
+        """Return key types and algorithms of generated keys"""
+        return self.__policy
+
+    def get_instrumentation(self) -> Instrumentation:
+        """Return receiver of metrics"""
+        return self.__metrics
+
+    def get_cache(self) -> KeyCache | None:
+        """Return keys cache"""
+        return self.__cache
+
+    def get_negative_cache(self) -> NegativeCache:
+        """Return cache of missing Key IDs"""
+        return self.__negative
+
+    def get_token_cache(self) -> TokenCache | None:
+        """Return verified tokens cache"""
+        return self.__token_cache
 
     def get_counter(self) -> int:
         """return token counter"""
         return self.__counter
 
+    def get_key_age(self) -> float:
+        """
+        Return seconds since the current keys were generated, keys from
+        the pool of a background rotation count from their activation
+        """
+        self.__current()
+        return time.monotonic() - self.__activated_at
+
+    def get_rotator(self) -> KeyRotator | None:
+        """Return background rotation or None"""
+        return self.__rotator
+
+    def get_keyset(self, kid: str = "") -> KeySet:
+        """
+        Return keys for a Key ID without changing the current keys
+
+        :param kid: Unique key ID, default last keys
+        :type str:
+        :returns: keys
+        :rtype KeySet:
+        :raises KeyNotFoundError: the Key ID is not in the storage
+        """
+        kid, data = self.__load(kid)
+        return self.__get_keyset(kid, data)
+
+    def signing_keys(self, payload: int = 0) -> KeySet:
+        """
+        Return current keys for signing one token and count the token
+
+        :param payload: 0 = unlimited, otherwise new keys are generated
+            and saved when the keys signed this number of tokens
+        :type int:
+        :returns: keys
+        :rtype KeySet:
+        """
+        with self.__lock:
+            if (payload and self.__counter >= payload) or (
+                self.__max_age and self.get_key_age() >= self.__max_age
+            ):
+                self.rotate()
+            keyset = self.__current()
+            self.__counter += 1
+            self.__pending += 1
+            return keyset
+
     def increase_counter(self) -> None:
-        """Key Counter plus one"""
-        #        if self.__counter is not None:
-        self.__counter += 1
+        """Key Counter plus one (in memory, see save_counter)"""
+        with self.__lock:
+            self.__counter += 1
+            self.__pending += 1
+
+    def save_counter(self) -> None:
+        """
+        Save the counter to a storage when 'flush_every' tokens were
+        counted or 'flush_interval' seconds elapsed since the last write
+        """
+        if not self.__pending:
+            return
+        if self.__pending >= self.__flush_every or (
+            self.__flush_interval
+            and time.monotonic() - self.__flushed_at >= self.__flush_interval
+        ):
+            self.flush_counter()
+
+    def flush_counter(self) -> None:
+        """Save all counted tokens to a storage immediately"""
+        with self.__lock:
+            if not self.__pending:
+                return
+            keyset, amount = self.__current(), self.__pending
+            # tokens counted while waiting for the storage stay pending
+            self.__pending = 0
+            self.__flushed_at = time.monotonic()
+
+        try:
+            total = self.__storage.add_counter(keyset.kid, amount)
+        except Exception:
+            with self.__lock:
+                self.__pending += amount
+            raise
+
+        with self.__lock:
+            # other processes may sign with the same key
+            if keyset is self.__keyset:
+                self.__counter = max(self.__counter, total)
+        if self.__cache is not None:
+            self.__cache.set(keyset.kid, self.__as_dict(keyset, total))
 
     def generate_keys(self) -> None:
         """
@@ -65,47 +272,347 @@ class WrapJWK:
         :raises GenerateKeysError:
         :returns None:
         """
+        with self.__lock:
+            # counted tokens belong to the previous keys
+            self.flush_counter()
+
+            with self.__metrics.stage("keys.generate"):
+                keyset = KeySet.generate(self.__policy)
+            self.__activate(keyset)
+            self.__metrics.event("keys.generated", kid=keyset.kid)
+
+    def rotate(self) -> KeySet:
+        """
+        Replace current keys by new keys and save them
+
+        With a started background rotation the keys are taken from the
+        pool of pre-generated keys and saved in background.
+
+        :returns: new keys
+        :rtype KeySet:
+        """
+        rotator = self.__rotator
+        taken = rotator.take() if rotator is not None else None
+        with self.__lock:
+            previous = self.__keyset
+            previous_kid = previous.kid if previous is not None else ""
+            if rotator is None or taken is None or not taken[1]:
+                # keys are generated or saved here
+                if taken is None:
+                    self.generate_keys()
+                else:
+                    self.flush_counter()
+                    self.__activate(taken[0])
+                self.save_keys()
+                self.retire_keys(previous_kid)
+                keyset = self.__current()
+                self.__metrics.event(
+                    "keys.rotated", kid=keyset.kid, previous=previous_kid
+                )
+                return keyset
+
+            amount = self.__pending
+            self.__pending = 0
+            keyset = self.__activate(taken[0])
+            if self.__cache is not None:
+                self.__cache.set(keyset.kid, self.__as_dict(keyset, 0))
+                self.__cache.set_last_kid(keyset.kid)
+            rotator.publish(keyset, previous_kid, amount)
+            self.__metrics.event(
+                "keys.rotated", kid=keyset.kid, previous=previous_kid
+            )
+            return keyset
+
+    def start_rotation(
+        self,
+        pool_size: int = 1,
+        period: float = 0,
+        check_interval: float = 1.0,
+        retention: float = 0,
+        max_keys: int = 0,
+    ) -> KeyRotator:
+        """
+        Start background rotation with a pool of pre-generated keys
+
+        :param pool_size: - number of pre-generated keys
+        :type int:
+        :param period: - rotate keys used longer than this number of
+            seconds, 0 = rotate only when the payload limit is reached
+        :type float:
+        :param check_interval: - seconds between checks of the period
+        :type float:
+        :param retention: - delete keys replaced more than this number
+            of seconds ago after a rotation, 0 = not by age
+        :type float:
+        :param max_keys: - keep at most this number of the newest keys
+            after a rotation, 0 = unlimited
+        :type int:
+        :returns: started rotation
+        :rtype KeyRotator:
+        """
+        self.stop_rotation()
+        rotator = KeyRotator(
+            self,
+            self.__storage,
+            pool_size,
+            period,
+            check_interval,
+            retention,
+            max_keys,
+        )
+        rotator.start()
+        self.__rotator = rotator
+        return rotator
+
+    def stop_rotation(self, timeout: float | None = None) -> bool:
+        """
+        Save pending rotations and stop background rotation
+
+        :param timeout: - max. seconds to wait
+        :type float | None:
+        :returns: True when all rotations are saved
+        :rtype: bool
+        """
+        rotator, self.__rotator = self.__rotator, None
+        if rotator is None:
+            return True
+        return rotator.stop(timeout)
+
+    def retire_keys(self, kid: str) -> None:
+        """
+        Save the time when keys were replaced by newer keys, the
+        retention of prune_keys is measured from it
+
+        :param kid: Key ID of the replaced keys, '' = nothing to do
+        :type str:
+        """
+        if not kid:
+            return
         try:
-            # generate keys
-            self.__kid = uuid.uuid4().hex.lower()
-            key = ECKey.generate_key("P-256")
+            self.__storage.retire_keys(kid, time.time())
+        except NotImplementedError:
+            # the retention is measured from the generation time
+            pass
 
-            # Save key for encrypted content
-            self.__secret_key = OctKey.generate_key(128).as_dict()
+    def prune_keys(self, retention: float, max_keys: int = 0) -> list[str]:
+        """
+        Delete old keys from the storage and the caches
+
+        The current, the last, the previous (the last replaced) and
+        pre-generated keys are never deleted. The retention is measured
+        from the replacement of keys by newer keys, keys without it
+        (replaced by generate_keys or saved by older versions) from
+        their generation time. Keys without both times are deleted only
+        by the 'max_keys' limit.
 
-            # Save keys for signing
-            self.__private = key.as_dict(private=True)
-            self.__public = key.as_dict(private=False)
+        :param retention: - delete keys replaced more than this number
+            of seconds ago, 0 = not by age
+        :type float:
+        :param max_keys: - keep at most this number of the newest keys,
+            0 = unlimited
+        :type int:
+        :returns: deleted Key IDs
+        :rtype: list[str]
+        """
+        keep = {self.__storage.get_last_kid()}
+        current = self.__keyset
+        if current is not None:
+            keep.add(current.kid)
 
-            # New keys have a zero counter
-            self.__counter = 0
+        # pre-generated keys are not counted
+        rotator = self.__rotator
+        pool = set(rotator.pool_kids) if rotator is not None else set()
 
-        except Exception as e:
-            raise GenerateKeysError from e
+        # Key ID -> (replaced, generated)
+        times = {}
+        for kid in self.__storage.list_kids():
+            if kid not in keep and kid not in pool:
+                _, result = self.__storage.load_keys(kid)
+                data = result["data"]
+                times[kid] = (data.get("retired", 0), data.get("created", 0))
+        if times:
+            # tokens signed just before the last rotation are still valid
+            previous = max(times, key=times.__getitem__)
+            keep.add(previous)
+            del times[previous]
+        since = {
+            kid: retired or created for kid, (retired, created) in times.items()
+        }
+
+        now = time.time()
+        expired: set[str] = set()
+        if retention:
+            expired.update(
+                kid for kid, at in since.items() if at and now - at > retention
+            )
+        if max_keys:
+            newest = sorted(since, key=since.__getitem__, reverse=True)
+            expired.update(newest[max(0, max_keys - len(keep)) :])
+
+        deleted = sorted(expired)
+        for kid in deleted:
+            self.revoke_keys(kid)
+        return deleted
+
+    def revoke_keys(self, kid: str) -> None:
+        """
+        Delete keys from the storage and the caches, tokens signed by
+        the keys are not accepted anymore
+
+        Current keys are replaced by new keys first.
+
+        :param kid: Key ID
+        :type str:
+        """
+        current = self.__keyset
+        if current is not None and current.kid == kid:
+            self.rotate()
+        self.__storage.delete_keys(kid)
+        with self.__lock:
+            self.__keysets.pop(kid, None)
+        if self.__cache is not None:
+            self.__cache.invalidate(kid)
+        if self.__token_cache is not None:
+            self.__token_cache.invalidate_kid(kid)
+        self.__metrics.event("keys.revoked", kid=kid)
 
     def save_keys(self) -> None:
         """Save keys"""
-        # no 'data' keys here, HC Vault add this key automatically
-        keys = {
-            "keys": {
-                "private": self.__private,
-                "public": self.__public,
-                "secret": self.__secret_key,
-            },
-            "counter": self.__counter,
-        }
-        self.__storage.save_keys(kid=self.__kid, keys=keys)
+        with self.__lock:
+            keyset = self.__current()
+            keys = self.__as_dict(keyset, self.__counter)
+            self.__storage.save_keys(kid=keyset.kid, keys=keys)
+            self.__pending = 0
+            self.__flushed_at = time.monotonic()
 
-    def load_keys(self, kid: str = "") -> None:
+            if self.__cache is not None:
+                self.__cache.set(keyset.kid, keys)
+                self.__cache.set_last_kid(keyset.kid)
+
+    def load_keys(self, kid: str = "") -> KeySet:
         """
         Load keys and counter from a storage
 
         :param kid: Unique key ID, default None
         :type str:
+        :returns: loaded keys
+        :rtype KeySet:
         """
-        self.__kid, result = self.__storage.load_keys(kid=kid)
+        rotations = self.__rotations
+        loaded_kid, data = self.__load(kid)
+        keyset = self.__get_keyset(loaded_kid, data)
+
+        with self.__lock:
+            if kid == "" and (
+                rotations != self.__rotations or self.__publishing()
+            ):
+                # keys rotated while loading are newer than the loaded keys
+                return self.__current()
+
+            current = self.__keyset
+            if current is not None and current.kid == loaded_kid:
+                # the storage does not know about tokens counted in memory
+                self.__counter = max(
+                    self.__counter, data["counter"] + self.__pending
+                )
+            else:
+                # counted tokens belong to the previous keys
+                self.flush_counter()
+                self.__keyset = keyset
+                self.__counter = data["counter"]
+                self.__activated_at = time.monotonic()
+                if keyset.created:
+                    # the age of keys generated by another process
+                    self.__activated_at -= max(0, time.time() - keyset.created)
+            return keyset
+
+    def __current(self) -> KeySet:
+        """Return current keys"""
+        keyset = self.__keyset
+        if keyset is None:
+            raise KeysLoadError("Keys are not loaded or generated.")
+        return keyset
+
+    def __activate(self, keyset: KeySet) -> KeySet:
+        """Replace current keys by new keys with a zero counter"""
+        self.__keysets_add(keyset)
+        self.__negative.discard(keyset.kid)
+        self.__keyset = keyset
+        self.__rotations += 1
+        self.__counter = 0
+        self.__activated_at = time.monotonic()
+        return keyset
+
+    def __publishing(self) -> bool:
+        """True while the last Key ID of a rotation is not saved yet"""
+        rotator = self.__rotator
+        return rotator is not None and rotator.publishing
+
+    def __as_dict(self, keyset: KeySet, counter: int) -> dict:
+        """Return keys in a storage format"""
+        # no 'data' keys here, HC Vault add this key automatically
+        return {
+            "keys": keyset.as_dict(),
+            "counter": counter,
+            "created": keyset.created,
+        }
+
+    def __get_keyset(self, kid: str, data: dict) -> KeySet:
+        """Return keys with imported key objects for a Key ID"""
+        with self.__lock:
+            keyset = self.__keysets.get(kid)
+            if keyset is not None:
+                self.__keysets.move_to_end(kid)
+                return keyset
+            keyset = KeySet(kid, data["keys"], data.get("created", 0))
+            self.__keysets_add(keyset)
+            return keyset
+
+    def __keysets_add(self, keyset: KeySet) -> None:
+        """Add keys to the LRU map of keys"""
+        self.__keysets[keyset.kid] = keyset
+        while (
+            self.__keysets_maxsize
+            and len(self.__keysets) > self.__keysets_maxsize
+        ):
+            self.__keysets.popitem(last=False)
+
+    def __load(self, kid: str) -> tuple[str, dict]:
+        """Load keys, Key IDs missing in the storage are remembered"""
+        with self.__metrics.stage("keys.load"):
+            if not kid:
+                return self.__load_cached(kid)
+
+            # repeated unknown Key IDs never reach the storage
+            if self.__negative.is_missing(kid):
+                self.__metrics.count("negative_cache.hits")
+                raise KeyNotFoundError(f"Key ID '{kid}' not found.")
+            try:
+                return self.__load_cached(kid)
+            except self.__storage.missing_errors as error:
+                self.__negative.add(kid)
+                if isinstance(error, KeyNotFoundError):
+                    raise
+                raise KeyNotFoundError(f"Key ID '{kid}' not found.") from error
+
+    def __load_cached(self, kid: str) -> tuple[str, dict]:
+        """Load keys from the cache, or from the storage on a cache miss"""
+        if self.__cache is None:
+            kid, result = self.__storage.load_keys(kid=kid)
+            return kid, result["data"]
+
+        last = kid == ""
+        if last:
+            kid = self.__cache.get_last_kid() or ""
+        if kid:
+            data = self.__cache.get(kid)
+            if data is not None:
+                self.__metrics.count("key_cache.hits")
+                return kid, data
 
-        self.__public = result["data"]["keys"]["public"]
-        self.__private = result["data"]["keys"]["private"]
-        self.__secret_key = result["data"]["keys"]["secret"]
-        self.__counter = result["data"]["counter"]
+        self.__metrics.count("key_cache.misses")
+        kid, result = self.__storage.load_keys(kid=kid)
+        self.__cache.set(kid, result["data"])
+        if last:
+            self.__cache.set_last_kid(kid)
+        return kid, result["data"]
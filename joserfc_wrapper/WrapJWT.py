@@ -1,37 +1,66 @@
 """ joserfc jwt wrapper """
 import time
-import base64
+import threading
 import json
-import uuid
+from concurrent.futures import Executor
+from functools import lru_cache
+from itertools import repeat
+from typing import Iterable, Iterator
 from joserfc_wrapper.Exceptions import (
     ObjectTypeError,
     CreateTokenException,
     TokenKidInvalidError,
 )
 from joserfc_wrapper.WrapJWK import WrapJWK
+from joserfc_wrapper.Instrumentation import Instrumentation
+from joserfc_wrapper.KeyPolicy import KeyPolicy
+from joserfc_wrapper.TokenParser import TokenParser
+from joserfc_wrapper.ClaimsValidator import ClaimsValidator
 
 from joserfc import jwt
-from joserfc.errors import MissingClaimError
-from joserfc.jwk import ECKey
-from joserfc.jwt import Token, JWTClaimsRegistry, ClaimsOption
+from joserfc.errors import (
+    ExpiredTokenError,
+    InvalidClaimError,
+    MissingClaimError,
+)
+from joserfc import jwk
+from joserfc.jws import CompactSignature
+from joserfc.jwt import Token
 
 
 class WrapJWT:
     """Handles for JWT"""
 
-    def __init__(self, wrapjwk: WrapJWK) -> None:
+    def __init__(
+        self,
+        wrapjwk: WrapJWK,
+        parser: TokenParser | None = None,
+        validator: ClaimsValidator | None = None,
+    ) -> None:
         """
         :param wrapjwk: for non vault storage
         :type WrapJWK:
+        :param parser: Token parser, default TokenParser() allowing
+            all signature algorithms of KeyPolicy
+        :type TokenParser | None:
+        :param validator: Claims of decoded tokens are validated,
+            default None (only the signature is verified)
+        :type ClaimsValidator | None:
         """
         if not isinstance(wrapjwk, WrapJWK):
             raise ObjectTypeError
+        if validator is not None and not isinstance(validator, ClaimsValidator):
+            raise ObjectTypeError
         self.__jwk: WrapJWK = wrapjwk
-        self.__kid: str = ""
+        # every token is verified only by the algorithm of its keys
+        self.__parser = parser or TokenParser(algorithms=KeyPolicy.SIGNATURES)
+        self.__validator = validator
+        # Key ID of the last decoded token, per thread
+        self.__local = threading.local()
 
     def get_kid(self) -> str:
-        """Return Key ID"""
-        return self.__kid
+        """Return Key ID of the last token decoded by this thread"""
+        return getattr(self.__local, "kid", "")
 
     def decode(self, token: str) -> Token:
         """
@@ -42,12 +71,119 @@ class WrapJWT:
         :returns: object
         :rtype Token:
         :raise TokenKidInvalidError:
+        :raise TokenMalformedError:
+        :raise InvalidClaimError: invalid claims (with a validator)
+
+        """
+        metrics = self.__jwk.get_instrumentation()
+        try:
+            return self.__decode(token, metrics)
+        except Exception as error:
+            metrics.count("jwt.rejected", error=type(error).__name__)
+            raise
+
+    def decode_many(
+        self,
+        tokens: Iterable[str],
+        executor: Executor | None = None,
+        chunksize: int = 64,
+    ) -> list[Token | Exception]:
+        """
+        Decode many tokens
+
+        Tokens are grouped by KID, keys for each KID are loaded once.
+        An error of one token does not stop decoding of the others.
+        Tokens in the verified tokens cache are not verified again.
 
+        :param tokens: Tokens to decode
+        :type Iterable[str]:
+        :param executor: Thread or process pool for signature checks,
+            default None (checks run in the current thread)
+        :type Executor | None:
+        :param chunksize: tokens sent to a process pool worker at once
+        :type int:
+        :returns: decoded Token or an exception for each token in order
+        :rtype list[Token | Exception]:
         """
-        if self.__load_keys_decode(token):
-            key = ECKey.import_key(self.__jwk.get_private_key())
-            return jwt.decode(token, key)
-        raise TokenKidInvalidError
+        tokens = list(tokens)
+        results: list[Token | Exception] = [
+            TokenKidInvalidError() for _ in tokens
+        ]
+
+        # group tokens by kid, invalid tokens are rejected here
+        metrics = self.__jwk.get_instrumentation()
+        cache = self.__jwk.get_token_cache()
+        groups: dict[str, list[int]] = {}
+        parsed = {}
+        for index, token in enumerate(tokens):
+            cached = cache.get(token) if cache is not None else None
+            if cached is not None:
+                results[index] = cached
+                continue
+            try:
+                with metrics.stage("jwt.parse"):
+                    parsed[index] = self.__parser.parse(token)
+            except TokenKidInvalidError as e:
+                results[index] = e
+                continue
+            kid = parsed[index].headers()["kid"]
+            groups.setdefault(kid, []).append(index)
+        if cache is not None:
+            hits = sum(isinstance(result, Token) for result in results)
+            metrics.count("token_cache.hits", hits)
+            metrics.count("token_cache.misses", len(tokens) - hits)
+
+        for kid, indexes in groups.items():
+            try:
+                keyset = self.__jwk.get_keyset(kid)
+            except Exception as e:  # pylint: disable=W0718
+                for index in indexes:
+                    results[index] = e
+                continue
+
+            algorithm = keyset.policy.alg
+            with metrics.stage("jwt.verify_many"):
+                if executor is None:
+                    key = keyset.verifying_key
+                    decoded = [
+                        _verify_token(
+                            self.__parser, parsed[index], key, algorithm
+                        )
+                        for index in indexes
+                    ]
+                else:
+                    group = [tokens[index] for index in indexes]
+                    # keys objects are not picklable, send the JWK
+                    verifying = json.dumps(keyset.verifying_jwk, sort_keys=True)
+                    decoded = list(
+                        executor.map(
+                            _decode_token,
+                            group,
+                            repeat(verifying),
+                            repeat([algorithm]),
+                            chunksize=chunksize,
+                        )
+                    )
+            for index, result in zip(indexes, decoded):
+                results[index] = result
+                if cache is not None and isinstance(result, Token):
+                    cache.set(tokens[index], result)
+
+        if self.__validator is not None:
+            for index, result in enumerate(results):
+                if isinstance(result, Token):
+                    try:
+                        self.__validator.validate(result)
+                    except (
+                        MissingClaimError,
+                        InvalidClaimError,
+                        ExpiredTokenError,
+                    ) as e:
+                        results[index] = e
+        for result in results:
+            if isinstance(result, Exception):
+                metrics.count("jwt.rejected", error=type(result).__name__)
+        return results
 
     def validate(self, token: Token, claims: dict) -> bool:
         """
@@ -58,14 +194,10 @@ class WrapJWT:
         :param claims: Claims keys to must be equal in token
         :type dict:
         :returns bool:
+        :raises InvalidClaimError: invalid or expired claims
         """
         try:
-            claims_for_registry: dict[str, ClaimsOption] = {
-                k: {"essential": True, "allow_blank": False, "value": v}
-                for k, v in claims.items()
-            }
-            reg = JWTClaimsRegistry(None, 0, **claims_for_registry)
-            reg.validate(token.claims)
+            _claims_validator(claims).validate(token)
             return True
         except MissingClaimError:
             return False
@@ -85,30 +217,110 @@ class WrapJWT:
         :rtype str:
         """
         # check required claims
-        self.__check_claims(claims)
+        self.check_claims(claims)
 
         # load last keys
-        self.__load_keys()
-        if payload and self.__jwk.get_counter() >= payload:
-            self.__jwk.generate_keys()
-            self.__jwk.save_keys()
+        self.__jwk.load_keys()
+        token = self.__sign(claims, payload)
+
+        # save counter (the storage is written by WrapJWK flush policy)
+        self.__jwk.save_counter()
+
+        return token
+
+    def create_many(
+        self, claims: Iterable[dict], payload: int = 0
+    ) -> list[str]:
+        """
+        Create JWT Tokens for many claims, see iter_create.
+
+        :param claims: claims for each token
+        :type Iterable[dict]:
+        :param payload: see create
+        :type int:
+        :raises CreateTokenException:
+        :returns: jwt tokens in the order of claims
+        :rtype list[str]:
+        """
+        return list(self.iter_create(claims, payload))
+
+    def iter_create(
+        self, claims: Iterable[dict], payload: int = 0
+    ) -> Iterator[str]:
+        """
+        Create JWT Tokens for many claims one by one.
+
+        Keys are loaded once for the whole batch, a new key is generated
+        in the middle of the batch when the payload is exceeded. The counter
+        is saved when the batch is finished (or the generator is closed).
+
+        :param claims: claims for each token
+        :type Iterable[dict]:
+        :param payload: see create
+        :type int:
+        :raises CreateTokenException:
+        :returns: jwt tokens in the order of claims
+        :rtype Iterator[str]:
+        """
+        self.__jwk.load_keys()
+        try:
+            for item in claims:
+                self.check_claims(item)
+                yield self.__sign(item, payload)
+        finally:
+            self.__jwk.flush_counter()
+
+    def __decode(self, token: str, metrics: Instrumentation) -> Token:
+        """Decode token, report stages of the decoding"""
+        cache = self.__jwk.get_token_cache()
+        decoded = cache.get(token) if cache is not None else None
+        if decoded is None:
+            if cache is not None:
+                metrics.count("token_cache.misses")
+            with metrics.stage("jwt.parse"):
+                parsed = self.__parser.parse(token)
+            kid = parsed.headers()["kid"]
+            self.__local.kid = kid
+            keyset = self.__jwk.get_keyset(kid)
+            with metrics.stage("keys.import"):
+                key = keyset.verifying_key
+            with metrics.stage("jwt.verify"):
+                decoded = self.__parser.verify(parsed, key, keyset.policy.alg)
+            if cache is not None:
+                cache.set(token, decoded)
+        else:
+            metrics.count("token_cache.hits")
+            self.__local.kid = decoded.header["kid"]
+
+        # cached tokens are validated too, e.g. they may expire meanwhile
+        if self.__validator is not None:
+            with metrics.stage("claims.validate"):
+                self.__validator.validate(decoded)
+        return decoded
+
+    def __sign(self, claims: dict, payload: int) -> str:
+        """Sign claims with loaded keys, rotate keys on payload limit"""
+        metrics = self.__jwk.get_instrumentation()
+        keyset = self.__jwk.signing_keys(payload)
 
         # create header
-        headers = {"alg": "ES256", "kid": self.__jwk.get_kid()}
+        headers = {"alg": keyset.policy.alg, "kid": keyset.kid}
         # add actual iat to claims
         claims["iat"] = int(time.time())  # actual unix timestamp
 
+        with metrics.stage("keys.import"):
+            key = keyset.signing_key
         # generate token
-        private = ECKey.import_key(self.__jwk.get_private_key())
-        token = jwt.encode(headers, claims, private)
-
-        # save counter
-        self.__jwk.increase_counter()
-        self.__jwk.save_keys()
-
-        return token
+        with metrics.stage("jwt.sign"):
+            return jwt.encode(
+                headers,
+                claims,
+                key,
+                registry=keyset.policy.signing_registry(),
+            )
 
-    def __check_claims(self, claims: dict) -> None | CreateTokenException:
+    @staticmethod
+    def check_claims(claims: dict) -> None | CreateTokenException:
         """
         Checks if the claims contains all required keys with valid types.
 
@@ -136,34 +348,48 @@ class WrapJWT:
                 )
         return None
 
-    def __load_keys(self, kid: str = "") -> None:
-        self.__jwk.load_keys(kid)
+    @staticmethod
+    def validate_kid(kid: str) -> bool:
+        """Validate Key ID"""
+        return TokenParser.validate_kid(kid)
 
-    def __load_keys_decode(self, token: str) -> bool | None:
-        """Load right keys for a token"""
-        kid = self.__decode_jwt(token)["kid"]
-        if not self.__validate_kid(kid):
-            return False
-        self.__kid = kid
-        self.__load_keys(kid)
-        return True
 
-    def __decode_jwt(self, token: str) -> dict:
-        """Decode token for get KID"""
-        header, _, _ = token.split(".")
-        return json.loads(self.__base64_url_decode(header).decode("utf-8"))
+def _claims_validator(claims: dict) -> ClaimsValidator:
+    """Return a validator compiled once per expected claims"""
+    try:
+        return _compiled_validator(tuple(sorted(claims.items())))
+    except TypeError:
+        # unhashable values
+        return ClaimsValidator(claims)
+
+
+@lru_cache(maxsize=128)
+def _compiled_validator(items: tuple) -> ClaimsValidator:
+    return ClaimsValidator(dict(items))
+
+
+@lru_cache(maxsize=128)
+def _import_key(verifying: str) -> jwk.Key:
+    """Import verifying key once per (pool worker) process"""
+    return jwk.import_key(json.loads(verifying))
+
+
+def _decode_token(
+    token: str, verifying: str, algorithms: list[str]
+) -> Token | Exception:
+    """Decode one token in a pool worker process"""
+    try:
+        key = _import_key(verifying)
+        return jwt.decode(token, key, algorithms=algorithms)
+    except Exception as e:  # pylint: disable=W0718
+        return e
 
-    def __validate_kid(self, kid: str) -> bool:
-        """Validate Key ID"""
-        try:
-            uuid_obj = uuid.UUID(kid)
-            return uuid_obj.version == 4
-        except ValueError:
-            return False
 
-    def __base64_url_decode(self, header: str) -> bytes:
-        """Just b64 decode"""
-        remainder = len(header) % 4
-        if remainder > 0:
-            header += "=" * (4 - remainder)
-        return base64.urlsafe_b64decode(header)
+def _verify_token(
+    parser: TokenParser, parsed: CompactSignature, key: jwk.Key, algorithm: str
+) -> Token | Exception:
+    """Verify one parsed token, return an error instead of raising it"""
+    try:
+        return parser.verify(parsed, key, algorithm)
+    except Exception as e:  # pylint: disable=W0718
+        return e
@@ -2,8 +2,32 @@
 # pylint: disable=C0103
 from .Exceptions import *
 from .AbstractKeyStorage import AbstractKeyStorage
+from .Instrumentation import Instrumentation
+from .MetricsRecorder import MetricsRecorder
+from .InstrumentedStorage import InstrumentedStorage
 from .StorageVault import StorageVault
 from .StorageFile import StorageFile
+from .StorageSQLite import StorageSQLite
+from .StorageRedis import StorageRedis
+from .StorageMemory import StorageMemory
+from .StorageChain import StorageChain
+from .KeyCache import KeyCache
+from .NegativeCache import NegativeCache
+from .TokenCache import TokenCache
 from .WrapJWK import WrapJWK
 from .WrapJWT import WrapJWT
 from .WrapJWE import WrapJWE
+from .TokenParser import TokenParser
+from .ClaimsValidator import ClaimsValidator
+from .VerifyJWT import VerifyJWT
+from .JWKSBuilder import JWKSBuilder
+from .KeyPolicy import KeyPolicy
+from .KeySet import KeySet
+from .KeyRotator import KeyRotator
+from .AbstractAsyncKeyStorage import AbstractAsyncKeyStorage
+from .AsyncStorage import AsyncStorage
+from .AsyncStorageFile import AsyncStorageFile
+from .AsyncStorageVault import AsyncStorageVault
+from .AsyncWrapJWK import AsyncWrapJWK
+from .AsyncWrapJWT import AsyncWrapJWT
+from .AsyncWrapJWE import AsyncWrapJWE
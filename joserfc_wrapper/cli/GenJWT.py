@@ -6,7 +6,13 @@ import fire
 import datetime
 from datetime import timezone
 from typing import Optional, Dict, Any
-from joserfc_wrapper import StorageVault, StorageFile, WrapJWK, WrapJWT
+from joserfc_wrapper import (
+    ClaimsValidator,
+    StorageVault,
+    StorageFile,
+    WrapJWK,
+    WrapJWT,
+)
 from joserfc.jwt import Token
 
 
@@ -151,22 +157,16 @@ class GenerateJWT:
             --aud=<audience>: str
             --token=<jwt token>: str
         """
-        # required claims
-        claims = {
-            "iss": iss,
-            "aud": aud,
-        }
+        # required claims, expired tokens are rejected too
+        validator = ClaimsValidator({"iss": iss, "aud": aud})
 
         try:
-            wjwt = WrapJWT(self.__wjwk)
-            decoded_token: Token = wjwt.decode(token=token)
-            if wjwt.validate(token=decoded_token, claims=claims):
-                return "Token is valid."
+            wjwt = WrapJWT(self.__wjwk, validator=validator)
+            wjwt.decode(token=token)
+            return "Token is valid."
         except Exception as e:  # pylint: disable=W0718
             return f"{type(e).__name__}: {str(e)}"
 
-        return ""
-
     def show(
         self, token: str, header: bool = False, claims: bool = True
     ) -> str:
@@ -0,0 +1,73 @@
+import copy
+import time
+import pytest
+from joserfc_wrapper import AbstractKeyStorage
+from tests.vault_server import VaultServer
+
+
+def wait_for(condition, timeout=5.0):
+    """Wait until a condition of a background thread is true"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+class CountingStorage(AbstractKeyStorage):
+    """In-memory storage which counts calls to the backend"""
+
+    missing_errors = (FileNotFoundError,)
+
+    def __init__(self):
+        self.keys = {}
+        self.last_kid = ""
+        self.calls = {
+            "get_last_kid": 0,
+            "load_keys": 0,
+            "save_keys": 0,
+            "add_counter": 0,
+        }
+
+    def get_last_kid(self):
+        self.calls["get_last_kid"] += 1
+        if not self.last_kid:
+            raise FileNotFoundError("last-key-id")
+        return self.last_kid
+
+    def load_keys(self, kid=""):
+        self.calls["load_keys"] += 1
+        if kid == "":
+            kid = self.get_last_kid()
+        if kid not in self.keys:
+            raise FileNotFoundError(kid)
+        return kid, copy.deepcopy(self.keys[kid])
+
+    def save_keys(self, kid, keys):
+        self.calls["save_keys"] += 1
+        self.stage_keys(kid, keys)
+        self._save_last_id(kid)
+
+    def stage_keys(self, kid, keys):
+        self.keys[kid] = {"data": copy.deepcopy(keys)}
+
+    def delete_keys(self, kid):
+        del self.keys[kid]
+
+    def add_counter(self, kid, amount):
+        self.calls["add_counter"] += 1
+        self.keys[kid]["data"]["counter"] += amount
+        return self.keys[kid]["data"]["counter"]
+
+    def _save_last_id(self, kid):
+        self.last_kid = kid
+
+
+@pytest.fixture
+def storage():
+    return CountingStorage()
+
+
+@pytest.fixture
+def vault():
+    with VaultServer() as server:
+        yield server
@@ -0,0 +1,81 @@
+"""In-memory redis.Redis compatible client for tests and benchmarks"""
+
+import fnmatch
+import threading
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+
+        return queue
+
+    def execute(self):
+        self.client.round_trips += 1
+        with self.client.lock:
+            return [
+                getattr(self.client, "_" + name)(*args)
+                for name, args in self.commands
+            ]
+
+
+class FakeRedis:
+    """redis.Redis compatible in-memory client, values are bytes"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def get(self, name):
+        self.round_trips += 1
+        with self.lock:
+            return self._get(name)
+
+    def set(self, name, value):
+        self.round_trips += 1
+        with self.lock:
+            return self._set(name, value)
+
+    def register_script(self, script):
+        """Scripts of StorageRedis are emulated, not interpreted"""
+        assert "EXISTS" in script and "INCRBY" in script
+
+        def add_counter(keys, args):
+            self.round_trips += 1
+            with self.lock:
+                if keys[0] not in self.data:
+                    return None
+                value = int(self.data.get(keys[1], 0)) + int(args[0])
+                self.data[keys[1]] = str(value).encode()
+                return value
+
+        return add_counter
+
+    def delete(self, *names):
+        self.round_trips += 1
+        with self.lock:
+            return sum(self.data.pop(name, None) is not None for name in names)
+
+    def scan_iter(self, match):
+        with self.lock:
+            names = list(self.data)
+        return [
+            name.encode() for name in names if fnmatch.fnmatchcase(name, match)
+        ]
+
+    def _get(self, name):
+        return self.data.get(name)
+
+    def _set(self, name, value):
+        self.data[name] = str(value).encode()
+        return True
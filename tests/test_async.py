@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from joserfc_wrapper import (
+    AsyncStorage,
+    AsyncStorageFile,
+    AsyncWrapJWE,
+    AsyncWrapJWK,
+    AsyncWrapJWT,
+    KeyCache,
+    ObjectTypeError,
+    TokenKidInvalidError,
+    WrapJWE,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+class SlowStorage(AsyncStorage):
+    """Async storage which yields to the event loop on every load"""
+
+    async def load_keys(self, kid=""):
+        await asyncio.sleep(0.01)
+        return self.storage.load_keys(kid)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_async_wrapjwk_rejects_sync_storage(storage):
+    with pytest.raises(ObjectTypeError):
+        AsyncWrapJWK(storage)
+
+
+def test_concurrent_loads_share_one_storage_call(storage):
+    async def main():
+        myjwk = AsyncWrapJWK(SlowStorage(storage))
+        await myjwk.generate_keys()
+        keysets = await asyncio.gather(*(myjwk.load_keys() for _ in range(10)))
+        return keysets
+
+    keysets = run(main())
+    assert storage.calls["load_keys"] == 1
+    assert len({keyset.kid for keyset in keysets}) == 1
+
+
+def test_async_create_decode_and_rotate(storage):
+    async def main():
+        myjwk = AsyncWrapJWK(SlowStorage(storage), cache=KeyCache())
+        await myjwk.generate_keys()
+        myjwt = AsyncWrapJWT(myjwk)
+        tokens = await asyncio.gather(
+            *(myjwt.create(dict(CLAIMS), payload=4) for _ in range(10))
+        )
+        return [await myjwt.decode(token) for token in tokens]
+
+    decoded = run(main())
+    kids = [token.header["kid"] for token in decoded]
+    counters = {kid: kids.count(kid) for kid in kids}
+    assert sorted(counters.values()) == [2, 4, 4]
+    for kid, count in counters.items():
+        assert storage.keys[kid]["data"]["counter"] == count
+
+
+def test_async_tokens_verify_with_sync_wrapper(tmp_path):
+    async def main():
+        myjwk = AsyncWrapJWK(AsyncStorageFile(str(tmp_path)))
+        await myjwk.generate_keys()
+        return await AsyncWrapJWT(myjwk).create(dict(CLAIMS))
+
+    token = run(main())
+    storage = AsyncStorageFile(str(tmp_path)).storage
+    assert WrapJWT(WrapJWK(storage)).decode(token).claims["uid"] == 123
+
+
+def test_async_decode_invalid_token(storage):
+    myjwt = AsyncWrapJWT(AsyncWrapJWK(AsyncStorage(storage)))
+    with pytest.raises(TokenKidInvalidError):
+        run(myjwt.decode("faketoken"))
+
+
+def test_async_encrypt_decrypt(storage):
+    async def main():
+        myjwk = AsyncWrapJWK(AsyncStorage(storage))
+        keyset = await myjwk.generate_keys()
+        myjwe = AsyncWrapJWE(myjwk)
+        secret = await myjwe.encrypt("very secret text")
+        return await myjwe.decrypt(secret, keyset.kid)
+
+    assert run(main()) == b"very secret text"
+
+
+def test_async_decrypt_by_header_kid(storage):
+    async def main():
+        myjwk = AsyncWrapJWK(AsyncStorage(storage))
+        keyset = await myjwk.generate_keys()
+        myjwe = AsyncWrapJWE(myjwk)
+        secret = await myjwe.encrypt("very secret text")
+        await myjwk.generate_keys()
+        return keyset.kid, secret, await myjwe.decrypt(secret)
+
+    kid, secret, plaintext = run(main())
+    assert plaintext == b"very secret text"
+    # the same JWE as from the sync wrapper, in both directions
+    myjwe = WrapJWE(WrapJWK(storage))
+    assert myjwe.decrypt(secret) == b"very secret text"
+    synced = myjwe.encrypt("sync text", kid)
+    myjwk = AsyncWrapJWK(AsyncStorage(storage))
+    assert run(AsyncWrapJWE(myjwk).decrypt(synced)) == b"sync text"
+
+
+def test_signing_keys_reloads_evicted_rotated_keys(storage):
+    async def main():
+        myjwk = AsyncWrapJWK(AsyncStorage(storage), cache=KeyCache(maxsize=1))
+        first = await myjwk.generate_keys()
+        await myjwk.signing_keys()
+        # a signer loads the first keys and waits for a running rotation
+        lock = myjwk._AsyncWrapJWK__rotate_lock
+        await lock.acquire()
+        signer = asyncio.ensure_future(myjwk.signing_keys(payload=1))
+        await asyncio.sleep(0)
+        rotated = await myjwk.generate_keys()
+        # the rotated keys are evicted by another load
+        await myjwk.load_keys(first.kid)
+        lock.release()
+        return rotated, await signer
+
+    rotated, keyset = run(main())
+    assert keyset.kid == rotated.kid
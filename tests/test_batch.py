@@ -0,0 +1,159 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+from joserfc import jwe
+from joserfc.errors import JoseError
+from joserfc.jwt import Token
+from joserfc_wrapper import (
+    WrapJWE,
+    WrapJWK,
+    WrapJWT,
+    CreateTokenException,
+    TokenKidInvalidError,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+@pytest.fixture
+def myjwk(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return myjwk
+
+
+def test_create_many_loads_and_saves_once(storage, myjwk):
+    myjwt = WrapJWT(myjwk)
+    tokens = myjwt.create_many({**CLAIMS, "uid": uid} for uid in range(10))
+    assert len(tokens) == 10
+    assert [myjwt.decode(t).claims["uid"] for t in tokens] == list(range(10))
+    assert storage.calls["add_counter"] == 1
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 10
+
+
+def test_create_many_rotates_in_the_middle(storage, myjwk):
+    first_kid = myjwk.get_kid()
+    myjwt = WrapJWT(myjwk)
+    tokens = myjwt.create_many((dict(CLAIMS) for _ in range(7)), payload=3)
+
+    kids = [myjwt.decode(t).header["kid"] for t in tokens]
+    assert kids[:3] == [first_kid] * 3
+    assert len(set(kids)) == 3
+    assert storage.keys[first_kid]["data"]["counter"] == 3
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 1
+
+
+def test_iter_create_saves_counter_when_closed(storage, myjwk):
+    myjwt = WrapJWT(myjwk)
+    tokens = myjwt.iter_create(dict(CLAIMS) for _ in range(100))
+    for _ in range(4):
+        next(tokens)
+    tokens.close()
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 4
+
+
+def test_create_many_invalid_claims(storage, myjwk):
+    myjwt = WrapJWT(myjwk)
+    with pytest.raises(CreateTokenException):
+        myjwt.create_many([dict(CLAIMS), {"iss": "x"}])
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 1
+
+
+@pytest.mark.parametrize(
+    "pool", [None, ThreadPoolExecutor, ProcessPoolExecutor]
+)
+def test_decode_many_groups_by_kid(storage, myjwk, pool):
+    myjwt = WrapJWT(myjwk)
+    claims = [{**CLAIMS, "uid": uid} for uid in range(4)]
+    tokens = myjwt.create_many(claims, payload=2)
+    storage.calls["load_keys"] = 0
+
+    if pool is None:
+        results = myjwt.decode_many(tokens)
+    else:
+        with pool(max_workers=2) as executor:
+            results = myjwt.decode_many(tokens, executor=executor)
+
+    assert [r.claims["uid"] for r in results] == [0, 1, 2, 3]
+    assert len({r.header["kid"] for r in results}) == 2
+    assert storage.calls["load_keys"] == 2
+
+
+def test_decode_many_reports_errors_per_token(storage, myjwk):
+    myjwt = WrapJWT(myjwk)
+    token = myjwt.create(claims=dict(CLAIMS))
+    header, payload, signature = token.split(".")
+    forged = ".".join([header, payload[:-2] + "xx", signature])
+
+    results = myjwt.decode_many(["faketoken", token, forged])
+    assert isinstance(results[0], TokenKidInvalidError)
+    assert isinstance(results[1], Token)
+    assert isinstance(results[2], JoseError)
+
+
+@pytest.mark.parametrize(
+    "pool", [None, ThreadPoolExecutor, ProcessPoolExecutor]
+)
+def test_encrypt_and_decrypt_many(storage, myjwk, pool):
+    myjwe = WrapJWE(myjwk)
+    values = ["text", b"bytes", bytearray(b"array"), memoryview(b"view")]
+    old = myjwe.encrypt_many(values)
+    myjwk.rotate()
+
+    if pool is None:
+        new = myjwe.encrypt_many(values)
+        storage.calls["load_keys"] = 0
+        results = myjwe.decrypt_many(old + new, chunksize=3)
+    else:
+        with pool(max_workers=2) as executor:
+            new = myjwe.encrypt_many(values, executor=executor)
+            storage.calls["load_keys"] = 0
+            results = myjwe.decrypt_many(
+                old + new, executor=executor, chunksize=3
+            )
+
+    plain = [b"text", b"bytes", b"array", b"view"]
+    assert results == plain + plain
+    # keys are loaded once per Key ID
+    assert storage.calls["load_keys"] == 2
+
+
+def test_batch_values_are_compact_jwe(myjwk):
+    myjwe = WrapJWE(myjwk)
+    [value] = myjwe.encrypt_many(["secret"])
+    assert myjwe.decrypt(value) == b"secret"
+    assert myjwe.decrypt_many([myjwe.encrypt("secret")]) == [b"secret"]
+
+
+def test_batch_values_interoperate_with_joserfc(myjwk):
+    myjwe = WrapJWE(myjwk)
+    keyset = myjwk.get_keyset()
+    registry = keyset.policy.encryption_registry()
+    [value] = myjwe.encrypt_many(["secret"])
+    decrypted = jwe.decrypt_compact(
+        value, keyset.encryption_key, registry=registry
+    )
+    assert decrypted.plaintext == b"secret"
+    assert decrypted.protected["kid"] == keyset.kid
+
+    value = jwe.encrypt_compact(
+        {"alg": keyset.policy.enc_alg, "enc": keyset.policy.enc},
+        "secret",
+        keyset.encryption_key,
+        registry=registry,
+    )
+    assert myjwe.decrypt_many([value]) == [b"secret"]
+
+
+def test_decrypt_many_reports_errors_per_value(myjwk):
+    myjwe = WrapJWE(myjwk)
+    value = myjwe.encrypt("secret")
+    header, key, iv, text, tag = value.split(".")
+    tampered = ".".join((header, key, iv, text, tag[::-1]))
+    results = myjwe.decrypt_many([value, "garbage", tampered, 123])
+    assert results[0] == b"secret"
+    assert isinstance(results[1], Exception)
+    assert isinstance(results[2], JoseError)
+    assert isinstance(results[3], TypeError)
+    with pytest.raises(TypeError):
+        myjwe.encrypt_many([123])
@@ -0,0 +1,54 @@
+import json
+from benchmarks import run
+
+
+def test_runner_writes_json_results(tmp_path):
+    output = tmp_path / "results.json"
+    code = run.main(
+        [
+            "--storage=memory,file,vault",
+            "--iterations=5",
+            "--warmup=1",
+            "--threads=1,2",
+            "--processes=",
+            f"--output={output}",
+        ]
+    )
+    assert code == 0
+
+    document = json.loads(output.read_text())
+    assert document["schema"] == run.SCHEMA
+    assert document["environment"]["joserfc"]
+    results = document["results"]
+    # storages x operations x thread counts
+    assert len(results) == 3 * len(run.OPERATIONS) * 2
+    for result in results:
+        assert result["ops_per_sec"] > 0
+        latency = result["latency_us"]
+        assert latency["p50"] <= latency["p90"] <= latency["p99"]
+        assert latency["p99"] <= latency["max"]
+    assert {r["iterations"] for r in results} == {5, 10}
+
+
+def test_processes_share_the_keys_of_a_storage():
+    spec, samples = run.prepare("memory", "", "", run.KeyPolicy())
+    result = run.run(spec, samples, "decode", "processes", 2, 3, 1)
+    assert result["iterations"] == 6
+    assert result["mode"] == "processes"
+
+
+def test_regression_against_baseline(tmp_path):
+    results = [
+        {
+            "storage": "memory",
+            "operation": "decode",
+            "mode": "threads",
+            "workers": 1,
+            "ops_per_sec": 700.0,
+        }
+    ]
+    baseline = {"results": [dict(results[0], ops_per_sec=1000.0)]}
+    assert len(run.compare(results, baseline, 0.2)) == 1
+    assert run.compare(results, baseline, 0.5) == []
+    # benchmarks missing in the baseline are not compared
+    assert run.compare(results, {"results": []}, 0.2) == []
@@ -0,0 +1,135 @@
+import asyncio
+import time
+import pytest
+from joserfc.errors import (
+    ExpiredTokenError,
+    InvalidClaimError,
+    MissingClaimError,
+)
+from joserfc.jwt import Token
+from joserfc_wrapper import (
+    AsyncStorage,
+    AsyncWrapJWK,
+    AsyncWrapJWT,
+    ClaimsValidator,
+    ObjectTypeError,
+    TokenCache,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+@pytest.fixture
+def myjwk(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return myjwk
+
+
+def test_expected_and_required_claims():
+    validator = ClaimsValidator(
+        {"iss": "https://example.com", "aud": ["auditor", "admin"]},
+        required=("uid",),
+    )
+    assert validator.required == ("aud", "iss", "uid")
+    validator.validate(CLAIMS)
+    validator.validate(Token({}, {**CLAIMS, "aud": ["other", "admin"]}))
+
+    with pytest.raises(MissingClaimError):
+        validator.validate({"iss": "https://example.com", "aud": "auditor"})
+    with pytest.raises(InvalidClaimError):
+        validator.validate({**CLAIMS, "aud": "other"})
+    with pytest.raises(InvalidClaimError):
+        validator.validate({**CLAIMS, "aud": [{"unhashable": 1}]})
+    assert not validator.is_valid({**CLAIMS, "iss": ""})
+
+
+def test_time_claims_with_leeway():
+    now = 1_700_000_000
+    validator = ClaimsValidator(required=("exp",), leeway=10, now=lambda: now)
+    with pytest.raises(MissingClaimError):
+        validator.validate(CLAIMS)
+    validator.validate({"exp": now - 10})
+    with pytest.raises(ExpiredTokenError):
+        validator.validate({"exp": now - 11})
+    with pytest.raises(InvalidClaimError):
+        validator.validate({"exp": "tomorrow"})
+    with pytest.raises(InvalidClaimError):
+        validator.validate({"exp": now + 60, "nbf": now + 11})
+    with pytest.raises(InvalidClaimError):
+        validator.validate({"exp": now + 60, "iat": now + 11})
+    assert validator.is_valid({"exp": now, "nbf": now + 10, "iat": now})
+
+
+def test_wrapjwt_validates_decoded_tokens(storage, myjwk):
+    validator = ClaimsValidator({"aud": "auditor"}, required=("exp",))
+    myjwt = WrapJWT(myjwk, validator=validator)
+    token = myjwt.create({**CLAIMS, "exp": int(time.time()) + 60})
+    assert myjwt.decode(token).claims["uid"] == 123
+
+    with pytest.raises(MissingClaimError):
+        myjwt.decode(myjwt.create(dict(CLAIMS)))
+    with pytest.raises(ExpiredTokenError):
+        myjwt.decode(myjwt.create({**CLAIMS, "exp": int(time.time()) - 60}))
+
+    results = myjwt.decode_many([token, myjwt.create(dict(CLAIMS))])
+    assert isinstance(results[0], Token)
+    assert isinstance(results[1], MissingClaimError)
+
+    with pytest.raises(ObjectTypeError):
+        WrapJWT(myjwk, validator={"aud": "auditor"})
+
+
+def test_cached_tokens_are_validated(storage):
+    myjwk = WrapJWK(storage, token_cache=TokenCache())
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    clock = [time.time()]
+    validator = ClaimsValidator(now=lambda: clock[0])
+    myjwt = WrapJWT(myjwk, validator=validator)
+    token = myjwt.create({**CLAIMS, "exp": int(clock[0]) + 60})
+    myjwt.decode(token)
+
+    clock[0] += 120
+    assert token in myjwk.get_token_cache()
+    with pytest.raises(ExpiredTokenError):
+        myjwt.decode(token)
+
+
+def test_validate_keeps_its_result(myjwk):
+    myjwt = WrapJWT(myjwk)
+    token = myjwt.decode(myjwt.create(dict(CLAIMS)))
+    assert myjwt.validate(token, {"iss": "https://example.com", "uid": 123})
+    assert not myjwt.validate(token, {"sub": "someone"})
+    with pytest.raises(InvalidClaimError):
+        myjwt.validate(token, {"aud": "other"})
+
+
+def test_unhashable_expected_values(myjwk):
+    myjwt = WrapJWT(myjwk)
+    context = {"tenant": "a", "roles": ["admin"]}
+    token = myjwt.decode(myjwt.create({**CLAIMS, "ctx": context}))
+    assert myjwt.validate(token, {"ctx": {"tenant": "a", "roles": ["admin"]}})
+    assert myjwt.validate(token, {"ctx": [{"tenant": "b"}, context]})
+    with pytest.raises(InvalidClaimError):
+        myjwt.validate(token, {"ctx": {"tenant": "b"}})
+    validator = ClaimsValidator({"ctx": {"tenant": "a"}})
+    assert validator.is_valid({"ctx": [{"tenant": "a"}]})
+    assert not validator.is_valid({"ctx": "a"})
+
+
+def test_async_wrapper_validates(storage, myjwk):
+    token = WrapJWT(myjwk).create({**CLAIMS, "exp": int(time.time()) - 60})
+
+    async def decode():
+        myjwt = AsyncWrapJWT(
+            AsyncWrapJWK(AsyncStorage(storage)),
+            validator=ClaimsValidator({"aud": "auditor"}),
+        )
+        await myjwt.decode(token)
+
+    with pytest.raises(ExpiredTokenError):
+        asyncio.run(decode())
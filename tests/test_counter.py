@@ -0,0 +1,71 @@
+import sys
+import pytest
+from joserfc_wrapper import StorageFile, WrapJWK, WrapJWT, KeyCache
+
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+def new_jwk(storage, **kwargs):
+    myjwk = WrapJWK(storage, **kwargs)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return myjwk
+
+
+def test_counter_saved_every_token_by_default(storage):
+    myjwt = WrapJWT(new_jwk(storage))
+    for _ in range(3):
+        myjwt.create(claims=dict(CLAIMS))
+    assert storage.calls["add_counter"] == 3
+    assert storage.calls["save_keys"] == 1
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 3
+
+
+def test_counter_flushed_in_batches(storage):
+    myjwk = new_jwk(storage, flush_every=10)
+    myjwt = WrapJWT(myjwk)
+    for _ in range(25):
+        myjwt.create(claims=dict(CLAIMS))
+    assert storage.calls["add_counter"] == 2
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 20
+    assert myjwk.get_counter() == 25
+
+    myjwk.flush_counter()
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 25
+
+
+def test_counter_flushed_by_interval(storage, monkeypatch):
+    now = [1000.0]
+    module = sys.modules["joserfc_wrapper.WrapJWK"]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    myjwt = WrapJWT(new_jwk(storage, flush_every=100, flush_interval=5))
+    myjwt.create(claims=dict(CLAIMS))
+    assert storage.calls["add_counter"] == 0
+    now[0] += 5
+    myjwt.create(claims=dict(CLAIMS))
+    assert storage.calls["add_counter"] == 1
+    assert storage.keys[storage.last_kid]["data"]["counter"] == 2
+
+
+@pytest.mark.parametrize("cache", [None, KeyCache()])
+def test_payload_rotation_with_batched_counter(storage, cache):
+    myjwk = new_jwk(storage, cache=cache, flush_every=100)
+    first_kid = myjwk.get_kid()
+    myjwt = WrapJWT(myjwk)
+    for _ in range(5):
+        myjwt.create(claims=dict(CLAIMS), payload=3)
+
+    assert myjwk.get_kid() != first_kid
+    # pending tokens of the first key were saved before the rotation
+    assert storage.keys[first_kid]["data"]["counter"] == 3
+    assert myjwk.get_counter() == 2
+
+
+def test_storage_file_add_counter_keeps_last_kid(tmp_path):
+    storage = StorageFile(str(tmp_path))
+    first = new_jwk(storage)
+    second = new_jwk(storage)
+    assert storage.add_counter(first.get_kid(), 4) == 4
+    assert storage.get_last_kid() == second.get_kid()
+    assert storage.load_keys(first.get_kid())[1]["data"]["counter"] == 4
@@ -0,0 +1,170 @@
+import pytest
+from joserfc_wrapper import (
+    Instrumentation,
+    InstrumentedStorage,
+    KeyCache,
+    MetricsRecorder,
+    ObjectTypeError,
+    TokenCache,
+    TokenMalformedError,
+    WrapJWE,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+def counters(recorder):
+    return {
+        (item["name"], tuple(sorted(item["labels"].items()))): item["value"]
+        for item in recorder.snapshot()["counters"]
+    }
+
+
+def stages(recorder):
+    return {item["name"] for item in recorder.snapshot()["histograms"]}
+
+
+def test_noop_instrumentation_does_not_wrap_storage(storage):
+    instrumentation = Instrumentation()
+    assert instrumentation.stage("jwt.sign") is instrumentation.stage("x")
+    wrapjwk = WrapJWK(storage)
+    assert type(wrapjwk.get_instrumentation()) is Instrumentation
+
+    wrapjwk.generate_keys()
+    wrapjwk.save_keys()
+    assert storage.calls["save_keys"] == 1
+
+
+def test_invalid_instrumentation(storage):
+    with pytest.raises(ObjectTypeError):
+        WrapJWK(storage, instrumentation=object())
+
+
+def test_recorder_histograms_and_counters():
+    recorder = MetricsRecorder(buckets=(0.1, 1.0))
+    recorder.observe("jwt.sign", 0.05)
+    recorder.observe("jwt.sign", 0.5)
+    recorder.observe("jwt.sign", 5.0)
+    recorder.count("key_cache.hits", 2)
+    recorder.event("keys.rotated", kid="a")
+
+    snapshot = recorder.snapshot()
+    (histogram,) = snapshot["histograms"]
+    assert histogram["count"] == 3
+    assert histogram["sum"] == pytest.approx(5.55)
+    assert histogram["buckets"] == {0.1: 1, 1.0: 2, float("inf"): 3}
+    assert counters(recorder) == {
+        ("key_cache.hits", ()): 2,
+        ("events", (("event", "keys.rotated"),)): 1,
+    }
+    assert snapshot["events"][0]["labels"] == {"kid": "a"}
+
+    recorder.reset()
+    assert recorder.snapshot() == {
+        "histograms": [],
+        "counters": [],
+        "events": [],
+    }
+
+
+def test_jwt_stages_and_caches(storage):
+    recorder = MetricsRecorder()
+    wrapjwk = WrapJWK(
+        storage,
+        cache=KeyCache(),
+        token_cache=TokenCache(),
+        instrumentation=recorder,
+    )
+    wrapjwk.generate_keys()
+    wrapjwk.save_keys()
+    wrapjwt = WrapJWT(wrapjwk)
+    token = wrapjwt.create(CLAIMS)
+    wrapjwt.decode(token)
+    wrapjwt.decode(token)
+
+    assert {
+        "storage.save_keys",
+        "keys.generate",
+        "keys.import",
+        "jwt.sign",
+        "jwt.parse",
+        "jwt.verify",
+    } <= stages(recorder)
+    values = counters(recorder)
+    assert values[("token_cache.misses", ())] == 1
+    assert values[("token_cache.hits", ())] == 1
+    assert values[("events", (("event", "keys.generated"),))] == 1
+
+    with pytest.raises(TokenMalformedError):
+        wrapjwt.decode("invalid")
+    values = counters(recorder)
+    assert values[("jwt.rejected", (("error", "TokenMalformedError"),))] == 1
+
+
+def test_rotation_event(storage):
+    recorder = MetricsRecorder()
+    wrapjwk = WrapJWK(storage, instrumentation=recorder)
+    wrapjwk.generate_keys()
+    wrapjwk.save_keys()
+    previous = wrapjwk.get_kid()
+    wrapjwk.rotate()
+
+    event = recorder.snapshot()["events"][-1]
+    assert event["name"] == "keys.rotated"
+    assert event["labels"] == {"kid": wrapjwk.get_kid(), "previous": previous}
+
+
+def test_jwe_stages(storage):
+    recorder = MetricsRecorder()
+    wrapjwk = WrapJWK(storage, instrumentation=recorder)
+    wrapjwk.generate_keys()
+    wrapjwk.save_keys()
+    wrapjwe = WrapJWE(wrapjwk)
+    assert wrapjwe.decrypt(wrapjwe.encrypt(b"data")) == b"data"
+    assert wrapjwe.decrypt_many(wrapjwe.encrypt_many([b"a", b"b"])) == [
+        b"a",
+        b"b",
+    ]
+    assert {
+        "jwe.encrypt",
+        "jwe.decrypt",
+        "jwe.encrypt_many",
+        "jwe.decrypt_many",
+    } <= stages(recorder)
+
+
+def test_storage_errors_and_missing_keys(storage):
+    recorder = MetricsRecorder()
+    instrumented = InstrumentedStorage(storage, recorder)
+    with pytest.raises(FileNotFoundError):
+        instrumented.load_keys("missing")
+    with pytest.raises(KeyError):
+        instrumented.delete_keys("missing")
+
+    values = counters(recorder)
+    assert values[("storage.missing", (("storage", "CountingStorage"),))] == 1
+    labels = (
+        ("error", "KeyError"),
+        ("operation", "delete_keys"),
+        ("storage", "CountingStorage"),
+    )
+    assert values[("storage.errors", labels)] == 1
+
+
+def test_render_prometheus():
+    recorder = MetricsRecorder(buckets=(0.1,))
+    recorder.observe("storage.load_keys", 0.05, storage="StorageFile")
+    recorder.count("storage.errors", storage='a"b')
+
+    text = recorder.render_prometheus().splitlines()
+    metric = "joserfc_wrapper_stage_duration_seconds"
+    assert f"# TYPE {metric} histogram" in text
+    labels = 'stage="storage.load_keys",storage="StorageFile"'
+    assert f'{metric}_bucket{{{labels},le="0.1"}} 1' in text
+    assert f'{metric}_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f"{metric}_count{{{labels}}} 1" in text
+    assert "# TYPE joserfc_wrapper_storage_errors_total counter" in text
+    assert 'joserfc_wrapper_storage_errors_total{storage="a\\"b"} 1' in text
+    assert MetricsRecorder().render_prometheus() == ""
@@ -0,0 +1,91 @@
+import io
+import os
+import pytest
+from joserfc_wrapper import StreamDecryptError, WrapJWE, WrapJWK
+
+
+@pytest.fixture
+def myjwe(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return WrapJWE(myjwk)
+
+
+def frames(stream):
+    """Split an encrypted stream into frames"""
+    result, offset = [], 0
+    while offset < len(stream):
+        length = int.from_bytes(stream[offset : offset + 4], "big")
+        result.append(stream[offset : offset + 4 + length])
+        offset += 4 + length
+    return result
+
+
+PAYLOAD = os.urandom(10_000)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        lambda: PAYLOAD,
+        lambda: bytearray(PAYLOAD),
+        lambda: memoryview(PAYLOAD),
+        lambda: io.BytesIO(PAYLOAD),
+        lambda: (PAYLOAD[i : i + 777] for i in range(0, len(PAYLOAD), 777)),
+    ],
+)
+def test_round_trip_of_sources(myjwe, source):
+    chunks = list(myjwe.encrypt_stream(source(), chunk_size=1024))
+    # a header, 9 full chunks and the last chunk
+    assert len(chunks) == 1 + 10
+    assert b"".join(myjwe.decrypt_stream(iter(chunks))) == PAYLOAD
+
+    stream = b"".join(chunks)
+    plain = list(myjwe.decrypt_stream(io.BytesIO(stream)))
+    assert [len(chunk) for chunk in plain] == [1024] * 9 + [784]
+    assert b"".join(myjwe.decrypt_stream(memoryview(stream))) == PAYLOAD
+
+
+@pytest.mark.parametrize("payload", [b"", b"x" * 1024])
+def test_empty_and_aligned_payload(myjwe, payload):
+    stream = b"".join(myjwe.encrypt_stream(payload, chunk_size=1024))
+    assert b"".join(myjwe.decrypt_stream(stream)) == payload
+
+
+def test_stream_is_bound_to_kid(storage, myjwe):
+    stream = b"".join(myjwe.encrypt_stream(PAYLOAD))
+    kid = WrapJWK(storage).get_keyset().kid
+    assert b"".join(myjwe.decrypt_stream(stream, kid=kid)) == PAYLOAD
+    with pytest.raises(StreamDecryptError):
+        myjwe.decrypt_stream(stream, kid="0" * 32)
+
+
+def test_tampered_streams_are_rejected(myjwe):
+    parts = frames(b"".join(myjwe.encrypt_stream(PAYLOAD, chunk_size=1024)))
+    header, chunks = parts[0], parts[1:]
+
+    tampered = {
+        "truncated": [header] + chunks[:-1],
+        "reordered": [header, chunks[1], chunks[0]] + chunks[2:],
+        "dropped": [header, chunks[0]] + chunks[2:],
+        "header only": [header],
+        "cut frame": [header] + chunks[:-1] + [chunks[-1][:-1]],
+    }
+    for name, stream in tampered.items():
+        with pytest.raises(StreamDecryptError):
+            list(myjwe.decrypt_stream(b"".join(stream)))
+
+    modified = bytearray(b"".join(parts))
+    modified[-1] ^= 1
+    with pytest.raises(StreamDecryptError):
+        list(myjwe.decrypt_stream(modified))
+    with pytest.raises(StreamDecryptError):
+        list(myjwe.decrypt_stream(b"garbage"))
+
+
+def test_compact_encrypt_accepts_buffers(myjwe):
+    secret = myjwe.encrypt(memoryview(b"very secret"))
+    assert myjwe.decrypt(secret) == b"very secret"
+    with pytest.raises(TypeError):
+        myjwe.encrypt_stream("text")
@@ -1,39 +1,50 @@
 import pytest
-from joserfc_wrapper import AbstractKeyStorage
-from joserfc_wrapper import jwk
-from unittest.mock import Mock
+from joserfc_wrapper import (
+    KeysLoadError,
+    ObjectTypeError,
+    TokenParser,
+    WrapJWK,
+)
 
-class MockStorage(AbstractKeyStorage):
-    def get_last_kid(self):
-        pass
 
-    def load_keys(self, kid):
-        return {}, {}
+def test_jwk_initialization_with_valid_storage(storage):
+    jwk_instance = WrapJWK(storage)
+    assert jwk_instance is not None
 
-    def save_keys(self, kid, private_key, public_key):
-        pass
 
-@pytest.fixture
-def valid_storage():
-    return MockStorage()
+def test_jwk_initialization_with_invalid_storage():
+    with pytest.raises(ObjectTypeError):
+        WrapJWK(object())
 
-def test_jwk_initialization_with_valid_storage(valid_storage):
-    jwk_instance = jwk(valid_storage)
-    assert jwk_instance is not None
 
-def test_jwk_get_key_id_with_no_key(valid_storage):
-    jwk_instance = jwk(valid_storage)
-    assert jwk_instance.get_kid() is None
+def test_jwk_get_key_id_with_no_key(storage):
+    jwk_instance = WrapJWK(storage)
+    with pytest.raises(KeysLoadError):
+        jwk_instance.get_kid()
+
+
+def test_jwk_get_public_key(storage):
+    jwk_instance = WrapJWK(storage)
+    with pytest.raises(KeysLoadError):
+        jwk_instance.get_public_key()
+
 
-def test_jwk_get_public_key(valid_storage):
-    jwk_instance = jwk(valid_storage)
-    assert jwk_instance.get_public_key() is None
+def test_jwk_get_private_key(storage):
+    jwk_instance = WrapJWK(storage)
+    with pytest.raises(KeysLoadError):
+        jwk_instance.get_private_key()
 
-def test_jwk_get_private_key(valid_storage):
-    jwk_instance = jwk(valid_storage)
-    assert jwk_instance.get_private_key() is None
 
-def test_jwk_generate_keys(valid_storage):
-    jwk_instance = jwk(valid_storage)
-    assert jwk_instance.get_private_key() is None
+def test_jwk_generate_keys(storage):
+    jwk_instance = WrapJWK(storage)
+    jwk_instance.generate_keys()
+    assert TokenParser.validate_kid(jwk_instance.get_kid())
+    assert jwk_instance.get_private_key()["d"]
+    assert "d" not in jwk_instance.get_public_key()
+    assert jwk_instance.get_counter() == 0
 
+    jwk_instance.save_keys()
+    loaded = WrapJWK(storage)
+    loaded.load_keys()
+    assert loaded.get_kid() == jwk_instance.get_kid()
+    assert loaded.get_public_key() == jwk_instance.get_public_key()
@@ -0,0 +1,125 @@
+import json
+import threading
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from joserfc_wrapper import (
+    JWKSBuilder,
+    StorageMemory,
+    TokenKidInvalidError,
+    VerifyJWT,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        status, headers, body = self.server.builder.response(
+            self.headers.get("If-None-Match", "")
+        )
+        self.server.statuses.append(status)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(signer):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), JWKSHandler)
+    server.builder = JWKSBuilder(signer.storage, ttl=0)
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/jwks"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def signer():
+    storage = StorageMemory()
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return SimpleNamespace(storage=storage, jwk=myjwk, jwt=WrapJWT(myjwk))
+
+
+def test_document_changes_only_with_keys(signer):
+    builder = JWKSBuilder(signer.storage, ttl=0)
+    body, etag = builder.get()
+    jwks = json.loads(body)
+    assert [key["kid"] for key in jwks["keys"]] == [signer.jwk.get_kid()]
+    assert all("d" not in key for key in jwks["keys"])
+
+    signer.jwt.create(dict(CLAIMS))
+    assert builder.get() == (body, etag)
+    assert builder.response(etag)[0] == 304
+    assert builder.response(f'W/{etag}, "other"')[0] == 304
+
+    signer.jwk.generate_keys()
+    signer.jwk.save_keys()
+    new_body, new_etag = builder.get()
+    assert new_etag != etag
+    # the newest keys are first
+    assert json.loads(new_body)["keys"][0]["kid"] == signer.jwk.get_kid()
+    status, headers, _ = builder.response(etag)
+    assert status == 200 and headers["ETag"] == new_etag
+
+
+def test_storage_is_listed_once_per_ttl(signer):
+    builder = JWKSBuilder(signer.storage, ttl=3600)
+    _, etag = builder.get()
+    signer.jwk.generate_keys()
+    signer.jwk.save_keys()
+    assert builder.get()[1] == etag
+
+    builder.invalidate()
+    assert builder.get()[1] != etag
+
+
+def test_verifier_uses_conditional_requests(signer, server):
+    token = signer.jwt.create(dict(CLAIMS))
+    verifier = VerifyJWT(url=server.url, refresh_interval=0)
+    assert verifier.decode(token).claims["uid"] == 123
+    assert verifier.decode(token).claims["uid"] == 123
+    assert server.statuses == [200, 304]
+    assert verifier.get_etag() == server.builder.get()[1]
+
+
+def test_verifier_refreshes_on_unknown_kid(signer, server):
+    verifier = VerifyJWT(url=server.url)
+    verifier.unknown_kid_interval = 0
+    verifier.decode(signer.jwt.create(dict(CLAIMS)))
+
+    signer.jwk.generate_keys()
+    signer.jwk.save_keys()
+    token = signer.jwt.create(dict(CLAIMS))
+    assert verifier.decode(token).header["kid"] == signer.jwk.get_kid()
+    assert server.statuses == [200, 200]
+
+    # revoked keys are not accepted after a refresh
+    signer.storage.delete_keys(signer.jwk.get_kid())
+    verifier.refresh_keys()
+    with pytest.raises(TokenKidInvalidError):
+        verifier.decode(token)
+
+
+def test_verifier_keeps_keys_when_endpoint_is_down(signer, server):
+    token = signer.jwt.create(dict(CLAIMS))
+    verifier = VerifyJWT(url=server.url, refresh_interval=0)
+    verifier.decode(token)
+    server.shutdown()
+    server.server_close()
+    assert verifier.decode(token).claims["uid"] == 123
@@ -0,0 +1,121 @@
+import time
+import pytest
+from joserfc_wrapper import KeyCache, WrapJWK, WrapJWT, ObjectTypeError
+
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+def test_cache_hit_and_miss():
+    cache = KeyCache()
+    assert cache.get("kid") is None
+    cache.set("kid", {"counter": 0})
+    assert cache.get("kid") == {"counter": 0}
+    assert "kid" in cache
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "size": 1}
+
+
+def test_cache_ttl_expire():
+    cache = KeyCache(ttl=0.01)
+    cache.set("kid", {})
+    cache.set_last_kid("kid")
+    time.sleep(0.02)
+    assert cache.get("kid") is None
+    assert cache.get_last_kid() is None
+    assert len(cache) == 0
+
+
+def test_cache_maxsize_evicts_least_recently_used():
+    cache = KeyCache(maxsize=2)
+    cache.set("a", {})
+    cache.set("b", {})
+    cache.get("a")
+    cache.set("c", {})
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.evictions == 1
+
+
+def test_cache_invalidate_and_clear():
+    cache = KeyCache()
+    cache.set("a", {})
+    cache.set("b", {})
+    cache.set_last_kid("a")
+    cache.invalidate("a")
+    assert "a" not in cache
+    assert cache.get_last_kid() is None
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_wrapjwk_rejects_invalid_cache(storage):
+    with pytest.raises(ObjectTypeError):
+        WrapJWK(storage, cache={})
+
+
+def test_wrapjwk_loads_from_cache(storage):
+    cache = KeyCache()
+    myjwk = WrapJWK(storage, cache=cache)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    kid = myjwk.get_kid()
+
+    myjwk.load_keys()
+    myjwk.load_keys(kid)
+    assert myjwk.get_kid() == kid
+    assert storage.calls["load_keys"] == 0
+    assert storage.calls["get_last_kid"] == 0
+    assert cache.hits == 2
+
+
+def test_wrapjwk_cache_miss_reads_storage_once(storage):
+    writer = WrapJWK(storage)
+    writer.generate_keys()
+    writer.save_keys()
+
+    myjwk = WrapJWK(storage, cache=KeyCache())
+    for _ in range(3):
+        myjwk.load_keys()
+    assert storage.calls["load_keys"] == 1
+    assert myjwk.get_kid() == writer.get_kid()
+
+
+def test_wrapjwt_create_and_decode_with_cache(storage):
+    myjwk = WrapJWK(storage, cache=KeyCache())
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    myjwt = WrapJWT(myjwk)
+
+    tokens = [myjwt.create(claims=dict(CLAIMS)) for _ in range(3)]
+    for token in tokens:
+        assert myjwt.decode(token).claims["uid"] == 123
+    assert storage.calls["load_keys"] == 0
+    assert myjwk.get_counter() == 3
+
+
+def test_wrapjwk_imports_key_objects_once(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+
+    assert myjwk.get_signing_key() is myjwk.get_signing_key()
+    assert myjwk.get_verifying_key() is myjwk.get_verifying_key()
+    assert myjwk.get_encryption_key() is myjwk.get_encryption_key()
+    assert myjwk.get_verifying_key().as_dict() == myjwk.get_public_key()
+
+
+def test_wrapjwk_key_objects_follow_loaded_kid(storage):
+    first = WrapJWK(storage)
+    first.generate_keys()
+    first.save_keys()
+    second = WrapJWK(storage)
+    second.generate_keys()
+    second.save_keys()
+
+    myjwk = WrapJWK(storage)
+    myjwk.load_keys(first.get_kid())
+    key_first = myjwk.get_signing_key()
+    myjwk.load_keys(second.get_kid())
+    assert myjwk.get_signing_key() is not key_first
+    myjwk.load_keys(first.get_kid())
+    assert myjwk.get_signing_key() is key_first
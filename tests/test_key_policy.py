@@ -0,0 +1,175 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from joserfc import jwt
+from joserfc.errors import JoseError
+from joserfc.jwk import OctKey
+from joserfc_wrapper import (
+    JWKSBuilder,
+    KeyNotFoundError,
+    KeyPolicy,
+    KeySet,
+    StorageFile,
+    TokenMalformedError,
+    TokenParser,
+    VerifyJWT,
+    WrapJWE,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auth", "uid": 123}
+
+POLICIES = [
+    KeyPolicy(),
+    KeyPolicy("Ed25519", "dir", "A256GCM"),
+    KeyPolicy("HS256", "A256KW", "A128GCM"),
+    KeyPolicy("EdDSA", "dir", "A128GCM"),
+]
+
+
+@pytest.fixture(autouse=True)
+def ignore_eddsa_deprecation():
+    # 'EdDSA' is deprecated by RFC 9864 in favour of 'Ed25519'
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+def make_jwk(storage, policy):
+    myjwk = WrapJWK(storage, policy=policy)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return myjwk
+
+
+def test_default_policy_matches_older_keys():
+    keyset = KeySet.generate()
+    assert keyset.policy == KeyPolicy()
+    assert keyset.as_dict()["policy"] == {
+        "alg": "ES256",
+        "enc_alg": "A128KW",
+        "enc": "A128GCM",
+    }
+    # keys saved before policies existed
+    keys = keyset.as_dict()
+    del keys["policy"]
+    assert KeySet(keyset.kid, keys).policy == KeyPolicy()
+
+
+def test_unsupported_algorithm():
+    with pytest.raises(ValueError):
+        KeyPolicy("RS256")
+    with pytest.raises(ValueError):
+        KeyPolicy(enc_alg="RSA-OAEP")
+    with pytest.raises(ValueError):
+        KeyPolicy(enc="A128CBC-HS256")
+
+
+@pytest.mark.parametrize("policy", POLICIES, ids=repr)
+def test_tokens_and_data_by_policy(storage, policy):
+    myjwk = make_jwk(storage, policy)
+    myjwt = WrapJWT(myjwk)
+    token = myjwt.create(dict(CLAIMS))
+    decoded = myjwt.decode(token)
+    assert decoded.header["alg"] == policy.alg
+    assert decoded.claims["uid"] == 123
+
+    myjwe = WrapJWE(myjwk)
+    encrypted = myjwe.encrypt("secret")
+    assert myjwe.decrypt(encrypted) == b"secret"
+    assert myjwe.decrypt_many(myjwe.encrypt_many(["a", "b"])) == [b"a", b"b"]
+    stream = b"".join(myjwe.encrypt_stream(b"x" * 5000, chunk_size=1024))
+    assert b"".join(myjwe.decrypt_stream(stream)) == b"x" * 5000
+
+
+def test_dir_skips_key_wrap(storage):
+    myjwk = make_jwk(storage, KeyPolicy(enc_alg="dir", enc="A256GCM"))
+    myjwe = WrapJWE(myjwk)
+    # the encrypted key segment is empty
+    assert myjwe.encrypt("secret").split(".")[1] == ""
+    assert myjwe.encrypt_many(["secret"])[0].split(".")[1] == ""
+
+
+def test_algorithm_is_taken_from_the_keys(storage):
+    # keys generated by another policy are still verified and decrypted
+    old = make_jwk(storage, KeyPolicy())
+    token = WrapJWT(old).create(dict(CLAIMS))
+    encrypted = WrapJWE(old).encrypt("secret")
+
+    myjwk = make_jwk(storage, KeyPolicy("Ed25519", "dir", "A256GCM"))
+    myjwt = WrapJWT(myjwk)
+    assert myjwt.decode(token).header["alg"] == "ES256"
+    assert WrapJWE(myjwk).decrypt(encrypted) == b"secret"
+    assert myjwt.decode_many([token], ThreadPoolExecutor(2))[0].claims
+
+
+@pytest.mark.parametrize("alg", ["EdDSA", "HS256"])
+def test_tokens_of_older_policy_after_change_to_es256(storage, alg):
+    old = make_jwk(storage, KeyPolicy(alg=alg))
+    token = WrapJWT(old).create(dict(CLAIMS))
+
+    myjwk = make_jwk(storage, KeyPolicy())
+    assert WrapJWT(myjwk).decode(token).header["alg"] == alg
+    # a verifier with the default policy sharing the storage
+    verifier = WrapJWT(WrapJWK(storage))
+    assert verifier.decode(token).claims["uid"] == 123
+    assert verifier.decode_many([token])[0].claims["uid"] == 123
+
+
+def test_token_with_another_algorithm_is_rejected(storage):
+    es256 = make_jwk(storage, KeyPolicy())
+    # an HS256 token with the Key ID of EC keys
+    forged = jwt.encode(
+        {"alg": "HS256", "kid": es256.get_kid()},
+        dict(CLAIMS),
+        OctKey.generate_key(256),
+    )
+    # HS256 is not allowed by the default parser of ES256 keys
+    with pytest.raises(TokenMalformedError):
+        WrapJWT(es256).decode(forged)
+    # nor when a parser allows it, the keys decide
+    parser = TokenParser(algorithms=("ES256", "HS256"))
+    with pytest.raises(TokenMalformedError):
+        WrapJWT(es256, parser=parser).decode(forged)
+
+
+def test_jwe_with_another_algorithm_is_rejected(storage):
+    myjwk = make_jwk(storage, KeyPolicy(enc_alg="A256KW", enc="A256GCM"))
+    myjwe = WrapJWE(myjwk)
+    with pytest.raises(JoseError):
+        myjwe.decrypt(
+            WrapJWE(make_jwk(storage, KeyPolicy())).encrypt("x"),
+            kid=myjwk.get_kid(),
+        )
+
+
+def test_policy_is_saved_by_file_storage(tmp_path):
+    storage = StorageFile(str(tmp_path))
+    myjwk = make_jwk(storage, KeyPolicy("Ed25519"))
+    token = WrapJWT(myjwk).create(dict(CLAIMS))
+
+    other = WrapJWK(StorageFile(str(tmp_path)), policy=KeyPolicy("Ed25519"))
+    assert other.get_keyset(myjwk.get_kid()).policy == KeyPolicy("Ed25519")
+    assert WrapJWT(other).decode(token).header["alg"] == "Ed25519"
+
+
+def test_public_verifiers(storage):
+    eddsa = make_jwk(storage, KeyPolicy("Ed25519"))
+    token = WrapJWT(eddsa).create(dict(CLAIMS))
+    assert eddsa.get_public_key()["alg"] == "Ed25519"
+    assert VerifyJWT(storage).decode(token).claims["uid"] == 123
+    verifier = VerifyJWT(
+        keys={"keys": [dict(eddsa.get_public_key(), kid=eddsa.get_kid())]}
+    )
+    assert verifier.decode(token).claims["uid"] == 123
+    jwks = JWKSBuilder(storage)
+    assert eddsa.get_kid().encode() in jwks.get()[0]
+
+    # HS256 keys are never published
+    hs256 = make_jwk(storage, KeyPolicy("HS256"))
+    assert hs256.get_public_key() == {}
+    with pytest.raises(KeyNotFoundError):
+        VerifyJWT(storage).load_key(hs256.get_kid())
+    jwks.invalidate()
+    assert jwks.get()[0] == b'{"keys":[]}'
@@ -0,0 +1,124 @@
+import asyncio
+import time
+import uuid
+import pytest
+from joserfc_wrapper import (
+    AsyncStorage,
+    AsyncWrapJWK,
+    AsyncWrapJWT,
+    KeyNotFoundError,
+    KeysLoadError,
+    NegativeCache,
+    StorageFile,
+    StorageMemory,
+    VerifyJWT,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+def foreign_token():
+    """Token with a well-formed Key ID which is not in the storage"""
+    other = WrapJWK(StorageMemory())
+    other.generate_keys()
+    other.save_keys()
+    return WrapJWT(other).create(dict(CLAIMS))
+
+
+def test_cache_ttl_and_stats():
+    cache = NegativeCache(ttl=0.01)
+    assert not cache.is_missing("kid")
+    cache.add("kid")
+    assert cache.is_missing("kid")
+    assert "kid" in cache
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "size": 1}
+    time.sleep(0.02)
+    assert not cache.is_missing("kid")
+    assert len(cache) == 0
+
+
+def test_cache_is_bounded_and_can_be_disabled():
+    cache = NegativeCache(maxsize=2)
+    for kid in ("a", "b", "c"):
+        cache.add(kid)
+    assert "a" not in cache and "c" in cache
+    assert cache.evictions == 1
+    cache.discard("c")
+    assert "c" not in cache
+
+    disabled = NegativeCache(ttl=0)
+    disabled.add("a")
+    assert not disabled.is_missing("a")
+
+
+def test_unknown_kid_reaches_storage_once(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    myjwt = WrapJWT(myjwk)
+    token = foreign_token()
+
+    loads = storage.calls["load_keys"]
+    for _ in range(100):
+        with pytest.raises(KeyNotFoundError):
+            myjwt.decode(token)
+    assert storage.calls["load_keys"] == loads + 1
+    assert myjwk.get_negative_cache().stats()["hits"] == 99
+
+    # known keys are not affected
+    assert myjwt.decode(myjwt.create(dict(CLAIMS))).claims["uid"] == 123
+
+
+@pytest.mark.parametrize("name", ["memory", "file"])
+def test_missing_errors_of_storages(tmp_path, name):
+    if name == "memory":
+        storage = StorageMemory()
+    else:
+        storage = StorageFile(str(tmp_path), fsync=False)
+    kid = uuid.uuid4().hex
+    with pytest.raises(storage.missing_errors):
+        storage.load_keys(kid)
+
+    myjwk = WrapJWK(storage)
+    with pytest.raises(KeysLoadError):
+        myjwk.get_keyset(kid)
+    assert kid in myjwk.get_negative_cache()
+
+
+def test_missing_kid_expires(storage):
+    myjwk = WrapJWK(storage, negative_cache=NegativeCache(ttl=0.01))
+    kid = uuid.uuid4().hex
+    with pytest.raises(KeyNotFoundError):
+        myjwk.get_keyset(kid)
+
+    # keys saved meanwhile by another process
+    other = WrapJWK(storage)
+    other.generate_keys()
+    other.save_keys()
+    time.sleep(0.02)
+    assert myjwk.get_keyset(other.get_kid()).kid == other.get_kid()
+
+
+def test_verifier_and_async_wrapper(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    token = foreign_token()
+
+    verifier = VerifyJWT(storage=storage)
+    loads = storage.calls["load_keys"]
+    for _ in range(10):
+        with pytest.raises(KeyNotFoundError):
+            verifier.decode(token)
+    assert storage.calls["load_keys"] == loads + 1
+
+    async def decode_many():
+        myjwt = AsyncWrapJWT(AsyncWrapJWK(AsyncStorage(storage)))
+        for _ in range(10):
+            with pytest.raises(KeyNotFoundError):
+                await myjwt.decode(token)
+
+    asyncio.run(decode_many())
+    assert storage.calls["load_keys"] == loads + 2
@@ -0,0 +1,187 @@
+import os
+import time
+import pytest
+from joserfc_wrapper import (
+    KeyCache,
+    StorageChain,
+    StorageFile,
+    StorageMemory,
+    StorageRedis,
+    StorageSQLite,
+    StorageVault,
+    WrapJWK,
+    WrapJWT,
+)
+from tests.fake_redis import FakeRedis
+from tests.conftest import wait_for
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+BACKENDS = ["memory", "file", "sqlite", "redis", "vault1", "vault2", "chain"]
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, tmp_path, vault):
+    name = request.param
+    if name == "memory":
+        return StorageMemory()
+    if name == "file":
+        return StorageFile(str(tmp_path), fsync=False)
+    if name == "sqlite":
+        return StorageSQLite(str(tmp_path / "keys.db"))
+    if name == "redis":
+        return StorageRedis(client=FakeRedis())
+    if name == "chain":
+        return StorageChain([StorageMemory(), StorageMemory()])
+    kv_version = int(name[-1])
+    mount = "secret" if kv_version == 1 else "secret-v2"
+    return StorageVault(vault.url, "token", mount, kv_version=kv_version)
+
+
+def age_keys(storage, kid, seconds):
+    """Move the generation time of saved keys to the past"""
+    _, result = storage.load_keys(kid)
+    keys = dict(result["data"])
+    keys["created"] -= seconds
+    storage.stage_keys(kid, keys)
+
+
+def test_list_delete_and_created(backend):
+    myjwk = WrapJWK(backend)
+    kids = []
+    for _ in range(3):
+        myjwk.generate_keys()
+        myjwk.save_keys()
+        kids.append(myjwk.get_kid())
+
+    assert sorted(backend.list_kids()) == sorted(kids)
+    created = backend.load_keys(kids[0])[1]["data"]["created"]
+    assert abs(created - time.time()) < 60
+
+    backend.delete_keys(kids[0])
+    assert sorted(backend.list_kids()) == sorted(kids[1:])
+    assert backend.get_last_kid() == kids[2]
+
+
+def test_prune_by_retention_and_count(backend):
+    cache = KeyCache()
+    myjwk = WrapJWK(backend, cache=cache)
+    myjwt = WrapJWT(myjwk)
+    tokens = {}
+    for _ in range(4):
+        myjwk.generate_keys()
+        myjwk.save_keys()
+        tokens[myjwk.get_kid()] = myjwt.create(dict(CLAIMS))
+    kids = list(tokens)
+
+    age_keys(backend, kids[0], 3600)
+    assert myjwk.prune_keys(retention=600) == [kids[0]]
+    assert kids[0] not in cache
+    with pytest.raises(Exception):
+        myjwt.decode(tokens[kids[0]])
+
+    # the newest keys are kept, the last keys always
+    assert myjwk.prune_keys(retention=0, max_keys=2) == [kids[1]]
+    assert sorted(backend.list_kids()) == sorted(kids[2:])
+    assert myjwt.decode(tokens[kids[2]])
+
+
+def test_file_listing_skips_lock_and_temporary_files(tmp_path):
+    storage = StorageFile(str(tmp_path), fsync=False)
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    (tmp_path / ".abc.tmp").write_text("{}")
+    (tmp_path / ".hidden.json").write_text("{}")
+
+    assert ".lock" in os.listdir(tmp_path)
+    assert storage.list_kids() == [myjwk.get_kid()]
+
+
+def test_rotation_by_age():
+    storage = StorageMemory()
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+    age_keys(storage, first_kid, 7200)
+
+    # keys generated by another process are loaded with their age
+    myjwk = WrapJWK(storage, max_age=3600)
+    myjwt = WrapJWT(myjwk)
+    myjwk.load_keys()
+    assert myjwk.get_key_age() >= 7200
+    token = myjwt.create(dict(CLAIMS))
+    assert myjwt.decode(token).header["kid"] != first_kid
+    assert storage.get_last_kid() == myjwk.get_kid()
+
+
+def test_rotation_prunes_old_keys():
+    storage = StorageMemory()
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    rotator = myjwk.start_rotation(pool_size=2, check_interval=0.01, max_keys=2)
+    for _ in range(3):
+        wait_for(lambda: rotator.ready == 2)
+        myjwk.rotate()
+        assert rotator.flush(timeout=5)
+    assert myjwk.stop_rotation(timeout=5)
+
+    # kept keys and pre-generated keys
+    assert len(storage.list_kids()) == 2 + rotator.ready
+    assert myjwk.get_kid() in storage.list_kids()
+
+
+def test_retention_is_measured_from_the_replacement(backend):
+    myjwk = WrapJWK(backend)
+    myjwt = WrapJWT(myjwk)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+    # the keys signed tokens for longer than the retention
+    age_keys(backend, first_kid, 7200)
+    token = myjwt.create(dict(CLAIMS))
+
+    myjwk.rotate()
+    assert myjwk.prune_keys(retention=3600) == []
+    # not the previous keys anymore, but replaced seconds ago
+    myjwk.rotate()
+    assert myjwk.prune_keys(retention=3600) == []
+    assert myjwt.decode(token).header["kid"] == first_kid
+
+    backend.retire_keys(first_kid, time.time() - 7200)
+    assert myjwk.prune_keys(retention=3600) == [first_kid]
+
+
+def test_previous_keys_are_never_pruned():
+    storage = StorageMemory()
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+    myjwk.rotate()
+    storage.retire_keys(first_kid, time.time() - 7200)
+
+    assert myjwk.prune_keys(retention=3600, max_keys=1) == []
+    assert first_kid in storage.list_kids()
+
+
+def test_background_rotation_keeps_recently_replaced_keys():
+    storage = StorageMemory()
+    myjwk = WrapJWK(storage)
+    myjwt = WrapJWT(myjwk)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+    age_keys(storage, first_kid, 7200)
+    token = myjwt.create(dict(CLAIMS))
+
+    rotator = myjwk.start_rotation(check_interval=0.01, retention=3600)
+    for _ in range(2):
+        wait_for(lambda: rotator.ready == 1)
+        myjwk.rotate()
+        assert rotator.flush(timeout=5)
+    assert myjwk.stop_rotation(timeout=5)
+
+    assert storage.load_keys(first_kid)[1]["data"]["retired"]
+    assert myjwt.decode(token).header["kid"] == first_kid
@@ -0,0 +1,77 @@
+import sys
+import pytest
+from joserfc_wrapper import StorageMemory, WrapJWK, WrapJWT
+from tests.conftest import wait_for
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+@pytest.fixture
+def rotating(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    rotator = myjwk.start_rotation(pool_size=2, check_interval=0.01)
+    wait_for(lambda: rotator.ready == 2)
+    yield myjwk, rotator
+    myjwk.stop_rotation(timeout=5)
+
+
+def test_pool_keys_are_saved_before_use(storage, rotating):
+    myjwk, _ = rotating
+    assert len(storage.keys) == 3
+    assert storage.get_last_kid() == myjwk.get_kid()
+
+
+def test_rotation_does_not_generate_or_save_keys(
+    storage, rotating, monkeypatch
+):
+    myjwk, rotator = rotating
+    myjwt = WrapJWT(myjwk)
+    first_kid = myjwk.get_kid()
+    save_calls = storage.calls["save_keys"]
+
+    # keys must come from the pool
+    keyset_class = sys.modules["joserfc_wrapper.WrapJWK"].KeySet
+
+    def no_keygen():
+        raise AssertionError("keys generated while signing")
+
+    monkeypatch.setattr(keyset_class, "generate", no_keygen)
+    rotator.pool_size = 0
+
+    tokens = [myjwt.create(dict(CLAIMS), payload=2) for _ in range(3)]
+    assert myjwt.decode(tokens[0]).header["kid"] == first_kid
+    assert myjwt.decode(tokens[2]).header["kid"] != first_kid
+    assert storage.calls["save_keys"] == save_calls
+
+    assert rotator.flush(timeout=5)
+    assert storage.get_last_kid() == myjwk.get_kid()
+    assert storage.keys[first_kid]["data"]["counter"] == 2
+    assert storage.keys[myjwk.get_kid()]["data"]["counter"] == 1
+
+
+def test_rotation_by_period(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+
+    myjwk.start_rotation(period=0.05, check_interval=0.01)
+    wait_for(lambda: myjwk.get_kid() != first_kid)
+    assert myjwk.stop_rotation(timeout=5)
+    assert storage.get_last_kid() == myjwk.get_kid()
+
+
+def test_rotation_without_pool_keys():
+    storage = StorageMemory()
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+
+    # without a started rotation keys are generated and saved inline
+    keyset = myjwk.rotate()
+    assert keyset.kid != first_kid
+    assert storage.get_last_kid() == keyset.kid
+    assert myjwk.get_counter() == 0
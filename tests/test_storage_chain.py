@@ -0,0 +1,165 @@
+import time
+import pytest
+from joserfc_wrapper import (
+    KeyNotFoundError,
+    StorageChain,
+    StorageFile,
+    StorageMemory,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+class BrokenStorage(StorageMemory):
+    """Storage which fails while 'down' is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+
+    def __getattribute__(self, name):
+        if name in (
+            "get_last_kid",
+            "load_keys",
+            "save_keys",
+            "stage_keys",
+            "add_counter",
+            "_save_last_id",
+            "publish_kid",
+        ) and object.__getattribute__(self, "down"):
+            raise ConnectionError(name)
+        return object.__getattribute__(self, name)
+
+
+def create_keys(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return myjwk.get_kid()
+
+
+def test_reads_are_served_by_the_fastest_tier(storage, tmp_path):
+    kid = create_keys(storage)
+    memory = StorageMemory()
+    mirror = StorageFile(str(tmp_path), fsync=False)
+    chain = StorageChain([memory, mirror, storage])
+
+    assert chain.load_keys()[0] == kid
+    assert storage.calls["load_keys"] == 1
+    # lower tiers are filled on a miss
+    assert memory.load_keys(kid)[0] == kid
+    assert mirror.load_keys(kid)[0] == kid
+
+    chain.load_keys(kid)
+    assert storage.calls["load_keys"] == 1
+
+    # a restarted node reads keys from the file mirror, they are checked
+    # in the authoritative tier once per keys_ttl
+    chain = StorageChain([StorageMemory(), mirror, storage])
+    chain.load_keys(kid)
+    chain.load_keys(kid)
+    assert storage.calls["load_keys"] == 2
+
+
+def test_keys_revoked_by_another_node(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    authority = StorageMemory()
+    node_a = StorageChain([StorageFile(str(tmp_path / "a")), authority])
+    mirror = StorageFile(str(tmp_path / "b"))
+    node_b = StorageChain([mirror, authority], keys_ttl=0.05)
+
+    issuer = WrapJWK(node_a)
+    issuer.generate_keys()
+    issuer.save_keys()
+    kid = issuer.get_kid()
+    token = WrapJWT(issuer).create(dict(CLAIMS))
+    assert WrapJWT(WrapJWK(node_b)).decode(token).claims["uid"] == 123
+    assert mirror.load_keys(kid)[0] == kid
+
+    issuer.revoke_keys(kid)
+    # a restarted node checks the keys of its mirror at once
+    restarted = StorageChain([StorageFile(str(tmp_path / "b")), authority])
+    with pytest.raises(KeyNotFoundError):
+        WrapJWT(WrapJWK(restarted)).decode(token)
+    with pytest.raises(FileNotFoundError):
+        mirror.load_keys(kid)
+
+    # a running node after keys_ttl
+    time.sleep(0.05)
+    with pytest.raises(KeyNotFoundError):
+        WrapJWT(WrapJWK(node_b)).decode(token)
+
+
+def test_write_through(storage):
+    memory = StorageMemory()
+    chain = StorageChain([memory, storage])
+    kid = create_keys(chain)
+
+    assert storage.get_last_kid() == kid
+    assert memory.get_last_kid() == kid
+    assert chain.add_counter(kid, 2) == 2
+    assert storage.load_keys(kid)[1]["data"]["counter"] == 2
+    assert memory.load_keys(kid)[1]["data"]["counter"] == 2
+
+
+def test_last_kid_is_read_once_per_ttl(storage):
+    kid = create_keys(storage)
+    chain = StorageChain([StorageMemory(), storage], last_kid_ttl=60)
+    calls = storage.calls["get_last_kid"]
+    for _ in range(5):
+        assert chain.load_keys()[0] == kid
+    assert storage.calls["get_last_kid"] == calls + 1
+
+    # keys rotated by another node are noticed when the TTL expires
+    rotated = create_keys(storage)
+    assert chain.get_last_kid() == kid
+    chain.last_kid_ttl = 0
+    assert chain.get_last_kid() == rotated
+
+    # keys rotated by this chain are known at once
+    chain.last_kid_ttl = 60
+    own = create_keys(chain)
+    calls = storage.calls["get_last_kid"]
+    assert chain.get_last_kid() == own
+    assert storage.calls["get_last_kid"] == calls
+
+
+def test_last_kid_falls_back_when_authority_is_down():
+    authority = BrokenStorage()
+    kid = create_keys(authority)
+    memory = StorageMemory()
+    chain = StorageChain([memory, authority])
+    token = WrapJWT(WrapJWK(chain)).create(dict(CLAIMS))
+
+    authority.down = True
+    assert chain.get_last_kid() == kid
+    assert WrapJWT(WrapJWK(chain)).decode(token)
+
+    with pytest.raises(ConnectionError):
+        StorageChain([StorageMemory(), authority]).load_keys(kid)
+
+
+def test_write_behind():
+    authority = BrokenStorage()
+    authority.down = True
+    memory = StorageMemory()
+    chain = StorageChain([memory, authority], write_behind=True)
+    chain.retry_interval = 0.01
+
+    kid = create_keys(chain)
+    assert chain.get_last_kid() == kid
+    assert chain.add_counter(kid, 3) == 3
+    assert chain.pending == 2
+    assert not chain.flush(timeout=0.05)
+    assert isinstance(chain.last_error, ConnectionError)
+
+    authority.down = False
+    assert chain.close(timeout=5)
+    assert chain.last_error is None
+    assert authority.get_last_kid() == kid
+    assert authority.load_keys(kid)[1]["data"]["counter"] == 3
+    with pytest.raises(RuntimeError):
+        chain.add_counter(kid, 1)
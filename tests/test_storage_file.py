@@ -0,0 +1,123 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from joserfc_wrapper import StorageFile, WrapJWK, WrapJWT
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+def sign_tokens(cert_dir, count):
+    myjwt = WrapJWT(WrapJWK(StorageFile(cert_dir)))
+    for _ in range(count):
+        myjwt.create(dict(CLAIMS))
+
+
+def test_save_and_load_keys(tmp_path):
+    storage = StorageFile(str(tmp_path))
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+
+    kid, keys = storage.load_keys()
+    assert kid == myjwk.get_kid()
+    assert keys["data"]["keys"]["public"] == myjwk.get_public_key()
+    # no temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [".lock", f"{kid}.json", "last-key-id.json"]
+    )
+
+
+def test_failed_write_keeps_previous_file(tmp_path, monkeypatch):
+    storage = StorageFile(str(tmp_path), fsync=False)
+    storage._save_last_id("first")
+
+    def broken_dump(*args, **kwargs):
+        raise ValueError("broken")
+
+    monkeypatch.setattr(json, "dump", broken_dump)
+    with pytest.raises(ValueError):
+        storage._save_last_id("second")
+    monkeypatch.undo()
+
+    assert storage.get_last_kid() == "first"
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_counter_updates_skip_fsync(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, "fsync", synced.append)
+    myjwk = WrapJWK(StorageFile(str(tmp_path)))
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    assert len(synced) == 2
+
+    myjwt = WrapJWT(myjwk)
+    for _ in range(3):
+        myjwt.create(dict(CLAIMS))
+    assert len(synced) == 2
+
+    storage = StorageFile(str(tmp_path), fsync_counter=True)
+    storage.add_counter(myjwk.get_kid(), 1)
+    assert len(synced) == 3
+
+
+def test_processes_share_counter(tmp_path):
+    myjwk = WrapJWK(StorageFile(str(tmp_path)))
+    myjwk.generate_keys()
+    myjwk.save_keys()
+
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(sign_tokens, [str(tmp_path)] * 4, [10] * 4))
+
+    _, keys = StorageFile(str(tmp_path)).load_keys()
+    assert keys["data"]["counter"] == 40
+
+
+def count_opens(monkeypatch):
+    opened = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(os.path.basename(str(path)))
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr("builtins.open", counting_open)
+    return opened
+
+
+def test_watch_reads_unchanged_files_once(tmp_path, monkeypatch):
+    writer = WrapJWK(StorageFile(str(tmp_path)))
+    writer.generate_keys()
+    writer.save_keys()
+
+    storage = StorageFile(str(tmp_path), watch=True)
+    opened = count_opens(monkeypatch)
+    for _ in range(5):
+        kid, keys = storage.load_keys()
+    assert opened == ["last-key-id.json", f"{kid}.json"]
+    assert keys["data"]["keys"]["public"] == writer.get_public_key()
+
+
+def test_watch_detects_rotation_by_other_process(tmp_path):
+    writer = WrapJWK(StorageFile(str(tmp_path)))
+    writer.generate_keys()
+    writer.save_keys()
+    storage = StorageFile(str(tmp_path), watch=True)
+    assert storage.get_last_kid() == writer.get_kid()
+
+    writer.generate_keys()
+    writer.save_keys()
+    assert storage.get_last_kid() == writer.get_kid()
+
+
+def test_watch_check_interval_skips_stat(tmp_path, monkeypatch):
+    storage = StorageFile(str(tmp_path), watch=True, check_interval=60)
+    StorageFile(str(tmp_path))._save_last_id("first")
+    assert storage.get_last_kid() == "first"
+
+    StorageFile(str(tmp_path))._save_last_id("second")
+    stats = []
+    monkeypatch.setattr(os, "stat", lambda *a, **k: stats.append(a))
+    assert storage.get_last_kid() == "first"
+    assert stats == []
@@ -0,0 +1,98 @@
+import threading
+import pytest
+from joserfc_wrapper import (
+    KeyNotFoundError,
+    KeysLoadError,
+    StorageRedis,
+    StorageSQLite,
+    WrapJWK,
+    WrapJWT,
+)
+from tests.fake_redis import FakeRedis
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def storage(request, tmp_path):
+    if request.param == "sqlite":
+        return StorageSQLite(str(tmp_path / "keys.db"))
+    return StorageRedis(client=FakeRedis())
+
+
+def test_save_load_and_count(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+
+    kid, keys = storage.load_keys()
+    assert kid == myjwk.get_kid()
+    assert storage.get_last_kid() == kid
+    assert keys["data"]["keys"]["public"] == myjwk.get_public_key()
+    assert keys["data"]["counter"] == 0
+
+    assert storage.add_counter(kid, 3) == 3
+    assert storage.add_counter(kid, 2) == 5
+    assert storage.load_keys(kid)[1]["data"]["counter"] == 5
+
+
+def test_missing_keys(storage):
+    with pytest.raises(KeysLoadError):
+        storage.load_keys()
+    with pytest.raises(KeysLoadError):
+        storage.load_keys("unknown")
+    with pytest.raises(KeyNotFoundError):
+        storage.add_counter("unknown", 1)
+
+
+def test_tokens_from_threads_are_counted(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    kid = myjwk.get_kid()
+
+    def sign():
+        # every thread behaves like an own node
+        myjwt = WrapJWT(WrapJWK(storage))
+        for _ in range(10):
+            myjwt.create(dict(CLAIMS))
+
+    threads = [threading.Thread(target=sign) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert storage.load_keys(kid)[1]["data"]["counter"] == 40
+    assert WrapJWT(WrapJWK(storage)).decode(
+        WrapJWT(WrapJWK(storage)).create(dict(CLAIMS))
+    )
+
+
+def test_sqlite_is_shared_by_connections(tmp_path):
+    path = str(tmp_path / "keys.db")
+    myjwk = WrapJWK(StorageSQLite(path))
+    myjwk.generate_keys()
+    myjwk.save_keys()
+
+    other = StorageSQLite(path)
+    assert other.get_last_kid() == myjwk.get_kid()
+
+
+def test_redis_loads_last_keys_in_two_round_trips():
+    client = FakeRedis()
+    storage = StorageRedis(client=client, prefix="test:")
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    assert set(client.data) == {
+        f"test:{myjwk.get_kid()}",
+        f"test:{myjwk.get_kid()}:counter",
+        f"test:{myjwk.get_kid()}:created",
+        f"test:{myjwk.get_kid()}:retired",
+        "test:last-key-id",
+    }
+
+    client.round_trips = 0
+    storage.load_keys()
+    assert client.round_trips == 2
@@ -0,0 +1,148 @@
+import asyncio
+import hvac
+import pytest
+from joserfc_wrapper import (
+    AsyncStorageVault,
+    AsyncWrapJWK,
+    AsyncWrapJWT,
+    StorageVault,
+    WrapJWK,
+    WrapJWT,
+)
+from tests.conftest import wait_for
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+MOUNTS = [(1, "secret"), (2, "secret-v2")]
+
+
+def new_storage(vault, kv_version, mount, **kwargs):
+    return StorageVault(
+        vault.url, "token", mount, kv_version=kv_version, **kwargs
+    )
+
+
+@pytest.mark.parametrize("kv_version,mount", MOUNTS)
+def test_save_load_and_count(vault, kv_version, mount):
+    storage = new_storage(vault, kv_version, mount)
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    myjwt = WrapJWT(myjwk)
+    token = myjwt.create(claims=dict(CLAIMS))
+
+    kid, keys = storage.load_keys()
+    assert kid == myjwk.get_kid()
+    assert keys["data"]["counter"] == 1
+    assert myjwt.decode(token).claims["uid"] == 123
+
+
+def test_invalid_kv_version(vault):
+    with pytest.raises(ValueError):
+        new_storage(vault, 3, "secret")
+
+
+def test_last_kid_pointer_always_written(vault):
+    storage = new_storage(vault, 1, "secret")
+    other = new_storage(vault, 1, "secret")
+    storage.save_keys("a", {"keys": {}, "counter": 0})
+    # another writer moves the pointer meanwhile
+    other.save_keys("b", {"keys": {}, "counter": 0})
+    storage.save_keys("a", {"keys": {}, "counter": 1})
+    assert storage.get_last_kid() == "a"
+
+
+@pytest.mark.parametrize("kv_version,mount", MOUNTS)
+def test_inline_last_keys_one_round_trip(vault, kv_version, mount):
+    storage = new_storage(vault, kv_version, mount, inline_last_keys=True)
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+    storage.add_counter(first_kid, 3)
+
+    vault.requests.clear()
+    kid, keys = storage.load_keys()
+    assert len(vault.requests) == 1
+    assert kid == first_kid
+    assert keys["data"]["counter"] == 3
+
+    # rotation saves the counter of the replaced keys to their own secret
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    assert storage.load_keys(first_kid)[1]["data"]["counter"] == 3
+    assert storage.load_keys()[0] == myjwk.get_kid()
+
+
+@pytest.mark.parametrize("kv_version,mount", MOUNTS)
+def test_inline_last_keys_background_rotation(vault, kv_version, mount):
+    storage = new_storage(vault, kv_version, mount, inline_last_keys=True)
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    first_kid = myjwk.get_kid()
+    myjwt = WrapJWT(myjwk)
+    for _ in range(3):
+        myjwt.create(dict(CLAIMS))
+
+    rotator = myjwk.start_rotation(check_interval=0.01)
+    wait_for(lambda: rotator.ready == 1)
+    myjwt.create(dict(CLAIMS))
+    myjwk.rotate()
+    assert myjwk.stop_rotation(timeout=5)
+
+    # the counter of the replaced keys is kept, the new keys are inlined
+    assert storage.load_keys(first_kid)[1]["data"]["counter"] == 4
+    vault.requests.clear()
+    kid, keys = storage.load_keys()
+    assert len(vault.requests) == 1
+    assert kid == myjwk.get_kid()
+    assert keys["data"]["keys"]["public"] == myjwk.get_public_key()
+
+
+def test_kv2_counter_check_and_set(vault):
+    first = new_storage(vault, 2, "secret-v2")
+    second = new_storage(vault, 2, "secret-v2")
+    first.save_keys("a", {"keys": {}, "counter": 0})
+
+    # a concurrent write between read and write of the counter
+    original = second._StorageVault__read
+    calls = []
+
+    def racing_read(path, versioned=False):
+        result = original(path, versioned)
+        if not calls:
+            calls.append(path)
+            first.add_counter("a", 5)
+        return result
+
+    second._StorageVault__read = racing_read
+    assert second.add_counter("a", 2) == 7
+
+
+def test_applied_write_is_not_repeated(vault):
+    storage = new_storage(vault, 2, "secret-v2")
+    storage.save_keys("a", {"keys": {}, "counter": 0})
+
+    vault.failed_writes = 1
+    with pytest.raises(hvac.exceptions.VaultError):
+        storage.add_counter("a", 2)
+    assert storage.load_keys("a")[1]["data"]["counter"] == 2
+
+
+def test_async_storage_options(vault):
+    storage = AsyncStorageVault(
+        vault.url, "token", "secret-v2", kv_version=2, inline_last_keys=True
+    )
+
+    async def main():
+        myjwk = AsyncWrapJWK(storage)
+        await myjwk.generate_keys()
+        token = await AsyncWrapJWT(myjwk).create(dict(CLAIMS))
+        return (await AsyncWrapJWT(myjwk).decode(token)).claims
+
+    assert asyncio.run(main())["uid"] == 123
+    kid, keys = storage.storage.load_keys()
+    # KV v2 with the keys inlined in the last Key ID secret
+    assert ("secret-v2", "last-key-id") in vault.secrets
+    assert vault.secrets["secret-v2", "last-key-id"][0]["kid"] == kid
+    assert keys["data"]["counter"] == 1
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from joserfc_wrapper import KeyCache, KeysLoadError, WrapJWE, WrapJWK, WrapJWT
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+def test_wrapjwk_without_keys_raises(storage):
+    with pytest.raises(KeysLoadError):
+        WrapJWK(storage).get_kid()
+
+
+@pytest.mark.parametrize("cache", [None, KeyCache()])
+def test_shared_wrapper_counts_every_token(storage, cache):
+    myjwk = WrapJWK(storage, cache=cache)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    myjwt = WrapJWT(myjwk)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        tokens = list(
+            executor.map(lambda _: myjwt.create(dict(CLAIMS), 25), range(200))
+        )
+
+    kids = [myjwt.decode(token).header["kid"] for token in tokens]
+    counters = {kid: kids.count(kid) for kid in kids}
+    assert sorted(counters.values()) == [25] * 8
+    for kid, count in counters.items():
+        assert storage.keys[kid]["data"]["counter"] == count
+
+
+def test_decode_does_not_change_signing_keys(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    myjwt = WrapJWT(myjwk)
+    old_token = myjwt.create(dict(CLAIMS))
+
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    new_kid = myjwk.get_kid()
+    myjwt.decode(old_token)
+    assert myjwk.get_kid() == new_kid
+    assert myjwt.get_kid() != new_kid
+
+
+def test_threads_decode_and_decrypt_different_kids(storage):
+    myjwk = WrapJWK(storage, cache=KeyCache())
+    myjwt = WrapJWT(myjwk)
+    myjwe = WrapJWE(myjwk)
+    items = []
+    for uid in range(4):
+        myjwk.generate_keys()
+        myjwk.save_keys()
+        token = myjwt.create({**CLAIMS, "uid": uid})
+        items.append((token, myjwe.encrypt(str(uid)), myjwk.get_kid()))
+
+    def check(item):
+        token, secret, kid = item
+        uid = myjwt.decode(token).claims["uid"]
+        return uid, myjwe.decrypt(secret, kid)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(check, items * 25))
+    assert all(str(uid).encode() == plain for uid, plain in results)
@@ -0,0 +1,117 @@
+import time
+import pytest
+from joserfc_wrapper import (
+    KeyNotFoundError,
+    ObjectTypeError,
+    TokenCache,
+    TokenParser,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+class CountingParser(TokenParser):
+    """Token parser which counts signature checks"""
+
+    verified = 0
+
+    def verify(self, parsed, key, algorithm=""):
+        self.verified += 1
+        return super().verify(parsed, key, algorithm)
+
+
+@pytest.fixture
+def myjwk(storage):
+    myjwk = WrapJWK(storage, token_cache=TokenCache(maxsize=2))
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return myjwk
+
+
+def test_wrapjwk_rejects_invalid_token_cache(storage):
+    with pytest.raises(ObjectTypeError):
+        WrapJWK(storage, token_cache={})
+
+
+def test_repeated_token_is_verified_once(myjwk):
+    parser = CountingParser()
+    myjwt = WrapJWT(myjwk, parser=parser)
+    token = myjwt.create(dict(CLAIMS))
+
+    first = myjwt.decode(token)
+    first.claims["uid"] = 0
+    second = myjwt.decode(token)
+    assert second.claims["uid"] == 123
+    assert myjwt.get_kid() == myjwk.get_kid()
+    assert parser.verified == 1
+    assert myjwk.get_token_cache().stats()["hits"] == 1
+
+
+def test_changed_nested_claims_do_not_change_cached_token(myjwk):
+    myjwt = WrapJWT(myjwk)
+    claims = dict(CLAIMS, roles={"admin": False}, scopes=["read"])
+    token = myjwt.create(claims)
+
+    first = myjwt.decode(token)
+    first.claims["roles"]["admin"] = True
+    first.claims["scopes"].append("write")
+    first.header["kid"] = "other"
+
+    second = myjwt.decode(token)
+    assert second.claims["roles"] == {"admin": False}
+    assert second.claims["scopes"] == ["read"]
+    assert second.header["kid"] == myjwk.get_kid()
+
+
+def test_entries_expire_with_exp_claim(myjwk):
+    parser = CountingParser()
+    myjwt = WrapJWT(myjwk, parser=parser)
+    expired = myjwt.create({**CLAIMS, "exp": int(time.time()) - 10})
+    myjwt.decode(expired)
+    assert expired not in myjwk.get_token_cache()
+
+    cache = TokenCache(ttl=60)
+    token = myjwt.create({**CLAIMS, "exp": time.time() + 0.01})
+    cache.set(token, myjwt.decode(token))
+    assert token in cache
+    time.sleep(0.02)
+    assert cache.get(token) is None
+
+
+def test_lru_eviction(myjwk):
+    myjwt = WrapJWT(myjwk)
+    tokens = [myjwt.create({**CLAIMS, "uid": uid}) for uid in range(3)]
+    for token in tokens:
+        myjwt.decode(token)
+    cache = myjwk.get_token_cache()
+    assert tokens[0] not in cache and tokens[2] in cache
+    assert cache.evictions == 1
+
+
+def test_revoked_keys_invalidate_tokens(myjwk):
+    myjwt = WrapJWT(myjwk)
+    token = myjwt.create(dict(CLAIMS))
+    kid = myjwk.get_kid()
+    myjwt.decode(token)
+    assert token in myjwk.get_token_cache()
+
+    # current keys are replaced before they are revoked
+    myjwk.revoke_keys(kid)
+    assert myjwk.get_kid() != kid
+    assert token not in myjwk.get_token_cache()
+    with pytest.raises(KeyNotFoundError):
+        myjwt.decode(token)
+    assert myjwt.decode(myjwt.create(dict(CLAIMS))).claims["uid"] == 123
+
+
+def test_decode_many_uses_cache(myjwk):
+    parser = CountingParser()
+    myjwt = WrapJWT(myjwk, parser=parser)
+    token = myjwt.create(dict(CLAIMS))
+    results = myjwt.decode_many([token, "faketoken"])
+    assert results[0].claims["uid"] == 123
+    results = myjwt.decode_many([token, token])
+    assert [r.claims["uid"] for r in results] == [123, 123]
+    assert parser.verified == 1
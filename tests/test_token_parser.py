@@ -0,0 +1,99 @@
+import base64
+import json
+import pytest
+from joserfc import jwt
+from joserfc.errors import BadSignatureError
+from joserfc.jwk import OctKey
+from joserfc_wrapper import (
+    TokenKidInvalidError,
+    TokenMalformedError,
+    TokenParser,
+    WrapJWK,
+    WrapJWT,
+)
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+KID = "0f8fad5bd9cb469fa165708ff6c6e4d9"
+
+
+def b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=")
+
+
+def forge(header, claims=None):
+    return b".".join([b64(header), b64(claims or CLAIMS), b"c2ln"]).decode()
+
+
+@pytest.fixture
+def myjwt(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return WrapJWT(myjwk)
+
+
+@pytest.mark.parametrize(
+    "token,error",
+    [
+        ("faketoken", TokenMalformedError),
+        ("a.b", TokenMalformedError),
+        ("a.b.c.d", TokenMalformedError),
+        ("!!!.e30.c2ln", TokenMalformedError),
+        ("x" * 9000, TokenMalformedError),
+        (forge({"alg": "none", "kid": KID}), TokenMalformedError),
+        (forge({"alg": "RS256", "kid": KID}), TokenMalformedError),
+        (forge({"alg": "ES256"}), TokenKidInvalidError),
+        (
+            forge({"alg": "ES256", "kid": "../../etc/passwd"}),
+            TokenKidInvalidError,
+        ),
+        (forge({"alg": "ES256", "kid": 123}), TokenKidInvalidError),
+    ],
+)
+def test_garbage_is_rejected_before_key_lookup(storage, myjwt, token, error):
+    loads = storage.calls["load_keys"]
+    with pytest.raises(error):
+        myjwt.decode(token)
+    assert storage.calls["load_keys"] == loads
+
+
+def test_malformed_token_is_an_invalid_kid_error():
+    # callers which catch TokenKidInvalidError keep working
+    with pytest.raises(TokenKidInvalidError):
+        TokenParser().parse("faketoken")
+
+
+def test_parse_once_and_verify(storage, myjwt):
+    token = myjwt.create(dict(CLAIMS))
+    parser = TokenParser()
+    parsed = parser.parse(token)
+    kid = parsed.headers()["kid"]
+    assert json.loads(parsed.payload)["uid"] == 123
+
+    key = WrapJWK(storage).get_keyset(kid).verifying_key
+    decoded = parser.verify(parsed, key)
+    assert decoded.claims["uid"] == 123
+    assert decoded.header["kid"] == kid
+
+
+def test_forged_signature_and_algorithm(myjwt):
+    token = myjwt.create(dict(CLAIMS))
+    header, payload, _ = token.split(".")
+    with pytest.raises(BadSignatureError):
+        myjwt.decode(f"{header}.{payload}.c2ln")
+
+    # a token signed by a not allowed algorithm is rejected by the parser
+    kid = myjwt.decode(token).header["kid"]
+    forged = jwt.encode(
+        {"alg": "HS256", "kid": kid}, CLAIMS, OctKey.generate_key(256)
+    )
+    with pytest.raises(TokenMalformedError):
+        myjwt.decode(forged)
+
+
+def test_decode_many_reports_garbage(myjwt):
+    token = myjwt.create(dict(CLAIMS))
+    results = myjwt.decode_many([token, "faketoken", "x" * 9000])
+    assert results[0].claims["uid"] == 123
+    assert isinstance(results[1], TokenMalformedError)
+    assert isinstance(results[2], TokenMalformedError)
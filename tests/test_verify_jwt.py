@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+import pytest
+from joserfc.errors import BadSignatureError
+from joserfc_wrapper import (
+    WrapJWK,
+    WrapJWT,
+    VerifyJWT,
+    KeyNotFoundError,
+    ObjectTypeError,
+    TokenKidInvalidError,
+)
+
+
+CLAIMS = {"iss": "https://example.com", "aud": "auditor", "uid": 123}
+
+
+@pytest.fixture
+def signer(storage):
+    myjwk = WrapJWK(storage)
+    myjwk.generate_keys()
+    myjwk.save_keys()
+    return WrapJWT(myjwk)
+
+
+def test_verifier_requires_keys_source():
+    with pytest.raises(ObjectTypeError):
+        VerifyJWT()
+
+
+def test_verify_from_storage_loads_once(storage, signer):
+    tokens = [signer.create(claims=dict(CLAIMS)) for _ in range(3)]
+    loads = storage.calls["load_keys"]
+
+    verifier = VerifyJWT(storage)
+    for token in tokens:
+        assert verifier.decode(token).claims["uid"] == 123
+    assert verifier.get_kid() == storage.last_kid
+    assert storage.calls["load_keys"] == loads + 1
+
+
+def test_verify_from_snapshot_without_storage(storage, signer):
+    token = signer.create(claims=dict(CLAIMS))
+    snapshot = VerifyJWT(storage)
+    snapshot.decode(token)
+    jwks = json.loads(json.dumps(snapshot.export_keys()))
+    assert all("d" not in key for key in jwks["keys"])
+
+    verifier = VerifyJWT(keys=jwks)
+    assert verifier.decode(token).claims["uid"] == 123
+
+
+def test_verify_unknown_kid_in_snapshot(storage, signer):
+    token = signer.create(claims=dict(CLAIMS))
+    verifier = VerifyJWT(keys={"keys": []})
+    with pytest.raises(TokenKidInvalidError):
+        verifier.decode(token)
+
+
+def test_verify_rejects_malformed_token(storage):
+    verifier = VerifyJWT(storage)
+    with pytest.raises(TokenKidInvalidError):
+        verifier.decode("faketoken")
+    assert storage.calls["load_keys"] == 0
+
+
+def test_verify_rejects_foreign_signature(storage, signer):
+    token = signer.create(claims=dict(CLAIMS))
+    other = WrapJWK(storage)
+    other.generate_keys()
+    public = {**other.get_public_key(), "kid": storage.last_kid}
+
+    verifier = VerifyJWT(keys={"keys": [public]})
+    with pytest.raises(BadSignatureError):
+        verifier.decode(token)
+
+
+def test_revoked_keys_expire_from_the_verifier(storage, signer):
+    token = signer.create(claims=dict(CLAIMS))
+    kid = storage.last_kid
+    verifier = VerifyJWT(storage, ttl=0.05)
+    assert verifier.decode(token).claims["uid"] == 123
+
+    WrapJWK(storage).revoke_keys(kid)
+    time.sleep(0.05)
+    with pytest.raises(KeyNotFoundError):
+        verifier.decode(token)
+
+
+def test_kid_of_the_last_token_per_thread(storage, signer):
+    token = signer.create(claims=dict(CLAIMS))
+    verifier = VerifyJWT(storage)
+    kids = []
+    thread = threading.Thread(target=lambda: kids.append(verifier.get_kid()))
+    verifier.decode(token)
+    thread.start()
+    thread.join()
+    assert kids == [""]
+    assert verifier.get_kid() == storage.last_kid
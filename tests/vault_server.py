@@ -0,0 +1,124 @@
+"""Minimal HashiCorp Vault KV v1/v2 server for tests and benchmarks"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+
+class VaultHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "VaultServer"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.server.requests.append(("GET", self.path))
+        path = self.path.split("?")[0]
+        if path.startswith("/v1/secret-v2/metadata/"):
+            return self.__list(path)
+        with self.server.lock:
+            stored = self.server.secrets.get(self.__key(path))
+        if stored is None:
+            return self.__send(404, {"errors": []})
+        data, version = stored
+        if self.__v2(path):
+            body = {"data": {"data": data, "metadata": {"version": version}}}
+        else:
+            body = {"data": data}
+        self.__send(200, body)
+
+    def do_POST(self) -> None:
+        self.server.requests.append(("POST", self.path))
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        key = self.__key(self.path)
+        with self.server.lock:
+            version = self.server.secrets.get(key, (None, 0))[1]
+            if self.__v2(self.path):
+                cas = body.get("options", {}).get("cas")
+                if cas is not None and cas != version:
+                    return self.__send(
+                        400,
+                        {"errors": ["check-and-set parameter did not match"]},
+                    )
+                body = body["data"]
+            self.server.secrets[key] = (body, version + 1)
+            # a write applied by Vault, but the response is lost
+            failed = self.server.failed_writes > 0
+            self.server.failed_writes -= failed
+        if failed:
+            return self.__send(503, {"errors": ["unavailable"]})
+        if self.__v2(self.path):
+            return self.__send(200, {"data": {"version": version + 1}})
+        self.__send(204, None)
+
+    do_PUT = do_POST
+
+    def do_DELETE(self) -> None:
+        self.server.requests.append(("DELETE", self.path))
+        with self.server.lock:
+            self.server.secrets.pop(self.__key(self.path), None)
+        self.__send(204, None)
+
+    def do_LIST(self) -> None:
+        self.server.requests.append(("LIST", self.path))
+        self.__list(self.path.split("?")[0])
+
+    def __list(self, path: str) -> None:
+        prefix = self.__key(path.rstrip("/"))
+        with self.server.lock:
+            keys = [k for m, k in self.server.secrets if m == prefix[0]]
+        if not keys:
+            return self.__send(404, {"errors": []})
+        self.__send(200, {"data": {"keys": keys}})
+
+    def __v2(self, path: str) -> bool:
+        return path.startswith("/v1/secret-v2/")
+
+    def __key(self, path: str) -> tuple[str, str]:
+        parts = path.split("?")[0].split("/")[2:]
+        mount = parts[0]
+        if self.__v2(path):
+            return mount, "/".join(parts[2:])
+        return mount, "/".join(parts[1:])
+
+    def __send(self, status: int, body: Any) -> None:
+        payload = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class VaultServer(ThreadingHTTPServer):
+    """Serves KV v1 on the 'secret' mount and KV v2 on 'secret-v2'"""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int] = ("127.0.0.1", 0)) -> None:
+        super().__init__(address, VaultHandler)
+        self.lock = threading.Lock()
+        self.secrets: dict[tuple[str, str], tuple[dict, int]] = {}
+        self.requests: list[tuple[str, str]] = []
+        # number of next writes answered by 503 after they are applied
+        self.failed_writes = 0
+        self.thread = threading.Thread(
+            target=self.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self.socket.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "VaultServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.shutdown()
+        self.server_close()